@@ -1,17 +1,42 @@
 import os
+import io
 import json
 import traceback
-import tempfile
-from typing import List, Optional, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 from enum import Enum
 import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Literal
 
 import google.generativeai as genai
-from fastapi import FastAPI, File, UploadFile, HTTPException, Response
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware  # <-- NEW
 from dotenv import load_dotenv
 
+from extraction_cache import ExtractionCache, cache_key
+from local_extractors import extract_locally
+from main import compact_pages, has_text_layer
+from pdf_pages import page_count, page_texts, plan_page_windows, slice_pdf
+from page_router import route_texts
+import state
+from uploads import MAX_UPLOAD_MB, receive_pdf_upload
+from file_reaper import DISPLAY_NAME_PREFIX, FileReaper
+from metrics import PROMPT_TOKENS, REQUEST_SECONDS, log, new_request_id, render_metrics, request_id_var, stage_timer
+from jobs import DONE, FAILED, QUEUED, JobQueue, JobStore
+from transform_programs import (
+    COMPILE_SYSTEM_PROMPT,
+    ProgramCache,
+    TransformProgram,
+    apply_program,
+    parse_program,
+    program_key,
+)
+from transform_cache import TransformRowCache, row_cache_key
+from vector_search_utils import cache_stats as security_cache_stats
+
 # --- Pydantic Models & Enums (kept as-is but unused for validation) ---
 class StatementFrequencyEnum(str, Enum):
     MONTHLY = "Monthly"
@@ -153,6 +178,73 @@ if not GOOGLE_API_KEY:
     raise ValueError("GOOGLE_API_KEY environment variable not set.")
 genai.configure(api_key=GOOGLE_API_KEY)
 
+# --- Extraction cache (repeat uploads of the same PDF skip Gemini) ---
+EXTRACTION_CACHE_ENABLED = os.getenv("EXTRACTION_CACHE_ENABLED", "1") == "1"
+EXTRACTION_CACHE_DIR = os.getenv("EXTRACTION_CACHE_DIR", ".extraction_cache")
+EXTRACTION_CACHE_MAX_MB = int(os.getenv("EXTRACTION_CACHE_MAX_MB", "512"))
+EXTRACTION_CACHE_MAX_AGE_S = int(os.getenv("EXTRACTION_CACHE_MAX_AGE_S", str(7 * 24 * 3600)))
+
+# --- Local rule-based extraction for known layouts (Gemini is the fallback) ---
+LOCAL_EXTRACTION_ENABLED = os.getenv("LOCAL_EXTRACTION_ENABLED", "1") == "1"
+# Share of the target sections found on the pages that a local result must have parsed
+# rows for before Gemini is skipped (local_extractors.section_coverage)
+LOCAL_EXTRACTION_MIN_COVERAGE = float(os.getenv("LOCAL_EXTRACTION_MIN_COVERAGE", "1.0"))
+
+# --- Page routing: send Gemini only the pages with target sections (page_router.py) ---
+# Opt-in until the section rules have been checked against real statement layouts
+PAGE_ROUTING_ENABLED = os.getenv("PAGE_ROUTING_ENABLED", "0") == "1"
+# Statements shorter than this are always sent whole
+PAGE_ROUTING_MIN_PAGES = int(os.getenv("PAGE_ROUTING_MIN_PAGES", "4"))
+
+# --- Chunked extraction for long statements (0 disables) ---
+EXTRACTION_CHUNK_THRESHOLD_PAGES = int(os.getenv("EXTRACTION_CHUNK_THRESHOLD_PAGES", "40"))
+EXTRACTION_CHUNK_PAGES = int(os.getenv("EXTRACTION_CHUNK_PAGES", "20"))
+EXTRACTION_CHUNK_CONCURRENCY = int(os.getenv("EXTRACTION_CHUNK_CONCURRENCY", "4"))
+
+# "schema" passes the state.py models to Gemini as response_schema and validates the
+# reply in one pass; "raw" returns the model's JSON text as-is
+EXTRACTION_OUTPUT_MODE = os.getenv("EXTRACTION_OUTPUT_MODE", "raw")
+
+# "text" pre-extracts page text and tables locally (main.compact_pages) and sends them
+# inline instead of uploading the PDF; scanned PDFs without a text layer still go
+# through the upload. "pdf" always uploads.
+EXTRACTION_INPUT_MODE = os.getenv("EXTRACTION_INPUT_MODE", "pdf")
+
+# --- Gemini client ---
+# Cap on Gemini calls in flight across all requests (generate, upload and delete)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+# Threads for the blocking File API calls; generation itself is natively async
+GEMINI_IO_THREADS = int(os.getenv("GEMINI_IO_THREADS", "8"))
+
+# --- Uploaded file cleanup (background reaper) ---
+FILE_REAPER_ENABLED = os.getenv("FILE_REAPER_ENABLED", "1") == "1"
+FILE_REAPER_BATCH_SIZE = int(os.getenv("FILE_REAPER_BATCH_SIZE", "20"))
+FILE_REAPER_INTERVAL_S = float(os.getenv("FILE_REAPER_INTERVAL_S", "2"))
+# Startup sweep only deletes files older than this, so other live workers' uploads survive
+FILE_REAPER_STALE_S = int(os.getenv("FILE_REAPER_STALE_S", "900"))
+
+# --- /transform row batching ---
+TRANSFORM_BATCH_SIZE = max(1, int(os.getenv("TRANSFORM_BATCH_SIZE", "100")))
+TRANSFORM_MAX_CONCURRENCY = int(os.getenv("TRANSFORM_MAX_CONCURRENCY", "4"))
+# "compiled" turns mapping prompts into local transform programs where possible
+TRANSFORM_DEFAULT_MODE = os.getenv("TRANSFORM_DEFAULT_MODE", "llm")
+# Row-level result cache; set TRANSFORM_CACHE_PATH to persist it in SQLite across restarts
+TRANSFORM_CACHE_ENABLED = os.getenv("TRANSFORM_CACHE_ENABLED", "1") == "1"
+TRANSFORM_CACHE_MAX_ENTRIES = int(os.getenv("TRANSFORM_CACHE_MAX_ENTRIES", "50000"))
+TRANSFORM_CACHE_PATH = os.getenv("TRANSFORM_CACHE_PATH", "")
+
+# --- Background job queue (POST /jobs/extract) ---
+JOBS_DIR = os.getenv("JOBS_DIR", ".jobs")
+JOBS_DB_PATH = os.path.join(JOBS_DIR, "jobs.sqlite3")
+JOBS_INPUT_DIR = os.path.join(JOBS_DIR, "inputs")
+JOBS_WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+JOBS_MAX_QUEUED = int(os.getenv("JOBS_MAX_QUEUED", "1000"))
+JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+# A running job's lease; if its process stops renewing it for this long, another process may take the job over
+JOBS_LEASE_S = float(os.getenv("JOBS_LEASE_S", "60"))
+# Finished (done/failed) jobs and their results are deleted after this many seconds; 0 keeps them forever
+JOBS_RETENTION_S = float(os.getenv("JOBS_RETENTION_S", str(7 * 24 * 3600)))
+
 # --- FastAPI App Initialization ---
 app = FastAPI(
     title="Financial Statement Extraction API",
@@ -174,6 +266,24 @@ app.add_middleware(
 )
 # ---------------------------------------------------
 
+@app.middleware("http")
+async def request_context(request: Request, call_next):
+    """Tag the request with an ID (client-supplied X-Request-ID or a new one) and time it."""
+    rid = request.headers.get("x-request-id", "")[:64] or new_request_id()
+    token = request_id_var.set(rid)
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = rid
+        return response
+    finally:
+        # Label by route template, not raw path, to keep /jobs/{job_id} to one series
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_SECONDS.observe(time.perf_counter() - t0, method=request.method, route=route, status=str(status))
+        request_id_var.reset(token)
+
 # --- Prompt (unchanged) ---
 BASE_EXTRACTION_PROMPT = """
 You are a world-class financial data extraction AI. Your task is to analyze the provided PDF financial statement and extract all holdings and transactions with extreme accuracy. You must return a single JSON object that strictly follows the 'FinancialSecurityStatement' Pydantic schema.
@@ -221,59 +331,247 @@ All holdings and transactions for a specific account MUST be nested inside that
 Return ONLY the valid JSON object. Do not include any explanatory text or markdown formatting.
 """
 
+# Appended to the prompt when a long statement is extracted in page windows
+CHUNK_PROMPT_SUFFIX = """
+**Partial Document Notice:**
+This PDF contains only pages {pages} of a {total}-page statement. Extract everything that appears on these pages
+using the same structure. Repeat the account identifiers for every account whose holdings or transactions appear here,
+even if the account header was on an earlier page.
+"""
+
+# Appended to the prompt when the statement is sent as pre-extracted text (EXTRACTION_INPUT_MODE=text)
+TEXT_PROMPT_SUFFIX = """
+**Input Format Notice:**
+Instead of the PDF you are given text extracted from it. Each page starts with a line `=== PAGE n ===`, followed by
+the page's text outside any tables. Each table on the page follows as a line `--- TABLE n.k ---` and then one line per
+table row with the cells separated by tab characters (the first row is usually the header). Table contents appear only
+in the table blocks, not in the page text. Treat this exactly as you would treat the document itself.
+"""
+
+RESPONSE_SCHEMA = state.llm_response_schema()
+
 class PDFProcessor:
     def __init__(self, model_name: str = "gemini-2.0-flash"):
+        self.model_name = model_name
         self.model = genai.GenerativeModel(model_name)
+        # Dedicated pool so File API calls don't compete with asyncio.to_thread work
+        # (PDF parsing, cache I/O) for the default executor's threads
+        self._io_executor = ThreadPoolExecutor(max_workers=GEMINI_IO_THREADS, thread_name_prefix="gemini-io")
+        self._slots = asyncio.Semaphore(GEMINI_MAX_CONCURRENCY)
+
+    async def run_blocking(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking SDK call (upload/delete) on the Gemini I/O pool, within the concurrency cap."""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)  # keep the request ID
+        async with self._slots:
+            return await loop.run_in_executor(self._io_executor, call)
+
+    async def generate(self, contents: Any, generation_config: Any, timeout: float) -> Any:
+        """Native async generate_content (no thread per call), within the concurrency cap."""
+        async with self._slots:
+            return await self.model.generate_content_async(
+                contents,
+                generation_config=generation_config,
+                request_options={"timeout": timeout},
+            )
 
-    async def extract_from_pdf(self, pdf_bytes: bytes) -> str:
+    async def extract_from_pdf(
+        self, pdf: Union[str, bytes], prompt: str = BASE_EXTRACTION_PROMPT, structured: bool = False
+    ) -> str:
         """
-        Uploads the PDF to Gemini and returns the RAW JSON string that Gemini outputs.
-        No Pydantic / schema validation.
+        Uploads the PDF (a spooled file path or in-memory bytes) to Gemini and returns
+        the RAW JSON string that Gemini outputs.
+        With structured=True the reply is constrained to state.llm_response_schema();
+        validation is still left to the caller.
         """
         uploaded_file = None
-        temp_pdf_path = None
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(pdf_bytes)
-            temp_pdf_path = temp_pdf.name
 
         try:
-            print("Uploading temporary PDF to Google AI File API...")
-            uploaded_file = await asyncio.to_thread(
-                genai.upload_file, path=temp_pdf_path, display_name="statement.pdf"
-            )
-            print(f"File uploaded: {uploaded_file.name}")
-
-            generation_config = genai.GenerationConfig(response_mime_type="application/json")
-
-            print("Sending request to Gemini for extraction...")
-            response = await asyncio.to_thread(
-                self.model.generate_content,
-                [BASE_EXTRACTION_PROMPT, uploaded_file],
-                generation_config=generation_config,
-                request_options={"timeout": 600}
-            )
+            # Upload from the spool file or straight from memory; no extra temp-file copy
+            log("Uploading PDF to Google AI File API...")
+            with stage_timer("extract", "upload"):
+                uploaded_file = await self.run_blocking(
+                    genai.upload_file,
+                    path=io.BytesIO(pdf) if isinstance(pdf, bytes) else pdf,
+                    mime_type="application/pdf",
+                    display_name=f"{DISPLAY_NAME_PREFIX}statement.pdf",
+                )
+            log(f"File uploaded: {uploaded_file.name}")
+
+            log("Sending request to Gemini for extraction...")
+            with stage_timer("extract", "generate"):
+                response = await self.generate(
+                    [prompt, uploaded_file], _extraction_config(structured), timeout=600
+                )
+            _record_prompt_tokens(response, "pdf")
 
             raw_json_output = response.text or ""
-            print("Received response from Gemini (raw).")
+            log("Received response from Gemini (raw).")
             return raw_json_output
 
         except Exception as e:
-            print(f"ERROR during Gemini processing: {e}")
+            log(f"ERROR during Gemini processing: {e}")
             traceback.print_exc()
             raise HTTPException(status_code=500, detail="An internal error occurred during AI processing.")
         finally:
-            # Cleanup uploaded files from Google and local disk
-            if uploaded_file:
+            # Cleanup uploaded file from Google, off the response path when the reaper runs
+            if uploaded_file and file_reaper is not None:
+                file_reaper.schedule(uploaded_file.name)
+            elif uploaded_file:
                 try:
-                    await asyncio.to_thread(genai.delete_file, uploaded_file.name)
-                    print(f"Deleted uploaded file from Google AI: {uploaded_file.name}")
+                    with stage_timer("extract", "cleanup"):
+                        await self.run_blocking(genai.delete_file, uploaded_file.name)
+                    log(f"Deleted uploaded file from Google AI: {uploaded_file.name}")
                 except Exception as e:
-                    print(f"Warning: Failed to delete Google AI file {uploaded_file.name}. Error: {e}")
-            if temp_pdf_path and os.path.exists(temp_pdf_path):
-                os.remove(temp_pdf_path)
-                print(f"Deleted temporary local file: {temp_pdf_path}")
+                    log(f"Warning: Failed to delete Google AI file {uploaded_file.name}. Error: {e}")
 
+    async def extract_from_text(
+        self, text: str, prompt: str = BASE_EXTRACTION_PROMPT, structured: bool = False
+    ) -> str:
+        """
+        Sends text pre-extracted by main.compact_pages() inline with the prompt (no File
+        API upload) and returns the RAW JSON string that Gemini outputs.
+        """
+        try:
+            log(f"Sending {len(text)} chars of pre-extracted text to Gemini for extraction...")
+            with stage_timer("extract", "generate_text"):
+                response = await self.generate(
+                    [prompt + TEXT_PROMPT_SUFFIX, text], _extraction_config(structured), timeout=600
+                )
+            _record_prompt_tokens(response, "text")
+            log("Received response from Gemini (raw).")
+            return response.text or ""
+        except Exception as e:
+            log(f"ERROR during Gemini processing: {e}")
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail="An internal error occurred during AI processing.")
+
+    async def extract_from_pdf_chunked(
+        self,
+        pdf: Union[str, bytes],
+        pages_per_chunk: int,
+        max_concurrency: int,
+        structured: bool = False,
+        page_numbers: Optional[List[int]] = None,
+        total_pages: Optional[int] = None,
+    ) -> str:
+        """
+        Splits a long PDF into page windows (cut at account/section boundaries where
+        possible), extracts the windows concurrently (at most `max_concurrency` Gemini
+        calls in flight) and merges the partial results through
+        state.FinancialSecurityStatement, deduplicating accounts by account_id.
+
+        When `pdf` holds only some pages of the statement (page routing),
+        `page_numbers` are their 1-based numbers in the original document and
+        `total_pages` its length, so each window's prompt names the real pages.
+
+        Returns the merged canonical JSON string.
+        """
+        with stage_timer("extract", "page_texts"):
+            texts = await asyncio.to_thread(page_texts, pdf)
+
+        async def extract_window(start: int, end: int, prompt: str) -> str:
+            chunk_bytes = await asyncio.to_thread(slice_pdf, pdf, range(start, end))
+            return await self.extract_from_pdf(chunk_bytes, prompt=prompt, structured=structured)
+
+        return await self._extract_windows(
+            texts, pages_per_chunk, max_concurrency, extract_window, structured, page_numbers, total_pages
+        )
+
+    async def extract_from_text_chunked(
+        self,
+        pages: List[str],
+        pages_per_chunk: int,
+        max_concurrency: int,
+        structured: bool = False,
+        page_numbers: Optional[List[int]] = None,
+        total_pages: Optional[int] = None,
+    ) -> str:
+        """Chunked extraction over main.compact_pages() output; same windows and merge as the PDF variant."""
+
+        async def extract_window(start: int, end: int, prompt: str) -> str:
+            return await self.extract_from_text("\n\n".join(pages[start:end]), prompt=prompt, structured=structured)
+
+        return await self._extract_windows(
+            pages, pages_per_chunk, max_concurrency, extract_window, structured, page_numbers, total_pages
+        )
+
+    async def _extract_windows(
+        self,
+        texts: List[str],
+        pages_per_chunk: int,
+        max_concurrency: int,
+        extract_window: Callable[[int, int, str], Awaitable[str]],
+        structured: bool,
+        page_numbers: Optional[List[int]] = None,
+        total_pages: Optional[int] = None,
+    ) -> str:
+        numbers = page_numbers or list(range(1, len(texts) + 1))
+        total = total_pages or len(texts)
+        windows = plan_page_windows(texts, pages_per_chunk)
+        log(f"Chunked extraction: {len(texts)} pages in {len(windows)} windows {windows}")
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_window(start: int, end: int):
+            async with semaphore:
+                label = _page_label(numbers[start:end])
+                prompt = BASE_EXTRACTION_PROMPT + CHUNK_PROMPT_SUFFIX.format(pages=label, total=total)
+                try:
+                    raw = await extract_window(start, end, prompt)
+                except HTTPException:
+                    # One retry per window; a persistent failure fails the whole request
+                    log(f"Retrying pages {label} after a failed attempt...")
+                    raw = await extract_window(start, end, prompt)
+                if structured:
+                    return state.FinancialSecurityStatement.from_structured_json(raw)
+                return raw
+
+        parts = await asyncio.gather(*(run_window(start, end) for start, end in windows))
+        with stage_timer("extract", "merge"):
+            merged = state.FinancialSecurityStatement.merge(list(parts))
+            return merged.model_dump_json()
+
+
+def _page_label(numbers: List[int]) -> str:
+    """1-based page numbers as compact ranges: [3, 5, 6, 7, 10] -> "3, 5-7, 10"."""
+    spans: List[List[int]] = []
+    for n in numbers:
+        if spans and n == spans[-1][1] + 1:
+            spans[-1][1] = n
+        else:
+            spans.append([n, n])
+    return ", ".join(str(a) if a == b else f"{a}-{b}" for a, b in spans)
+
+
+def _extraction_config(structured: bool) -> Any:
+    if structured:
+        return genai.GenerationConfig(response_mime_type="application/json", response_schema=RESPONSE_SCHEMA)
+    return genai.GenerationConfig(response_mime_type="application/json")
+
+
+def _extraction_prompt_text(chunked: bool, text_input: bool, structured: bool) -> str:
+    """
+    The instructions an extraction in this mode sends, for the cache key: the base prompt
+    plus the chunk notice (as its template; page numbers follow from the PDF), the text
+    input notice and, in schema mode, the response schema.
+    """
+    prompt = BASE_EXTRACTION_PROMPT
+    if chunked:
+        prompt += CHUNK_PROMPT_SUFFIX
+    if text_input:
+        prompt += TEXT_PROMPT_SUFFIX
+    if structured:
+        prompt += json.dumps(RESPONSE_SCHEMA, sort_keys=True)
+    return prompt
+
+
+def _record_prompt_tokens(response: Any, input_mode: str) -> None:
+    usage = getattr(response, "usage_metadata", None)
+    tokens = getattr(usage, "prompt_token_count", None)
+    if tokens:
+        PROMPT_TOKENS.observe(tokens, input=input_mode)
+        log(f"Prompt tokens ({input_mode}): {tokens}")
 
 
 class TransformPayload(BaseModel):
@@ -285,6 +583,7 @@ class TransformPayload(BaseModel):
       - scope: "section" | "row" (default "section")
       - row_ui_id: required when scope == "row"
       - issuer: optional, for context only
+      - mode: "llm" | "compiled" (default from TRANSFORM_DEFAULT_MODE, "llm")
     """
     issuer: Optional[str] = None
     entityType: Literal["holding", "transaction"]
@@ -292,6 +591,7 @@ class TransformPayload(BaseModel):
     mappingPrompt: str
     scope: Literal["section", "row"] = "section"
     row_ui_id: Optional[str] = None
+    mode: Optional[Literal["llm", "compiled"]] = None
 
 
 TRANSFORM_SYSTEM_PROMPT = """
@@ -316,27 +616,297 @@ Rules:
 
 # --- API Endpoint ---
 processor = PDFProcessor()
+extraction_cache = (
+    ExtractionCache(
+        EXTRACTION_CACHE_DIR,
+        max_bytes=EXTRACTION_CACHE_MAX_MB * 1024 * 1024,
+        max_age_seconds=EXTRACTION_CACHE_MAX_AGE_S,
+    )
+    if EXTRACTION_CACHE_ENABLED
+    else None
+)
+
+async def _no_progress(stage: str, progress: float) -> None:
+    return None
+
+
+async def run_extraction(
+    pdf_path: str,
+    sha256: str,
+    report: Callable[[str, float], Awaitable[None]] = _no_progress,
+) -> Tuple[str, Dict[str, str]]:
+    """
+    Full extraction pipeline for one spooled PDF: cache -> page routing -> local rules -> Gemini
+    (chunked for long statements). Shared by /extract and the background job queue.
+
+    Returns (json_string, info) where info carries the cache/engine response headers.
+    """
+    structured = EXTRACTION_OUTPUT_MODE == "schema"
+    text_input = EXTRACTION_INPUT_MODE == "text"
+    chunked = False
+    if EXTRACTION_CHUNK_THRESHOLD_PAGES > 0:
+        await report("counting_pages", 0.05)
+        try:
+            with stage_timer("extract", "page_count"):
+                chunked = await asyncio.to_thread(page_count, pdf_path) > EXTRACTION_CHUNK_THRESHOLD_PAGES
+        except Exception as e:
+            log(f"Warning: could not count pages, extracting in one call. Error: {e}")
+
+    key = None
+    if extraction_cache is not None:
+        await report("cache_lookup", 0.1)
+        variant = f"chunked:{EXTRACTION_CHUNK_PAGES}" if chunked else ""
+        if structured:
+            variant += "|schema"
+        if text_input:
+            variant += "|text"
+        if PAGE_ROUTING_ENABLED:
+            variant += "|routed"
+        if LOCAL_EXTRACTION_ENABLED:
+            variant += f"|local:{LOCAL_EXTRACTION_MIN_COVERAGE}"
+        prompt_text = _extraction_prompt_text(chunked, text_input, structured)
+        key = cache_key(sha256, processor.model_name, prompt_text, variant)
+        with stage_timer("extract", "cache_lookup"):
+            cached = await asyncio.to_thread(extraction_cache.get, key)
+        if cached is not None:
+            log(f"Extraction cache hit: {key[:12]}")
+            return cached, {"X-Extraction-Cache": "hit"}
+
+    route = None
+    if PAGE_ROUTING_ENABLED:
+        await report("page_routing", 0.15)
+        try:
+            with stage_timer("extract", "route"):
+                route = route_texts(await asyncio.to_thread(page_texts, pdf_path))
+        except Exception as e:
+            log(f"Warning: page routing failed, sending every page. Error: {e}")
+        if route is not None and (route.total < PAGE_ROUTING_MIN_PAGES or not route.skipped):
+            route = None
+        if route is not None:
+            log(f"Page routing: processing {len(route.pages)} of {route.total} pages, sections {route.sections}")
+            if EXTRACTION_CHUNK_THRESHOLD_PAGES > 0:
+                chunked = len(route.pages) > EXTRACTION_CHUNK_THRESHOLD_PAGES
+
+    if LOCAL_EXTRACTION_ENABLED:
+        await report("local_rules", 0.2)
+        try:
+            with stage_timer("extract", "local_rules"):
+                local = await asyncio.to_thread(
+                    extract_locally, pdf_path, route.pages if route else None, LOCAL_EXTRACTION_MIN_COVERAGE
+                )
+        except Exception as e:
+            log(f"Warning: local extraction failed, falling back to Gemini. Error: {e}")
+            local = None
+        if local is not None:
+            rule_name, statement = local
+            log(f"Extracted locally with rule set '{rule_name}'.")
+            raw = statement.model_dump_json()
+            if key is not None:
+                await asyncio.to_thread(extraction_cache.put, key, raw)
+            return raw, {"X-Extraction-Cache": "miss", "X-Extraction-Engine": f"local:{rule_name}"}
+
+    pages = None
+    if text_input:
+        await report("pre_extract", 0.25)
+        try:
+            with stage_timer("extract", "pre_extract"):
+                pages = await asyncio.to_thread(compact_pages, pdf_path, route.pages if route else None)
+        except Exception as e:
+            log(f"Warning: text pre-extraction failed, uploading the PDF instead. Error: {e}")
+        if pages is not None and not has_text_layer(pages):
+            log("No text layer found (scanned PDF?), uploading the PDF instead.")
+            pages = None
+    engine = "gemini:text" if pages is not None else "gemini"
+
+    await report("gemini", 0.3)
+    # Routed pages are renumbered in the slice; chunk prompts name the original pages
+    page_numbers = [p + 1 for p in route.pages] if route is not None else None
+    total_pages = route.total if route is not None else None
+    if pages is not None and chunked:
+        raw = await processor.extract_from_text_chunked(
+            pages, EXTRACTION_CHUNK_PAGES, EXTRACTION_CHUNK_CONCURRENCY, structured=structured,
+            page_numbers=page_numbers, total_pages=total_pages,
+        )
+    elif pages is not None:
+        raw = await processor.extract_from_text("\n\n".join(pages), structured=structured)
+    else:
+        source: Union[str, bytes] = pdf_path
+        if route is not None:
+            with stage_timer("extract", "slice"):
+                source = await asyncio.to_thread(slice_pdf, pdf_path, route.pages)
+        if chunked:
+            raw = await processor.extract_from_pdf_chunked(
+                source, EXTRACTION_CHUNK_PAGES, EXTRACTION_CHUNK_CONCURRENCY, structured=structured,
+                page_numbers=page_numbers, total_pages=total_pages,
+            )
+        else:
+            raw = await processor.extract_from_pdf(source, structured=structured)
+    if structured and not chunked:
+        with stage_timer("extract", "parse"):
+            statement = await asyncio.to_thread(state.FinancialSecurityStatement.from_structured_json, raw)
+            raw = statement.model_dump_json()
+
+    # Only cache parseable output so a malformed model reply is retried next time
+    if key is not None:
+        if structured:
+            parseable = True  # already validated and re-serialized above
+        else:
+            with stage_timer("extract", "parse"):
+                parseable = _safe_json_loads(raw) is not None
+        if parseable:
+            await asyncio.to_thread(extraction_cache.put, key, raw)
+
+    return raw, {"X-Extraction-Cache": "miss", "X-Extraction-Engine": engine}
+
 
 # NOTE: response_model REMOVED so FastAPI doesn’t validate output
 @app.post("/extract")
-async def extract_data(file: UploadFile = File(...)):
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Invalid file type. Only PDF is supported.")
+async def extract_data(request: Request):
+    """
+    Multipart upload with a `file` field (PDF). The body is streamed to a spool file
+    and hashed on the fly (see uploads.py) instead of being read into memory.
+    """
+    with stage_timer("extract", "spool"):
+        upload = await receive_pdf_upload(request, max_bytes=MAX_UPLOAD_MB * 1024 * 1024)
     try:
-        pdf_bytes = await file.read()
-        raw = await processor.extract_from_pdf(pdf_bytes)
-        # Return the raw JSON string exactly as produced by the model
-        return Response(content=raw, media_type="application/json")
+        raw, info = await run_extraction(upload.path, upload.sha256)
+        # Return the JSON string exactly as produced (raw model output for Gemini)
+        return Response(content=raw, media_type="application/json", headers=info)
     except HTTPException as e:
         raise
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+    finally:
+        upload.cleanup()
+
+
+# --- Background extraction jobs ---
+async def _run_extraction_job(job: Dict[str, Any], report: Callable[[str, float], Awaitable[None]]) -> Tuple[str, Dict[str, str]]:
+    request_id_var.set(f"job-{job['id'][:12]}")  # log lines of this job carry its ID
+    return await run_extraction(job["input_path"], job["sha256"], report)
+
+os.makedirs(JOBS_INPUT_DIR, exist_ok=True)
+job_store = JobStore(JOBS_DB_PATH, lease_s=JOBS_LEASE_S)
+transform_programs = ProgramCache()
+transform_row_cache = (
+    TransformRowCache(TRANSFORM_CACHE_MAX_ENTRIES, TRANSFORM_CACHE_PATH or None)
+    if TRANSFORM_CACHE_ENABLED else None
+)
+job_queue = JobQueue(
+    job_store,
+    _run_extraction_job,
+    workers=JOBS_WORKERS,
+    max_attempts=JOBS_MAX_ATTEMPTS,
+    retention_s=JOBS_RETENTION_S,
+)
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+
+# --- Background deletion of uploaded Gemini files ---
+async def _list_uploaded_files() -> List[Any]:
+    return await processor.run_blocking(lambda: list(genai.list_files()))
+
+file_reaper = (
+    FileReaper(
+        delete=lambda name: processor.run_blocking(genai.delete_file, name),
+        list_files=_list_uploaded_files,
+        batch_size=FILE_REAPER_BATCH_SIZE,
+        interval_s=FILE_REAPER_INTERVAL_S,
+    )
+    if FILE_REAPER_ENABLED
+    else None
+)
+
+@app.on_event("startup")
+async def start_file_reaper():
+    if file_reaper is not None:
+        await file_reaper.start()
+        # Sweep in the background; listing files must not delay startup
+        asyncio.create_task(file_reaper.sweep(FILE_REAPER_STALE_S))
+
+@app.on_event("shutdown")
+async def stop_file_reaper():
+    if file_reaper is not None:
+        await file_reaper.stop()
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "progress": job["progress"],
+        "filename": job["filename"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "error": job["error"],
+        **({"info": json.loads(job["meta"])} if job.get("meta") else {}),
+    }
+
+@app.post("/jobs/extract", status_code=202)
+async def submit_extract_job(request: Request):
+    """
+    Queue an extraction and return immediately with a job ID. Poll GET /jobs/{id}
+    for status/progress and fetch the JSON from GET /jobs/{id}/result.
+    """
+    if await asyncio.to_thread(job_store.count, QUEUED) >= JOBS_MAX_QUEUED:
+        raise HTTPException(status_code=429, detail="Too many queued extraction jobs; retry later.")
+
+    # Spool straight into the jobs directory so the input survives a restart
+    upload = await receive_pdf_upload(request, max_bytes=MAX_UPLOAD_MB * 1024 * 1024, spool_dir=JOBS_INPUT_DIR)
+    try:
+        job_id = await asyncio.to_thread(job_store.create, "extract", upload.path, upload.filename, upload.sha256)
+    except Exception:
+        upload.cleanup()
+        raise
+
+    job_queue.notify()
+    return {"job_id": job_id, "status": QUEUED}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return _job_status(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = await asyncio.to_thread(job_store.get, job_id, True)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    if job["status"] == FAILED:
+        raise HTTPException(status_code=500, detail=f"Job failed: {job['error']}")
+    if job["status"] != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']} ({job['stage']}).")
+    info = json.loads(job["meta"]) if job.get("meta") else {}
+    return Response(content=job["result"], media_type="application/json", headers=info)
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format: per-stage, per-page and per-route latency histograms."""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def cache_stats():
+    rows = transform_row_cache.stats() if transform_row_cache is not None else {"enabled": False}
+    securities = security_cache_stats()
+    if extraction_cache is None:
+        return {"enabled": False, "transform_rows": rows, "securities": securities}
+    return {"enabled": True, **extraction_cache.stats(), "transform_rows": rows, "securities": securities}
+
 
 def _safe_json_loads(s: str):
     try:
@@ -356,6 +926,66 @@ def _reinject_missing_ui_ids(original: List[dict], transformed: List[dict]) -> L
     return out
 
 
+async def _transform_batch(mapping_rules: str, rows: List[dict]) -> Tuple[Optional[List[dict]], Optional[str], str]:
+    """
+    Send one batch of rows through the model.
+
+    Returns (transformed_rows, None, raw) on success, or (None, note, raw) when the
+    model output fails the guardrails and this batch should pass through unchanged.
+    """
+    content = [
+        TRANSFORM_SYSTEM_PROMPT,
+        f"MAPPING_RULES:\n{mapping_rules}\n\nINPUT_ROWS:\n{json.dumps(rows, ensure_ascii=False)}"
+    ]
+
+    generation_config = genai.GenerationConfig(response_mime_type="application/json")
+    try:
+        with stage_timer("transform", "generate"):
+            response = await processor.generate(content, generation_config, timeout=180)
+    except Exception as e:
+        traceback.print_exc()
+        return None, f"Model call failed ({e}); passthrough.", ""
+    raw = (response.text or "").strip()
+
+    with stage_timer("transform", "parse"):
+        parsed = _safe_json_loads(raw)
+
+    # Guardrails: must be a list of objects with the same length as the batch
+    if not isinstance(parsed, list):
+        return None, "Model did not return a JSON array; passthrough.", raw
+    if len(parsed) != len(rows):
+        return None, "Model changed row count; passthrough.", raw
+    if any(not isinstance(x, dict) for x in parsed):
+        return None, "Model output not an array of objects; passthrough.", raw
+    return parsed, None, raw
+
+
+async def _compiled_program(mapping_rules: str, entity_type: str) -> Optional[TransformProgram]:
+    """Cached program for these rules, compiling it with one model call on a miss."""
+    key = program_key(mapping_rules, entity_type)
+    found, program = transform_programs.lookup(key)
+    if found:
+        return program
+
+    generation_config = genai.GenerationConfig(response_mime_type="application/json")
+    try:
+        with stage_timer("transform", "compile"):
+            response = await processor.generate(
+                [COMPILE_SYSTEM_PROMPT, f"ENTITY_TYPE: {entity_type}\n\nMAPPING_RULES:\n{mapping_rules}"],
+                generation_config,
+                timeout=60,
+            )
+        program = parse_program((response.text or "").strip())
+    except Exception as e:
+        # Don't cache transient failures; try compiling again next time
+        log(f"Warning: transform compile failed, using per-row LLM path. Error: {e}")
+        return None
+
+    transform_programs.store(key, program)
+    log(f"Transform program {'compiled' if program else 'not compilable'}: {key[:12]}")
+    return program
+
+
 @app.post("/transform")
 async def transform_section(payload: TransformPayload):
     """
@@ -363,8 +993,16 @@ async def transform_section(payload: TransformPayload):
     Backward compatible with the old payload shape.
 
     Response shape (unchanged for your frontend):
-      { success: bool, data: [...], fallback: bool, note?: str, model_raw?: str }
+      { success: bool, data: [...], fallback: bool, note?: str, model_raw?: str,
+        engine?: "llm" | "compiled", program?: {...}, batches?: int, failed_batches?: [int],
+        cache?: {hits: int, misses: int} }
     - data is ALWAYS the full final section array so the UI can render it directly.
+    - Rows are sent in batches of TRANSFORM_BATCH_SIZE; rows of a failed batch are
+      passed through unchanged and listed in failed_batches / note.
+    - mode="compiled" compiles the prompt once into a local program (cached by prompt
+      hash + entityType) and falls back to the LLM path when it can't be compiled.
+    - On the LLM path, rows already transformed under the same rules and entityType are
+      served from the row cache; only misses are sent to the model.
     """
     try:
         # Empty items -> passthrough
@@ -404,64 +1042,114 @@ async def transform_section(payload: TransformPayload):
                 "note": "Empty mapping prompt; passthrough.",
             }
 
-        # Build model input
-        model = processor.model  # reuse your existing model instance
-        content = [
-            TRANSFORM_SYSTEM_PROMPT,
-            f"MAPPING_RULES:\n{mapping_rules}\n\nINPUT_ROWS:\n{json.dumps(llm_rows, ensure_ascii=False)}"
-        ]
-
-        generation_config = genai.GenerationConfig(response_mime_type="application/json")
-        response = await asyncio.to_thread(
-            model.generate_content,
-            content,
-            generation_config=generation_config,
-            request_options={"timeout": 180},
-        )
-        raw = (response.text or "").strip()
-
-        parsed = _safe_json_loads(raw)
+        # Compiled mode: turn the prompt into a local program once, then run it on every row
+        program = None
+        if (payload.mode or TRANSFORM_DEFAULT_MODE) == "compiled":
+            program = await _compiled_program(mapping_rules, payload.entityType)
 
-        # Guardrails: must be a list with same length as llm_rows
-        if not isinstance(parsed, list):
-            return {
-                "success": True,
-                "data": payload.items,
-                "fallback": True,
-                "note": "Model did not return a JSON array; passthrough.",
-                "model_raw": raw[:1200],
-            }
-        if len(parsed) != len(llm_rows):
-            return {
-                "success": True,
-                "data": payload.items,
-                "fallback": True,
-                "note": "Model changed row count; passthrough.",
-                "model_raw": raw[:1200],
-            }
-        if any(not isinstance(x, dict) for x in parsed):
+        batches: List[List[dict]] = []
+        failed = []  # (batch_index, note, raw)
+        cache_hits = 0
+        if program is not None:
+            transformed = apply_program(program, llm_rows)
+        else:
+            # Rows already transformed under the same rules come from the row cache;
+            # only the misses are sent to the model.
+            keys = [row_cache_key(mapping_rules, payload.entityType, r) for r in llm_rows]
+            cached: Dict[str, dict] = {}
+            if transform_row_cache is not None:
+                with stage_timer("transform", "cache_lookup"):
+                    cached = await asyncio.to_thread(transform_row_cache.get_many, keys)
+            miss_idx = [i for i, k in enumerate(keys) if k not in cached]
+            miss_rows = [llm_rows[i] for i in miss_idx]
+            cache_hits = len(llm_rows) - len(miss_rows)
+
+            # Split into row batches and transform them concurrently; a failed batch
+            # falls back to its own original rows instead of failing the whole section.
+            batches = [miss_rows[i:i + TRANSFORM_BATCH_SIZE] for i in range(0, len(miss_rows), TRANSFORM_BATCH_SIZE)]
+            semaphore = asyncio.Semaphore(TRANSFORM_MAX_CONCURRENCY)
+
+            async def run_batch(batch: List[dict]):
+                async with semaphore:
+                    return await _transform_batch(mapping_rules, batch)
+
+            results = await asyncio.gather(*(run_batch(b) for b in batches))
+
+            miss_out: List[dict] = []
+            to_cache = []
+            for i, (batch, (parsed, note, raw)) in enumerate(zip(batches, results)):
+                if parsed is None:
+                    failed.append((i, note, raw))
+                    miss_out.extend(batch)
+                    continue
+                # Ensure _ui_id stays present
+                out = _reinject_missing_ui_ids(batch, parsed)
+                miss_out.extend(out)
+                # _transform_batch guarantees the row count; a reordered answer shows up as
+                # _ui_ids out of place, and then rows cannot be matched to their cache keys
+                if all(o.get("_ui_id") == b.get("_ui_id") for o, b in zip(out, batch)):
+                    start = i * TRANSFORM_BATCH_SIZE
+                    for j, row in enumerate(out):
+                        key = keys[miss_idx[start + j]]
+                        to_cache.append((key, {k: v for k, v in row.items() if k != "_ui_id"}))
+            if transform_row_cache is not None and to_cache:
+                await asyncio.to_thread(transform_row_cache.put_many, to_cache)
+
+            # Reassemble in the original row order. _transform_batch rejects any change in
+            # row count, so miss_out has exactly one row per entry of miss_idx.
+            fresh = dict(zip(miss_idx, miss_out))
+            transformed = []
+            for i, (row, key) in enumerate(zip(llm_rows, keys)):
+                if i in fresh:
+                    transformed.append(fresh[i])
+                else:
+                    hit = dict(cached[key])
+                    if "_ui_id" in row:
+                        hit["_ui_id"] = row["_ui_id"]
+                    transformed.append(hit)
+
+        if batches and len(failed) == len(batches) and not cache_hits:
+            # Nothing transformed: same response as the single-call path
+            _i, note, raw = failed[0]
             return {
                 "success": True,
                 "data": payload.items,
                 "fallback": True,
-                "note": "Model output not an array of objects; passthrough.",
+                "note": note,
                 "model_raw": raw[:1200],
+                "batches": len(batches),
+                "failed_batches": [i for i, _n, _r in failed],
+                "cache": {"hits": cache_hits, "misses": len(llm_rows) - cache_hits},
             }
 
-        # Ensure _ui_id stays present
-        parsed = _reinject_missing_ui_ids(llm_rows, parsed)
-
         # If this was a row-scope transform, merge back into the full section
         if payload.scope == "row":
             final_rows = list(payload.items)
-            final_rows[next(i for i, r in enumerate(payload.items) if r.get("_ui_id") == payload.row_ui_id)] = parsed[0]
+            final_rows[next(i for i, r in enumerate(payload.items) if r.get("_ui_id") == payload.row_ui_id)] = transformed[0]
             # Also make sure every row has its original _ui_id
             final_rows = _reinject_missing_ui_ids(payload.items, final_rows)
         else:
             # Section-wide result; also re-inject any missing _ui_id by index against the originals
-            final_rows = _reinject_missing_ui_ids(payload.items, parsed)
-
-        return {"success": True, "data": final_rows, "fallback": False}
+            final_rows = _reinject_missing_ui_ids(payload.items, transformed)
+
+        result = {
+            "success": True,
+            "data": final_rows,
+            "fallback": False,
+            "engine": "compiled" if program is not None else "llm",
+            "batches": len(batches),
+            "failed_batches": [i for i, _n, _r in failed],
+        }
+        if program is None:
+            result["cache"] = {"hits": cache_hits, "misses": len(llm_rows) - cache_hits}
+        if program is not None:
+            result["program"] = program.model_dump()
+        if failed:
+            result["note"] = (
+                f"{len(failed)} of {len(batches)} batches fell back to passthrough: "
+                + "; ".join(f"batch {i + 1}: {n}" for i, n, _r in failed)
+            )
+        return result
 
     except Exception as e:
         traceback.print_exc()
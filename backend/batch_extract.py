@@ -0,0 +1,388 @@
+# batch_extract.py
+
+"""
+Batch table extraction over many PDFs (month-end backfills), resumable.
+
+    python batch_extract.py statements/ "archive/2024-*/**/*.pdf" --outdir batch_out --workers 8
+
+Inputs are files, directories (searched recursively for *.pdf) or glob patterns.
+Each PDF runs in its own worker process with either engine:
+
+  camelot     camelot_csv.extract_all -> <outdir>/<stem>-<sha12>/ (CSVs + flavor_decisions.json);
+              with --format parquet / arrow every PDF instead adds its part file(s) to
+              one dataset for the batch, <outdir>/tables.parquet or tables.arrow
+  pdfplumber  main.extract_structured_content -> <outdir>/<stem>-<sha12>.json (the
+              document extract_structured_data_and_save writes)
+
+A worker that exceeds --timeout seconds is killed and the file is recorded as
+"timeout", so one pathological PDF cannot stall the batch. Worker output goes to a
+per-file .log next to the result instead of the console.
+
+Every attempt is appended to the manifest (<outdir>/manifest.jsonl by default) as one
+JSON line: input path, sha256, size, status (done / failed / timeout), engine and
+options, output, timings, page and table counts, error. A rerun skips inputs with a
+"done" record for the same options: by path, size and mtime without re-reading the
+file, or by content hash (so renamed or duplicate files are not extracted twice). The
+hash is computed in the file's worker process, so the scheduler never blocks on it.
+Failed and timed-out inputs are retried unless --skip-failed is given.
+"""
+
+import argparse
+import glob
+import hashlib
+import importlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+ENGINES = ("camelot", "pdfplumber")
+MANIFEST_FILE = "manifest.jsonl"
+DONE, FAILED, TIMEOUT = "done", "failed", "timeout"
+
+_HASH_CHUNK = 1 << 20
+
+
+def expand_inputs(specs: List[str]) -> List[str]:
+    """Absolute paths of the PDFs named by files, directories and glob patterns, deduplicated, in order."""
+    found: List[str] = []
+    for spec in specs:
+        if os.path.isdir(spec):
+            matches = sorted(glob.glob(os.path.join(spec, "**", "*.pdf"), recursive=True))
+            matches += sorted(glob.glob(os.path.join(spec, "**", "*.PDF"), recursive=True))
+        elif os.path.isfile(spec):
+            matches = [spec]
+        else:
+            matches = sorted(glob.glob(spec, recursive=True))
+        found.extend(os.path.abspath(m) for m in matches if os.path.isfile(m))
+    return list(dict.fromkeys(found))
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def options_key(engine: str, pages: str, flavor: str, fmt: str = "csv") -> str:
+    """What a "done" record must match to be reused; flavor and format only matter to camelot."""
+    key = f"{engine}|pages={pages}"
+    if engine == "camelot":
+        key += f"|flavor={flavor}" + (f"|format={fmt}" if fmt != "csv" else "")
+    return key
+
+
+class Manifest:
+    """Append-only JSONL log of attempts, indexed by path identity and content hash."""
+
+    def __init__(self, path: str):
+        self.path = path
+        # (options, path, size, mtime_ns) -> latest record, and (options, sha256) -> latest record
+        self.by_identity: Dict[Tuple[str, str, int, int], Dict[str, Any]] = {}
+        self.by_hash: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self._index(json.loads(line))
+                    except (ValueError, KeyError):
+                        continue  # a line cut short by a killed run
+        self._file = open(path, "a", encoding="utf-8")
+
+    def _index(self, record: Dict[str, Any]) -> None:
+        opts = record["options"]
+        self.by_identity[(opts, record["input"], record["size"], record["mtime_ns"])] = record
+        self.by_hash[(opts, record["sha256"])] = record
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._index(record)
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _output_path(outdir: str, engine: str, path: str, sha256: str) -> str:
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = f"{stem}-{sha256[:12]}"
+    return os.path.join(outdir, name if engine == "camelot" else f"{name}.json")
+
+
+def _extract_one(engine: str, path: str, output: str, pages: str, flavor: str, fmt: str) -> Dict[str, int]:
+    """Run one engine on one PDF; returns {"pages", "tables"}."""
+    if engine == "camelot":
+        from camelot_csv import DECISIONS_FILE, extract_all
+        from table_sinks import DATASET_DIRS
+
+        dataset_dir = os.path.join(os.path.dirname(output), DATASET_DIRS[fmt]) if fmt in DATASET_DIRS else None
+        tables = extract_all(
+            path, output, pages, workers=1, flavor=flavor, fmt=fmt,
+            source_file=path, dataset_dir=dataset_dir, part_prefix=os.path.basename(output) + "-",
+        )
+        with open(os.path.join(output, DECISIONS_FILE), "r", encoding="utf-8") as f:
+            return {"pages": json.load(f)["summary"]["pages"], "tables": tables}
+
+    from main import extract_structured_content
+    from pdf_pages import page_count
+
+    if pages == "relevant":
+        from page_router import route_pages
+
+        page_indices: Optional[List[int]] = route_pages(path).pages
+    elif pages == "all":
+        page_indices = None
+    else:
+        from camelot_csv import parse_pages_arg
+
+        page_indices = [p - 1 for p in parse_pages_arg(path, pages)]
+    data = extract_structured_content(path, page_indices)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    n_pages = page_count(path) if page_indices is None else len(page_indices)
+    return {"pages": n_pages, "tables": len(data["extracted_tables"])}
+
+
+def _log_path(engine: str, output: str) -> str:
+    return (output.rstrip(os.sep) if engine == "camelot" else os.path.splitext(output)[0]) + ".log"
+
+
+def _worker(
+    conn: Any, engine: str, path: str, outdir: str, pages: str, flavor: str, fmt: str, done_hashes: Dict[str, str]
+) -> None:
+    """
+    Process entry point. Hashes the file here, off the scheduler, and sends
+    ("hash", sha256, seconds); then ("skip", earlier_input) when that content is in
+    `done_hashes`, else ("ok", counts) or ("error", message), all through `conn`.
+    """
+    try:
+        t0 = time.perf_counter()
+        sha256 = file_sha256(path)
+        conn.send(("hash", sha256, time.perf_counter() - t0))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        conn.close()
+        return
+    if sha256 in done_hashes:
+        conn.send(("skip", done_hashes[sha256]))
+        conn.close()
+        return
+    output = _output_path(outdir, engine, path, sha256)
+    with open(_log_path(engine, output), "w", encoding="utf-8") as log_file:
+        # Redirect at the fd level so C libraries and subprocesses land in the log too
+        os.dup2(log_file.fileno(), 1)
+        os.dup2(log_file.fileno(), 2)
+        try:
+            conn.send(("ok", _extract_one(engine, path, output, pages, flavor, fmt)))
+        except Exception as e:
+            traceback.print_exc()
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            conn.close()
+
+
+class _Task:
+    def __init__(self, path: str, size: int, mtime_ns: int):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sha256 = ""
+        self.hash_seconds = 0.0
+        self.output = ""
+        self.log = ""
+        self.started = 0.0
+        self.process: Any = None
+        self.conn: Any = None
+
+
+def run_batch(
+    inputs: List[str],
+    outdir: str,
+    engine: str = "camelot",
+    workers: int = 1,
+    timeout: float = 300.0,
+    pages: str = "all",
+    flavor: str = "auto",
+    fmt: str = "csv",
+    manifest_path: Optional[str] = None,
+    skip_failed: bool = False,
+) -> Dict[str, int]:
+    """
+    Extract every PDF in `inputs` with up to `workers` processes; returns status counts
+    for this run ({"done", "failed", "timeout", "skipped"}).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+    if engine != "camelot" and fmt != "csv":
+        raise ValueError(f"--format {fmt} is only supported with the camelot engine")
+    os.makedirs(outdir, exist_ok=True)
+    manifest = Manifest(manifest_path or os.path.join(outdir, MANIFEST_FILE))
+    opts = options_key(engine, pages, flavor, fmt)
+    reusable = {DONE, FAILED, TIMEOUT} if skip_failed else {DONE}
+    counts = {DONE: 0, FAILED: 0, TIMEOUT: 0, "skipped": 0}
+    workers = max(1, workers)
+
+    # Import the engine once here so forked workers start with it loaded
+    if engine == "camelot":
+        import camelot_csv
+
+        if flavor not in camelot_csv.FLAVOR_MODES:
+            raise ValueError(f"flavor must be one of {camelot_csv.FLAVOR_MODES}, got {flavor!r}")
+        if fmt not in camelot_csv.FORMATS:
+            raise ValueError(f"format must be one of {camelot_csv.FORMATS}, got {fmt!r}")
+    else:
+        importlib.import_module("main")
+
+    pending: Deque[_Task] = deque()
+    for path in inputs:
+        st = os.stat(path)
+        previous = manifest.by_identity.get((opts, path, st.st_size, st.st_mtime_ns))
+        if previous is not None and previous["status"] in reusable:
+            counts["skipped"] += 1
+        else:
+            pending.append(_Task(path, st.st_size, st.st_mtime_ns))
+    print(f"Inputs: {len(inputs)} ({counts['skipped']} already in the manifest), engine: {opts}, workers: {workers}, timeout: {timeout}s")
+
+    # sha256 -> input of content already extracted with these options; the workers
+    # skip it. A duplicate of a file that is still in flight is extracted again.
+    done_hashes = {
+        sha: record["input"] for (o, sha), record in manifest.by_hash.items()
+        if o == opts and record["status"] in reusable
+    }
+
+    def finish(task: _Task, status: str, result: Optional[Dict[str, int]] = None, error: Optional[str] = None) -> None:
+        seconds = time.perf_counter() - task.started
+        manifest.append({
+            "input": task.path,
+            "sha256": task.sha256,
+            "size": task.size,
+            "mtime_ns": task.mtime_ns,
+            "options": opts,
+            "status": status,
+            "output": task.output,
+            "log": task.log,
+            "pages": (result or {}).get("pages"),
+            "tables": (result or {}).get("tables"),
+            "hash_seconds": round(task.hash_seconds, 3),
+            "seconds": round(seconds, 3),
+            "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "error": error,
+        })
+        counts[status] += 1
+        if status in reusable and task.sha256:
+            done_hashes[task.sha256] = task.path
+        detail = f"{result['tables']} tables / {result['pages']} pages" if result else error
+        print(f"[{sum(counts.values())}/{len(inputs)}] {status:<7} {seconds:6.1f}s  {task.path}  ({detail})")
+
+    def start(task: _Task) -> None:
+        """Launch the file's worker, which hashes it and skips content that is already done."""
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        task.conn = parent_conn
+        task.process = multiprocessing.Process(
+            target=_worker, args=(child_conn, engine, task.path, outdir, pages, flavor, fmt, done_hashes), daemon=True
+        )
+        task.started = time.perf_counter()
+        task.process.start()
+        child_conn.close()
+
+    running: List[_Task] = []
+    t_batch = time.perf_counter()
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                task = pending.popleft()
+                start(task)
+                running.append(task)
+
+            now = time.perf_counter()
+            next_deadline = min(t.started + timeout for t in running) - now
+            wait([t.conn for t in running] + [t.process.sentinel for t in running], timeout=max(0.0, next_deadline))
+
+            still_running = []
+            for task in running:
+                message = None
+                try:
+                    while task.conn.poll():
+                        message = task.conn.recv()
+                        if message[0] != "hash":
+                            break
+                        _kind, task.sha256, task.hash_seconds = message
+                        task.output = _output_path(outdir, engine, task.path, task.sha256)
+                        task.log = _log_path(engine, task.output)
+                        task.started = time.perf_counter()  # timeout and timing cover the extraction
+                        message = None
+                except EOFError:
+                    message = ("error", "worker closed its pipe without a result")
+                if message is not None:
+                    kind, payload = message
+                    task.process.join()
+                    if kind == "skip":
+                        counts["skipped"] += 1
+                        print(f"skip    {task.path} (same content as {payload})")
+                    elif kind == "ok":
+                        finish(task, DONE, result=payload)
+                    else:
+                        finish(task, FAILED, error=payload)
+                elif not task.process.is_alive():
+                    finish(task, FAILED, error=f"worker exited with code {task.process.exitcode}")
+                elif time.perf_counter() - task.started > timeout:
+                    task.process.kill()
+                    task.process.join()
+                    finish(task, TIMEOUT, error=f"killed after {timeout:g}s")
+                else:
+                    still_running.append(task)
+                    continue
+                task.conn.close()
+            running = still_running
+    finally:
+        for task in running:  # interrupted: do not leave workers behind
+            task.process.kill()
+        manifest.close()
+
+    elapsed = time.perf_counter() - t_batch
+    processed = counts[DONE] + counts[FAILED] + counts[TIMEOUT]
+    rate = f", {processed / elapsed:.2f} files/s" if processed and elapsed > 0 else ""
+    print(
+        f"Done in {elapsed:.1f}s{rate}: {counts[DONE]} done, {counts[FAILED]} failed, "
+        f"{counts[TIMEOUT]} timed out, {counts['skipped']} skipped"
+    )
+    return counts
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Extract tables from many PDFs in parallel, with a resumable manifest.")
+    ap.add_argument("inputs", nargs="+", help="PDF files, directories (searched recursively) or glob patterns")
+    ap.add_argument("--outdir", default="batch_out", help="Directory for per-file outputs and the manifest (default: batch_out)")
+    ap.add_argument("--engine", choices=ENGINES, default="camelot", help="camelot (CSV per table) or pdfplumber (JSON per PDF)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="PDFs processed in parallel (default: CPU count)")
+    ap.add_argument("--timeout", type=float, default=300.0, help="Seconds before a PDF's worker is killed (default: 300)")
+    ap.add_argument("--pages", default="all", help='Pages per PDF: "all", "relevant" or "1,3,5-7" (default: all)')
+    ap.add_argument("--flavor", default="auto", help="Camelot flavor mode, see camelot_csv.py (default: auto)")
+    ap.add_argument("--format", default="csv", help="camelot output: csv, or parquet / arrow for one dataset per batch (default: csv)")
+    ap.add_argument("--manifest", default=None, help=f"Manifest path (default: <outdir>/{MANIFEST_FILE})")
+    ap.add_argument("--skip-failed", action="store_true", help="Also skip inputs that failed or timed out before")
+    args = ap.parse_args()
+
+    inputs = expand_inputs(args.inputs)
+    if not inputs:
+        print(f"ERROR: No PDFs found in {args.inputs}")
+        sys.exit(1)
+
+    counts = run_batch(
+        inputs, args.outdir, engine=args.engine, workers=args.workers, timeout=args.timeout,
+        pages=args.pages, flavor=args.flavor, fmt=args.format, manifest_path=args.manifest, skip_failed=args.skip_failed,
+    )
+    sys.exit(1 if counts[FAILED] or counts[TIMEOUT] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# bench/bench_concurrency.py
+
+"""
+Concurrent-request load test for app.py against the fake Gemini.
+
+Fires N simultaneous requests at one endpoint in-process (httpx over ASGI) and reports
+how many generate_content calls were in flight at once. With the native async client
+the peak tracks the request count (up to GEMINI_MAX_CONCURRENCY) instead of stalling
+at the default thread pool size, and wall time stays close to one model latency.
+
+    python -m bench.bench_concurrency --levels 8,32,64,128 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+def _default_pool_size() -> int:
+    # ThreadPoolExecutor's default, which asyncio.to_thread uses
+    return min(32, (os.cpu_count() or 1) + 4)
+
+
+async def _fire(client: Any, endpoint: str, n: int, pdf: bytes) -> List[float]:
+    async def one(i: int) -> float:
+        t0 = time.perf_counter()
+        if endpoint == "extract":
+            r = await client.post("/extract", files={"file": (f"s{i}.pdf", pdf, "application/pdf")})
+        else:
+            r = await client.post("/transform", json={
+                "entityType": "holding",
+                "items": [{"_ui_id": f"r{i}", "isin": f"INE{i:09d}"}],
+                "mappingPrompt": "isin -> security_id",
+            })
+        r.raise_for_status()
+        return time.perf_counter() - t0
+
+    return await asyncio.gather(*(one(i) for i in range(n)))
+
+
+async def _run(levels: List[int], endpoint: str, fake: Any) -> List[Dict[str, Any]]:
+    import httpx
+    import app
+    from bench.synthetic_pdf import make_pdf
+
+    pdf = make_pdf(2)
+    results = []
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+        await _fire(client, endpoint, 1, pdf)  # warm-up
+        for n in levels:
+            fake.max_in_flight = 0
+            t0 = time.perf_counter()
+            latencies = sorted(await _fire(client, endpoint, n, pdf))
+            wall = time.perf_counter() - t0
+            results.append({
+                "requests": n,
+                "max_in_flight": fake.max_in_flight,
+                "wall_s": wall,
+                "p50_s": statistics.median(latencies),
+                "p95_s": latencies[max(0, int(round(0.95 * len(latencies))) - 1)],
+                "req_per_s": n / wall,
+            })
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Concurrent request load test against a fake Gemini.")
+    ap.add_argument("--levels", default="8,32,64,128", help="Comma-separated numbers of simultaneous requests")
+    ap.add_argument("--endpoint", choices=("transform", "extract"), default="transform")
+    ap.add_argument("--latency", type=float, default=0.5, help="Fake Gemini latency per call in seconds")
+    ap.add_argument("--cap", type=int, default=256, help="GEMINI_MAX_CONCURRENCY for this run (default: 256)")
+    ap.add_argument("--json", help="Optional path to write results as JSON")
+    args = ap.parse_args()
+
+    # Configure before app is imported
+    os.environ.setdefault("GOOGLE_API_KEY", "bench")
+    os.environ["GEMINI_MAX_CONCURRENCY"] = str(args.cap)
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "0"
+    os.environ["LOCAL_EXTRACTION_ENABLED"] = "0"
+    os.environ["TRANSFORM_CACHE_ENABLED"] = "0"
+    os.environ.setdefault("JOBS_DIR", tempfile.mkdtemp(prefix="bench-jobs-"))
+    from bench import fake_genai
+    fake = fake_genai.install(latency_s=args.latency)
+
+    levels = [int(x) for x in args.levels.split(",")]
+    results = asyncio.run(_run(levels, args.endpoint, fake))
+
+    print(f"default thread pool size: {_default_pool_size()}, GEMINI_MAX_CONCURRENCY: {args.cap}, latency: {args.latency}s")
+    print(f"{'requests':>8} {'max_in_flight':>13} {'wall_s':>7} {'p50_s':>7} {'p95_s':>7} {'req/s':>8}")
+    for r in results:
+        print(
+            f"{r['requests']:>8} {r['max_in_flight']:>13} {r['wall_s']:>7.2f} "
+            f"{r['p50_s']:>7.2f} {r['p95_s']:>7.2f} {r['req_per_s']:>8.1f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"default_pool_size": _default_pool_size(), "cap": args.cap, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
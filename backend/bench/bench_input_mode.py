@@ -0,0 +1,160 @@
+# bench/bench_input_mode.py
+
+"""
+PDF upload vs pre-extracted text (EXTRACTION_INPUT_MODE) for Gemini extraction.
+
+For each PDF (synthetic fixtures, or files passed with --pdf) this reports:
+
+  pre_extract_s   time for main.compact_pages (the extra local work text mode adds)
+  pdf_kb/text_kb  size of what is sent: the PDF upload vs the inline compact text
+  tokens          prompt tokens per mode. Offline these are estimates: ~4 chars per
+                  token for text, and Gemini's documented 258 tokens per PDF page
+                  (a lower bound; text-layer PDFs also bill the extracted text).
+                  With --live they come from model.count_tokens.
+  e2e_s           run_extraction wall time per mode, median of --repeat runs. Offline
+                  Gemini is bench/fake_genai.py with --latency per generate call and
+                  --upload-latency per upload_file call.
+
+    python -m bench.bench_input_mode --latency 1.0 --upload-latency 0.5
+    GOOGLE_API_KEY=... python -m bench.bench_input_mode --live --pdf statement.pdf
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+# name -> make_pdf kwargs
+FIXTURES: Dict[str, Dict[str, int]] = {
+    "small": {"pages": 3, "tables_per_page": 1, "rows_per_table": 20},
+    "medium": {"pages": 10, "tables_per_page": 2, "rows_per_table": 20},
+    "dense": {"pages": 10, "tables_per_page": 3, "rows_per_table": 40},
+}
+
+# Gemini bills each PDF page as one image of this many tokens
+_TOKENS_PER_PDF_PAGE = 258
+
+
+def _fixtures(paths: List[str], workdir: str) -> List[Tuple[str, str]]:
+    if paths:
+        return [(os.path.basename(p), p) for p in paths]
+    from bench.synthetic_pdf import make_pdf
+
+    out = []
+    for name, kwargs in FIXTURES.items():
+        path = os.path.join(workdir, f"{name}.pdf")
+        with open(path, "wb") as f:
+            f.write(make_pdf(**kwargs))
+        out.append((name, path))
+    return out
+
+
+async def _count_tokens(app: Any, path: str, text: str) -> Tuple[int, int]:
+    """Live prompt token counts for (pdf, text) via the real client."""
+    import google.generativeai as genai
+
+    model = app.processor.model
+    uploaded = genai.upload_file(path, mime_type="application/pdf", display_name=f"{app.DISPLAY_NAME_PREFIX}bench.pdf")
+    try:
+        pdf_tokens = model.count_tokens([app.BASE_EXTRACTION_PROMPT, uploaded]).total_tokens
+    finally:
+        genai.delete_file(uploaded.name)
+    text_tokens = model.count_tokens([app.BASE_EXTRACTION_PROMPT + app.TEXT_PROMPT_SUFFIX, text]).total_tokens
+    return pdf_tokens, text_tokens
+
+
+async def _measure(app: Any, name: str, path: str, repeat: int, live: bool) -> Dict[str, Any]:
+    from main import compact_pages, has_text_layer
+
+    t0 = time.perf_counter()
+    pages = compact_pages(path)
+    pre_extract_s = time.perf_counter() - t0
+    text = "\n\n".join(pages)
+
+    if live:
+        pdf_tokens, text_tokens = await _count_tokens(app, path, text)
+    else:
+        pdf_tokens = _TOKENS_PER_PDF_PAGE * len(pages) + len(app.BASE_EXTRACTION_PROMPT) // 4
+        text_tokens = (len(app.BASE_EXTRACTION_PROMPT) + len(app.TEXT_PROMPT_SUFFIX) + len(text)) // 4
+
+    e2e: Dict[str, float] = {}
+    for mode in ("pdf", "text"):
+        app.EXTRACTION_INPUT_MODE = mode
+        runs = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            await app.run_extraction(path, sha256=f"bench-{name}")
+            runs.append(time.perf_counter() - t0)
+        e2e[mode] = statistics.median(runs)
+
+    return {
+        "fixture": name,
+        "pages": len(pages),
+        "has_text_layer": has_text_layer(pages),
+        "pre_extract_s": pre_extract_s,
+        "pdf_kb": os.path.getsize(path) / 1024,
+        "text_kb": len(text.encode("utf-8")) / 1024,
+        "pdf_tokens": pdf_tokens,
+        "text_tokens": text_tokens,
+        "pdf_e2e_s": e2e["pdf"],
+        "text_e2e_s": e2e["text"],
+    }
+
+
+async def _run(fixtures: List[Tuple[str, str]], repeat: int, live: bool) -> List[Dict[str, Any]]:
+    import app
+
+    results = []
+    for name, path in fixtures:
+        results.append(await _measure(app, name, path, repeat, live))
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare PDF upload and pre-extracted text extraction input.")
+    ap.add_argument("--pdf", action="append", default=[], help="PDF to measure (repeatable); default: synthetic fixtures")
+    ap.add_argument("--repeat", type=int, default=3, help="End-to-end runs per mode (median is reported)")
+    ap.add_argument("--latency", type=float, default=0.5, help="Fake Gemini latency per generate call in seconds")
+    ap.add_argument("--upload-latency", type=float, default=0.3, help="Fake File API latency per upload/delete in seconds")
+    ap.add_argument("--live", action="store_true", help="Use the real Gemini API (needs GOOGLE_API_KEY)")
+    ap.add_argument("--json", help="Optional path to write results as JSON")
+    args = ap.parse_args()
+
+    # Configure before app is imported
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "0"
+    os.environ["LOCAL_EXTRACTION_ENABLED"] = "0"
+    os.environ["EXTRACTION_CHUNK_THRESHOLD_PAGES"] = "0"
+    os.environ.setdefault("JOBS_DIR", tempfile.mkdtemp(prefix="bench-jobs-"))
+    if not args.live:
+        os.environ.setdefault("GOOGLE_API_KEY", "bench")
+        from bench import fake_genai
+        fake_genai.install(latency_s=args.latency, file_latency_s=args.upload_latency)
+
+    with tempfile.TemporaryDirectory(prefix="bench-input-") as workdir:
+        results = asyncio.run(_run(_fixtures(args.pdf, workdir), args.repeat, args.live))
+
+    source = "count_tokens" if args.live else "estimated"
+    print(f"tokens: {source}; e2e: median of {args.repeat} run(s)" + ("" if args.live else f", fake latency {args.latency}s, upload {args.upload_latency}s"))
+    print(
+        f"{'fixture':<12} {'pages':>5} {'text':>5} {'pre_s':>6} {'pdf_kb':>8} {'text_kb':>8} "
+        f"{'pdf_tok':>8} {'text_tok':>8} {'tok_saved':>9} {'pdf_e2e':>8} {'text_e2e':>8}"
+    )
+    for r in results:
+        saved = 1 - r["text_tokens"] / r["pdf_tokens"] if r["pdf_tokens"] else 0.0
+        print(
+            f"{r['fixture']:<12} {r['pages']:>5} {'yes' if r['has_text_layer'] else 'no':>5} {r['pre_extract_s']:>6.2f} "
+            f"{r['pdf_kb']:>8.1f} {r['text_kb']:>8.1f} {r['pdf_tokens']:>8} {r['text_tokens']:>8} {saved:>8.0%} "
+            f"{r['pdf_e2e_s']:>8.2f} {r['text_e2e_s']:>8.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"tokens": source, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
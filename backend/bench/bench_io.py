@@ -0,0 +1,111 @@
+# bench/bench_io.py
+
+"""
+Temp-file round trip vs in-memory buffer for uploaded PDFs.
+
+"tempfile" reproduces the old path: write the upload to a NamedTemporaryFile, open it
+with pdfplumber by path, re-read it for the File API upload, then delete it.
+"memory" is the current path: pdfplumber and the upload client read one BytesIO.
+
+Syscall counts come from /proc/self/io (Linux); elsewhere only latency is reported.
+
+    python -m bench.bench_io --sizes 1,5,20
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, Optional
+
+import pdfplumber
+
+from bench.synthetic_pdf import make_pdf
+
+
+def _proc_io() -> Optional[Dict[str, int]]:
+    try:
+        with open("/proc/self/io", "r") as f:
+            return {k: int(v) for k, v in (line.split(": ") for line in f.read().splitlines())}
+    except OSError:
+        return None
+
+
+def _tempfile_path(data: bytes) -> int:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
+        tmp.write(data)
+        path = tmp.name
+    try:
+        with pdfplumber.open(path) as pdf:
+            pages = len(pdf.pages)
+        with open(path, "rb") as f:  # what the upload client did with the path
+            f.read()
+        return pages
+    finally:
+        os.remove(path)
+
+
+def _memory_path(data: bytes) -> int:
+    buf = io.BytesIO(data)
+    with pdfplumber.open(buf) as pdf:
+        pages = len(pdf.pages)
+    buf.seek(0)
+    buf.read()  # upload client reading the same buffer
+    return pages
+
+
+def _measure(fn: Callable[[bytes], int], data: bytes, repeats: int) -> Dict[str, float]:
+    timings = []
+    before = _proc_io()
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(data)
+        timings.append(time.perf_counter() - t0)
+    after = _proc_io()
+
+    result = {"median_ms": statistics.median(timings) * 1000}
+    if before and after:
+        result["read_syscalls"] = (after["syscr"] - before["syscr"]) / repeats
+        result["write_syscalls"] = (after["syscw"] - before["syscw"]) / repeats
+    return result
+
+
+def _pdf_of_size(target_mb: float) -> bytes:
+    sample = make_pdf(10, tables_per_page=2, rows_per_table=20)
+    per_page = len(sample) / 10
+    return make_pdf(max(1, int(target_mb * 1024 * 1024 / per_page)), tables_per_page=2, rows_per_table=20)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark temp-file vs in-memory PDF handling.")
+    ap.add_argument("--sizes", default="1,5,20", help="Comma-separated PDF sizes in MB (default: 1,5,20)")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--json", help="Optional path to write results as JSON")
+    args = ap.parse_args()
+
+    rows = []
+    for size in (float(s) for s in args.sizes.split(",")):
+        data = _pdf_of_size(size)
+        mb = len(data) / (1024 * 1024)
+        for mode, fn in (("tempfile", _tempfile_path), ("memory", _memory_path)):
+            r = _measure(fn, data, args.repeats)
+            r.update({"mode": mode, "size_mb": round(mb, 2), "ms_per_mb": r["median_ms"] / mb})
+            rows.append(r)
+
+    print(f"{'size_mb':>8} {'mode':>9} {'median_ms':>10} {'ms_per_mb':>10} {'read_sc':>8} {'write_sc':>9}")
+    for r in rows:
+        print(
+            f"{r['size_mb']:>8} {r['mode']:>9} {r['median_ms']:>10.2f} {r['ms_per_mb']:>10.2f} "
+            f"{r.get('read_syscalls', float('nan')):>8.0f} {r.get('write_syscalls', float('nan')):>9.0f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# bench/bench_normalizer.py
+
+"""
+FinancialSecurityStatement validation cost for the input shapes Gemini produces.
+
+Shapes:
+  canonical   {"statement_metadata": {...}, "accounts": [{"account_information": ..., ...}]}
+  flat_list   [{"account_id": ..., "holdings": [...], "transactions": [...]}, ...]
+  flat_dict   {"account_id": ..., "holdings": [...], "transactions": [...]}
+
+Each shape is validated from parsed Python objects ("dict") and from the raw JSON
+text ("json"), at every requested row count (rows are split evenly between holdings
+and transactions across 4 accounts, or 1 for flat_dict). The canonical shape is also
+validated with already-built Holding/Transaction models ("models"), which is what
+FinancialSecurityStatement.merge feeds back in for chunked extractions.
+
+    python -m bench.bench_normalizer --rows 1000,10000,100000
+"""
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from state import FinancialSecurityStatement, Holding, Transaction
+
+
+def _holding(i: int) -> Dict[str, Any]:
+    return {
+        "security_id": f"INE{i:09d}",
+        "security_name": f"Security {i}",
+        "security_type": "Stock",
+        "quantity": float(i % 500 + 1),
+        "price": 101.25,
+        "market_value": (i % 500 + 1) * 101.25,
+        "currency": "INR",
+        "holding_date": "2024-03-31",
+    }
+
+
+def _transaction(i: int) -> Dict[str, Any]:
+    return {
+        "transaction_date": "2024-03-15",
+        "transaction_type": "PURCHASE",
+        "security_id": f"INF{i:09d}",
+        "security_name": f"Fund {i}",
+        "security_type": "Mutual Fund",
+        "quantity": 12.5,
+        "price": 40.0,
+        "net_amount": 500.0,
+        "currency": "INR",
+        "transaction_description": "SIP purchase",
+    }
+
+
+def _accounts(rows: int, n_accounts: int) -> List[Dict[str, Any]]:
+    per_account = max(1, rows // n_accounts)
+    out = []
+    for a in range(n_accounts):
+        base = a * per_account
+        out.append({
+            "account_id": f"IN30{a:06d}",
+            "holdings": [_holding(base + i) for i in range(per_account // 2)],
+            "transactions": [_transaction(base + i) for i in range(per_account - per_account // 2)],
+        })
+    return out
+
+
+def make_input(shape: str, rows: int) -> Any:
+    if shape == "flat_dict":
+        return {"statement_date": "2024-03-31", **_accounts(rows, 1)[0]}
+    accounts = _accounts(rows, 4)
+    if shape == "flat_list":
+        return [{"statement_date": "2024-03-31", **acc} for acc in accounts]
+    return {
+        "statement_metadata": {"statement_date": "2024-03-31", "issuer_name": "NSDL"},
+        "accounts": [
+            {
+                "account_information": {"account_id": acc["account_id"]},
+                "holdings": acc["holdings"],
+                "transactions": acc["transactions"],
+            }
+            for acc in accounts
+        ],
+    }
+
+
+def _measure(fn: Callable[[], Any], repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark FinancialSecurityStatement normalization.")
+    ap.add_argument("--rows", default="1000,10000,100000", help="Comma-separated row counts")
+    ap.add_argument("--shapes", default="canonical,flat_list,flat_dict")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--json", help="Optional path to write results as JSON")
+    args = ap.parse_args()
+
+    results = []
+    for shape in args.shapes.split(","):
+        for rows in (int(r) for r in args.rows.split(",")):
+            data = make_input(shape, rows)
+            text = json.dumps(data)
+            repeats = max(1, args.repeats if rows <= 10_000 else args.repeats // 2)
+
+            # Sanity check: every row survives normalization
+            st = FinancialSecurityStatement.model_validate(data)
+            got = sum(len(a.holdings) + len(a.transactions) for a in st.accounts)
+
+            sources = [
+                ("dict", lambda: FinancialSecurityStatement.model_validate(data)),
+                ("json", lambda: FinancialSecurityStatement.model_validate(text)),
+            ]
+            if shape == "canonical":
+                built = {
+                    "statement_metadata": data["statement_metadata"],
+                    "accounts": [
+                        {
+                            "account_information": acc["account_information"],
+                            "holdings": [Holding.model_validate(h) for h in acc["holdings"]],
+                            "transactions": [Transaction.model_validate(t) for t in acc["transactions"]],
+                        }
+                        for acc in data["accounts"]
+                    ],
+                }
+                sources.append(("models", lambda: FinancialSecurityStatement.model_validate(built)))
+
+            for source, fn in sources:
+                seconds = _measure(fn, repeats)
+                results.append({
+                    "shape": shape,
+                    "source": source,
+                    "rows": got,
+                    "median_ms": seconds * 1000,
+                    "us_per_row": seconds * 1e6 / max(got, 1),
+                })
+
+    print(f"{'shape':>10} {'source':>6} {'rows':>8} {'median_ms':>10} {'us_per_row':>10}")
+    for r in results:
+        print(f"{r['shape']:>10} {r['source']:>6} {r['rows']:>8} {r['median_ms']:>10.2f} {r['us_per_row']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# bench/bench_pipeline.py
+
+"""
+End-to-end pipeline benchmarks with a regression gate.
+
+Targets (each timed on every fixture):
+  main       main.extract_structured_data_and_save (pdfplumber tables + text to JSON)
+  camelot    camelot_csv.extract_all (tables to CSV, serial)
+  camelot_routed  the same with pages="relevant" (page_router.py picks the pages)
+  extract    POST /extract on app.py (extraction cache off, fake Gemini)
+  transform  POST /transform on app.py with one row per table row of the fixture
+
+Gemini is replaced by bench/fake_genai.py with a configurable latency, so no API key
+or network is needed. Every (target, fixture) pair runs in its own subprocess so the
+peak RSS (ru_maxrss) belongs to that scenario alone.
+
+    python -m bench.bench_pipeline --save-baseline bench/pipeline_baseline.json
+    python -m bench.bench_pipeline --baseline bench/pipeline_baseline.json   # exit 1 on regression
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+# name -> make_pdf kwargs
+FIXTURES: Dict[str, Dict[str, int]] = {
+    "small": {"pages": 5, "tables_per_page": 1, "rows_per_table": 20},
+    "medium": {"pages": 20, "tables_per_page": 2, "rows_per_table": 20},
+    "dense": {"pages": 20, "tables_per_page": 3, "rows_per_table": 40},
+    "large": {"pages": 80, "tables_per_page": 2, "rows_per_table": 25},
+    # Long statement where most pages are disclaimers; shows what page routing skips
+    "padded": {"pages": 10, "tables_per_page": 2, "rows_per_table": 20, "filler_pages": 30},
+}
+TARGETS = ("main", "camelot", "camelot_routed", "extract", "transform")
+
+# Latency differences below this many seconds are treated as noise
+_NOISE_FLOOR_S = 0.005
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+# -------------------------
+# Worker side (one scenario per process)
+# -------------------------
+
+def _scenario(target: str, pdf: bytes, fixture: Dict[str, int], workdir: str, latency: float) -> Tuple[Callable[[], Any], float, str]:
+    """Return (run_once, units_per_run, unit_name) for a target."""
+    total_pages = fixture["pages"] + fixture.get("filler_pages", 0)
+    if target == "main":
+        import main
+        out = os.path.join(workdir, "out.json")
+        return (lambda: main.extract_structured_data_and_save(pdf, out)), total_pages, "pages"
+
+    if target in ("camelot", "camelot_routed"):
+        import camelot_csv
+        outdir = os.path.join(workdir, "csv")
+        pages = "relevant" if target == "camelot_routed" else "all"
+        return (lambda: camelot_csv.extract_all(pdf, outdir, pages=pages)), total_pages, "pages"
+
+    # app.py targets: fake Gemini must be in place before the import
+    os.environ.setdefault("GOOGLE_API_KEY", "bench")
+    os.environ["EXTRACTION_CACHE_ENABLED"] = "0"
+    os.environ["TRANSFORM_CACHE_ENABLED"] = "0"
+    os.environ["JOBS_DIR"] = os.path.join(workdir, "jobs")
+    from bench import fake_genai
+    fake_genai.install(latency_s=latency)
+    import app
+    from fastapi.testclient import TestClient
+    client = TestClient(app.app)
+
+    if target == "extract":
+        def run():
+            r = client.post("/extract", files={"file": ("statement.pdf", pdf, "application/pdf")})
+            r.raise_for_status()
+        return run, total_pages, "pages"
+
+    rows = [
+        {"_ui_id": f"r{i}", "isin": f"INE{i:09d}", "security": f"Security {i}", "value": i * 1.5}
+        for i in range(fixture["pages"] * fixture["tables_per_page"] * fixture["rows_per_table"])
+    ]
+    body = {"entityType": "holding", "items": rows, "mappingPrompt": "isin -> security_id"}
+
+    def run():
+        r = client.post("/transform", json=body)
+        r.raise_for_status()
+        if not r.json().get("success"):
+            raise RuntimeError(r.json().get("note"))
+    return run, len(rows), "rows"
+
+
+def _run_worker(spec_path: str, result_path: str) -> None:
+    with open(spec_path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    from bench.synthetic_pdf import make_pdf
+
+    fixture = FIXTURES[spec["fixture"]]
+    pdf = make_pdf(**fixture)
+    with tempfile.TemporaryDirectory() as workdir:
+        run, units, unit = _scenario(spec["target"], pdf, fixture, workdir, spec["latency"])
+        run()  # warm-up: imports, model load, first-call caches
+        timings = []
+        for _ in range(spec["repeats"]):
+            t0 = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - t0)
+
+    mean = sum(timings) / len(timings)
+    result = {
+        "target": spec["target"],
+        "fixture": spec["fixture"],
+        "pdf_bytes": len(pdf),
+        "repeats": len(timings),
+        "p50_s": _percentile(timings, 50),
+        "p95_s": _percentile(timings, 95),
+        "mean_s": mean,
+        "throughput": units / mean if mean else 0.0,
+        "throughput_unit": f"{unit}/s",
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+    }
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+# -------------------------
+# Driver side
+# -------------------------
+
+def _run_scenario(target: str, fixture: str, repeats: int, latency: float, verbose: bool) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = os.path.join(tmp, "spec.json")
+        result_path = os.path.join(tmp, "result.json")
+        with open(spec_path, "w", encoding="utf-8") as f:
+            json.dump({"target": target, "fixture": fixture, "repeats": repeats, "latency": latency}, f)
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.bench_pipeline", "--worker", spec_path, result_path],
+            stdout=None if verbose else subprocess.DEVNULL,
+            stderr=None if verbose else subprocess.PIPE,
+            text=True,
+        )
+        if proc.returncode != 0 or not os.path.exists(result_path):
+            return {"target": target, "fixture": fixture, "error": (proc.stderr or "").strip()[-2000:]}
+        with open(result_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]], tolerance: float, rss_tolerance: float) -> List[str]:
+    """Return one message per regression (slower p50/p95 or higher peak RSS than allowed)."""
+    problems = []
+    for key, base in baseline.items():
+        cur = results.get(key)
+        if cur is None or "error" in base:
+            continue
+        if "error" in cur:
+            problems.append(f"{key}: failed ({cur['error'].splitlines()[-1] if cur['error'] else 'no output'})")
+            continue
+        for metric in ("p50_s", "p95_s"):
+            limit = base[metric] * (1 + tolerance)
+            if cur[metric] > limit and cur[metric] - base[metric] > _NOISE_FLOOR_S:
+                problems.append(f"{key}: {metric} {cur[metric]:.3f}s > {base[metric]:.3f}s (+{tolerance:.0%} allowed)")
+        limit = base["peak_rss_mb"] * (1 + rss_tolerance)
+        if cur["peak_rss_mb"] > limit:
+            problems.append(f"{key}: peak RSS {cur['peak_rss_mb']:.0f} MB > {base['peak_rss_mb']:.0f} MB (+{rss_tolerance:.0%} allowed)")
+    return problems
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the extraction pipelines against a fake Gemini.")
+    ap.add_argument("--targets", default=",".join(TARGETS), help=f"Comma-separated subset of {','.join(TARGETS)}")
+    ap.add_argument("--fixtures", default="small,medium,dense", help=f"Comma-separated subset of {','.join(FIXTURES)}")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--latency", type=float, default=0.2, help="Fake Gemini latency per call in seconds (default: 0.2)")
+    ap.add_argument("--baseline", help="Compare against this baseline JSON; exit 1 on regression")
+    ap.add_argument("--save-baseline", help="Write the results as a new baseline JSON")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="Allowed p50/p95 slowdown vs baseline (default: 0.25)")
+    ap.add_argument("--rss-tolerance", type=float, default=0.25, help="Allowed peak RSS growth vs baseline (default: 0.25)")
+    ap.add_argument("--verbose", action="store_true", help="Show pipeline output from the worker processes")
+    ap.add_argument("--worker", nargs=2, metavar=("SPEC", "RESULT"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        _run_worker(*args.worker)
+        return
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for target in args.targets.split(","):
+        for fixture in args.fixtures.split(","):
+            key = f"{target}/{fixture}"
+            print(f"Running {key}...", flush=True)
+            results[key] = _run_scenario(target, fixture, args.repeats, args.latency, args.verbose)
+
+    print(f"\n{'scenario':<20} {'p50_s':>8} {'p95_s':>8} {'throughput':>16} {'peak_rss_mb':>12}")
+    for key, r in results.items():
+        if "error" in r:
+            print(f"{key:<20} FAILED: {r['error'].splitlines()[-1] if r['error'] else 'no output'}")
+            continue
+        tput = f"{r['throughput']:.1f} {r['throughput_unit']}"
+        print(f"{key:<20} {r['p50_s']:>8.3f} {r['p95_s']:>8.3f} {tput:>16} {r['peak_rss_mb']:>12.1f}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "repeats": args.repeats,
+                    "latency": args.latency,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    failed = [k for k, r in results.items() if "error" in r]
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline["results"], args.tolerance, args.rss_tolerance)
+        if problems:
+            print("\nRegressions:")
+            for p in problems:
+                print(f"  {p}")
+            sys.exit(1)
+        print("\nNo regressions against baseline.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
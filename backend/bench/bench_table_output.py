@@ -0,0 +1,109 @@
+# bench/bench_table_output.py
+
+"""
+Per-table CSV files vs one Parquet / Arrow dataset for extracted tables (table_sinks).
+
+Tables are extracted once with camelot from a synthetic statement, then written as
+if a backfill had produced them from --statements PDFs, each PDF through its own
+sink (the way batch_extract.py writes). Reports per format:
+
+  write_s   writing every table (sink.add + close)
+  files     files created
+  mb        bytes on disk
+  load_s    reading everything back into memory: pandas.read_csv per CSV file, or
+            one pyarrow.dataset scan of the dataset directory
+
+    python -m bench.bench_table_output --statements 200
+"""
+
+import argparse
+import glob
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+
+
+def _extract_tables(pages: int, tables_per_page: int, rows: int) -> List[Any]:
+    import camelot
+    from bench.synthetic_pdf import make_pdf
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(make_pdf(pages=pages, tables_per_page=tables_per_page, rows_per_table=rows))
+        path = f.name
+    try:
+        return list(camelot.read_pdf(path, pages="all", flavor="stream", strip_text=" \n"))
+    finally:
+        os.remove(path)
+
+
+def _write(fmt: str, outdir: str, tables: List[Any], statements: int) -> float:
+    from table_sinks import open_sink
+
+    t0 = time.perf_counter()
+    for s in range(statements):
+        # CSV keeps one directory per statement, as batch_extract.py does
+        target = os.path.join(outdir, f"statement-{s:05d}") if fmt == "csv" else outdir
+        os.makedirs(target, exist_ok=True)
+        sink = open_sink(fmt, target, part_name=f"statement-{s:05d}", source_file=f"statement-{s:05d}.pdf")
+        for i, t in enumerate(tables):
+            sink.add(t, int(t.page), i + 1, "stream")
+        sink.close()
+    return time.perf_counter() - t0
+
+
+def _load(fmt: str, outdir: str) -> float:
+    t0 = time.perf_counter()
+    if fmt == "csv":
+        import pandas as pd
+
+        for path in glob.glob(os.path.join(outdir, "*", "*.csv")):
+            pd.read_csv(path, header=None, dtype=str, keep_default_na=False)
+    else:
+        import pyarrow.dataset as ds
+        from table_sinks import DATASET_DIRS
+
+        ds.dataset(os.path.join(outdir, DATASET_DIRS[fmt]), format="parquet" if fmt == "parquet" else "ipc").to_table()
+    return time.perf_counter() - t0
+
+
+def _disk(outdir: str) -> Dict[str, float]:
+    files, size = 0, 0
+    for root, _dirs, names in os.walk(outdir):
+        files += len(names)
+        size += sum(os.path.getsize(os.path.join(root, n)) for n in names)
+    return {"files": files, "mb": size / 1e6}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare CSV, Parquet and Arrow output for extracted tables.")
+    ap.add_argument("--statements", type=int, default=200, help="PDFs' worth of tables to write")
+    ap.add_argument("--pages", type=int, default=5, help="Pages of the synthetic statement")
+    ap.add_argument("--tables-per-page", type=int, default=2)
+    ap.add_argument("--rows", type=int, default=20, help="Rows per table")
+    ap.add_argument("--json", help="Optional path to write results as JSON")
+    args = ap.parse_args()
+
+    tables = _extract_tables(args.pages, args.tables_per_page, args.rows)
+    rows = sum(t.df.shape[0] for t in tables) * args.statements
+    print(f"{len(tables)} tables per statement x {args.statements} statements = {len(tables) * args.statements} tables, {rows} rows")
+    print(f"{'format':<8} {'write_s':>8} {'files':>7} {'mb':>7} {'load_s':>7}")
+
+    results = []
+    for fmt in ("csv", "parquet", "arrow"):
+        with tempfile.TemporaryDirectory(prefix=f"bench-tables-{fmt}-") as outdir:
+            write_s = _write(fmt, outdir, tables, args.statements)
+            disk = _disk(outdir)
+            load_s = _load(fmt, outdir)
+        results.append({"format": fmt, "write_s": write_s, **disk, "load_s": load_s})
+        r = results[-1]
+        print(f"{fmt:<8} {write_s:>8.2f} {r['files']:>7} {r['mb']:>7.1f} {load_s:>7.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"tables": len(tables) * args.statements, "rows": rows, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
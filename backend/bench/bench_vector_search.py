@@ -0,0 +1,190 @@
+# bench/bench_vector_search.py
+
+"""
+Security-name -> ISIN resolution on a synthetic security master.
+
+Builds a master of --securities rows (stocks, mutual funds and bonds with realistic
+name shapes), indexes it with vector_search_utils, then resolves --holdings holding
+names written the way statements print them (LTD vs LIMITED, missing punctuation,
+truncation, occasional typos); --with-isin of the rows also carry their ISIN as
+security_id. Reports:
+
+  build_s      embedding the master and writing the index
+  open_ms      opening the memory-mapped index (what a restarted worker pays)
+  vector_s     similarity search alone for every holding (exact tiers disabled)
+  batch_s      one search_vector_store_many call for every holding
+  tiers        holdings resolved by each match_tier in that call
+  loop_s       search_vector_store per holding, measured on --loop-sample rows and
+               scaled to all holdings
+  top1         share of holdings whose best match is the ISIN they were drawn from
+
+A second scenario models a multi-account statement: --holdings rows drawn from
+--issuers distinct securities (same printed name across accounts), resolved with
+search_vector_store_batch twice, as for this statement and next month's:
+
+  cold_s/warm_s  batch time with an empty / populated result cache
+  probes         names sent to the index on the cold and warm runs
+
+    python -m bench.bench_vector_search --securities 200000 --holdings 5000
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+_WORDS = [
+    "AXIS", "BANK", "HDFC", "ICICI", "TATA", "STEEL", "MOTORS", "POWER", "RELIANCE", "INDUSTRIES", "INFOSYS",
+    "WIPRO", "BHARAT", "PETROLEUM", "ADANI", "PORTS", "LARSEN", "TOUBRO", "SUN", "PHARMA", "ASIAN", "PAINTS",
+    "BAJAJ", "FINANCE", "AUTO", "MARUTI", "SUZUKI", "COAL", "INDIA", "GAS", "NATIONAL", "ALUMINIUM", "CEMENT",
+    "TEXTILES", "CHEMICALS", "SYSTEMS", "CAPITAL", "HOLDINGS", "ENERGY", "GREEN", "KOTAK", "MAHINDRA", "NIPPON",
+    "MIRAE", "PARAG", "PARIKH", "FLEXI", "CAP", "SMALL", "MIDCAP", "BLUECHIP", "LIQUID", "GILT", "CORPORATE",
+]
+_SUFFIX = {
+    "Equity": ["LIMITED", "LTD", "LTD."],
+    "Mutual Fund": ["FUND - DIRECT PLAN - GROWTH", "FUND DIRECT GROWTH", "FUND - REGULAR PLAN - IDCW"],
+    "Bond": ["7.50% NCD 2030", "8.25% SECURED NCD 2028", "6.10% GOI 2031"],
+}
+# Statement type label for each master type (what holdings carry)
+_STATEMENT_TYPE = {"Equity": "Stock", "Mutual Fund": "Mutual Fund", "Bond": "Bond"}
+
+
+def write_master(path: str, n: int, seed: int = 0) -> List[Tuple[str, str, str]]:
+    rng = random.Random(seed)
+    rows = []
+    seen = set()
+    while len(rows) < n:
+        kind = rng.choice(list(_SUFFIX))
+        name = " ".join(rng.sample(_WORDS, rng.randint(2, 4))) + " " + _SUFFIX[kind][0]
+        if name in seen:
+            continue
+        seen.add(name)
+        prefix = {"Equity": "INE", "Mutual Fund": "INF", "Bond": "IN0"}[kind]
+        rows.append((f"{prefix}{len(rows):08d}{rng.randint(0, 9)}", name, kind))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["ISIN", "Security Name", "Instrument Type"])
+        w.writerows(rows)
+    return rows
+
+
+def _as_printed(name: str, kind: str, rng: random.Random) -> str:
+    """How a statement might print the master name."""
+    base = name[: -len(_SUFFIX[kind][0])].strip()
+    text = f"{base} {rng.choice(_SUFFIX[kind])}"
+    if rng.random() < 0.3:
+        text = text.title()
+    if rng.random() < 0.15 and len(text) > 30:
+        text = text[: rng.randint(24, len(text) - 4)]  # truncated column
+    elif rng.random() < 0.2 and len(text) > 8:
+        i = rng.randrange(1, len(text) - 1)
+        text = text[:i] + text[i + 1:]  # dropped character
+    return text
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the local security index.")
+    ap.add_argument("--securities", type=int, default=200000)
+    ap.add_argument("--holdings", type=int, default=5000)
+    ap.add_argument("--loop-sample", type=int, default=200, help="Holdings timed one call at a time")
+    ap.add_argument("--with-isin", type=float, default=0.3, help="Share of holdings that carry their ISIN")
+    ap.add_argument("--issuers", type=int, default=300, help="Distinct securities in the multi-account scenario")
+    ap.add_argument("--json", help="Optional path to write results as JSON")
+    args = ap.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-securities-")
+    master = os.path.join(workdir, "security_master.csv")
+    index_dir = os.path.join(workdir, "index")
+    # Configure before vector_search_utils is imported
+    os.environ["SECURITY_MASTER_PATH"] = master
+    os.environ["SECURITY_INDEX_DIR"] = index_dir
+    import vector_search_utils as vsu
+
+    rows = write_master(master, args.securities)
+    rng = random.Random(1)
+    picks = [rng.choice(rows) for _ in range(args.holdings)]
+    queries = [_as_printed(name, kind, rng) for _isin, name, kind in picks]
+    types = [_STATEMENT_TYPE[kind] for _i, _n, kind in picks]
+    ids = [isin if rng.random() < args.with_isin else None for isin, _n, _k in picks]
+
+    t0 = time.perf_counter()
+    vsu.SecurityIndex.build(master, index_dir)
+    build_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    vsu.get_index()
+    open_ms = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    vector_results = vsu.get_index().search_many(queries, types, top_k=1, fast_path=False)
+    vector_s = time.perf_counter() - t0
+
+    vsu.get_index()._hashes()  # built once per process; not part of a statement's cost
+    t0 = time.perf_counter()
+    results = vsu.search_vector_store_many(queries, types, top_k=1, security_ids=ids)
+    batch_s = time.perf_counter() - t0
+    tiers = {tier: sum(bool(r) and r[0]["match_tier"] == tier for r in results) for tier in vsu.MATCH_TIERS}
+
+    sample = min(args.loop_sample, len(queries))
+    t0 = time.perf_counter()
+    for q, t in zip(queries[:sample], types[:sample]):
+        vsu.search_vector_store(q, t, top_k=1)
+    loop_s = (time.perf_counter() - t0) / max(sample, 1) * len(queries)
+
+    # Multi-account statement: few issuers, each printed the same way in every account
+    issuers = [rng.choice(rows) for _ in range(args.issuers)]
+    printed = [(_as_printed(name, kind, rng), _STATEMENT_TYPE[kind]) for _isin, name, kind in issuers]
+    statement = [rng.choice(printed) for _ in range(args.holdings)]
+    cache = vsu.result_cache
+    cache.clear()
+    runs = []
+    for _ in range(2):
+        probes = cache.index_probes
+        t0 = time.perf_counter()
+        vsu.search_vector_store_batch([q for q, _t in statement], [t for _q, t in statement], top_k=1)
+        runs.append((time.perf_counter() - t0, cache.index_probes - probes))
+    (cold_s, cold_probes), (warm_s, warm_probes) = runs
+
+    def accuracy(found):
+        return sum(bool(r) and r[0]["isin_number"] == isin for r, (isin, _n, _k) in zip(found, picks)) / max(len(picks), 1)
+
+    top1, vector_top1 = accuracy(results), accuracy(vector_results)
+    out: Dict[str, Any] = {
+        "securities": args.securities,
+        "holdings": args.holdings,
+        "dim": vsu.SECURITY_INDEX_DIM,
+        "index_mb": sum(os.path.getsize(os.path.join(index_dir, f)) for f in os.listdir(index_dir)) / 1e6,
+        "build_s": build_s,
+        "open_ms": open_ms,
+        "vector_s": vector_s,
+        "vector_top1": vector_top1,
+        "batch_s": batch_s,
+        "tiers": tiers,
+        "loop_s": loop_s,
+        "top1": top1,
+        "issuers": args.issuers,
+        "cold_s": cold_s,
+        "cold_probes": cold_probes,
+        "warm_s": warm_s,
+        "warm_probes": warm_probes,
+        "cache": cache.stats(),
+    }
+    print(
+        f"securities={out['securities']} holdings={out['holdings']} dim={out['dim']} index={out['index_mb']:.0f} MB\n"
+        f"build {build_s:.2f}s  open {open_ms:.1f}ms  per-row loop ~{loop_s:.2f}s\n"
+        f"vector only {vector_s:.2f}s top-1 {vector_top1:.1%}  |  tiered batch {batch_s:.2f}s top-1 {top1:.1%}  "
+        f"tiers {' '.join(f'{t}={n}' for t, n in tiers.items())}\n"
+        f"multi-account ({args.issuers} issuers): cold {cold_s * 1000:.0f}ms / {cold_probes} probes  "
+        f"warm {warm_s * 1000:.0f}ms / {warm_probes} probes  hit rate {out['cache']['hit_rate']:.1%}"
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# bench/fake_genai.py
+
+"""
+Local stand-in for `google.generativeai`, for benchmarks and offline runs.
+
+`install()` registers this module as `google.generativeai` in sys.modules, so it must
+run before `app` is imported. Every model call sleeps for the configured latency
+and answers from the request itself:
+
+  * extraction (a file part in the request): a canonical statement with
+    `statement_rows` holdings and transactions
+  * /transform batches (INPUT_ROWS in the prompt): the rows echoed back
+  * prompt compilation: {"compilable": false}
+
+    from bench import fake_genai
+    fake_genai.install(latency_s=0.5)
+    import app
+"""
+
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+import types
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+LATENCY_S = 0.0
+FILE_LATENCY_S = 0.0  # upload_file / delete_file round trip
+STATEMENT_ROWS = 20
+
+# Call counters and generate_content concurrency, reset by install()
+calls: Dict[str, int] = {}
+in_flight = 0
+max_in_flight = 0
+_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _lock:
+        calls[name] = calls.get(name, 0) + 1
+
+
+def _enter() -> None:
+    global in_flight, max_in_flight
+    with _lock:
+        calls["generate_content"] = calls.get("generate_content", 0) + 1
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+
+
+def _leave() -> None:
+    global in_flight
+    with _lock:
+        in_flight -= 1
+
+
+class GenerationConfig:
+    def __init__(self, **kwargs: Any):
+        self.__dict__.update(kwargs)
+
+
+class _File:
+    def __init__(self, name: str, display_name: str, size_bytes: int):
+        self.name = name
+        self.display_name = display_name
+        self.size_bytes = size_bytes
+        self.create_time = datetime.now(timezone.utc)
+
+
+class _Response:
+    def __init__(self, text: str):
+        self.text = text
+
+
+_files: Dict[str, _File] = {}
+
+
+def configure(api_key: Optional[str] = None, **kwargs: Any) -> None:
+    return None
+
+
+def upload_file(path: Any, mime_type: Optional[str] = None, display_name: Optional[str] = None, **kwargs: Any) -> _File:
+    # Read the whole payload like the real client does
+    if isinstance(path, io.IOBase):
+        size = len(path.read())
+    else:
+        with open(path, "rb") as f:
+            size = len(f.read())
+    _count("upload_file")
+    time.sleep(FILE_LATENCY_S)
+    f = _File(f"files/{uuid.uuid4().hex[:12]}", display_name or "", size)
+    with _lock:
+        _files[f.name] = f
+    return f
+
+
+def delete_file(name: Any, **kwargs: Any) -> None:
+    _count("delete_file")
+    time.sleep(FILE_LATENCY_S)
+    with _lock:
+        _files.pop(getattr(name, "name", name), None)
+
+
+def list_files(**kwargs: Any) -> List[_File]:
+    with _lock:
+        return list(_files.values())
+
+
+def _statement(rows: int) -> Dict[str, Any]:
+    return {
+        "statement_metadata": {"statement_date": "2024-03-31", "issuer_name": "NSDL"},
+        "accounts": [
+            {
+                "account_information": {"account_id": "IN30000001"},
+                "holdings": [
+                    {"security_id": f"INE{i:09d}", "security_name": f"Security {i}", "quantity": 10.0, "price": 1.5}
+                    for i in range(rows)
+                ],
+                "transactions": [
+                    {"transaction_date": "2024-03-15", "transaction_type": "PURCHASE", "net_amount": 500.0}
+                    for _ in range(rows)
+                ],
+            }
+        ],
+    }
+
+
+def _answer(contents: Any) -> str:
+    parts = contents if isinstance(contents, list) else [contents]
+    if any(isinstance(p, _File) for p in parts):
+        return json.dumps(_statement(STATEMENT_ROWS))
+    text = "\n".join(p for p in parts if isinstance(p, str))
+    if "INPUT_ROWS:\n" in text:
+        return text.split("INPUT_ROWS:\n", 1)[1].strip()
+    if "MAPPING_RULES" in text and "ENTITY_TYPE" in text:
+        return json.dumps({"compilable": False})
+    return json.dumps(_statement(STATEMENT_ROWS))
+
+
+class GenerativeModel:
+    def __init__(self, model_name: str = "fake", **kwargs: Any):
+        self.model_name = model_name
+
+    def generate_content(self, contents: Any, generation_config: Any = None, request_options: Any = None, **kwargs: Any):
+        _enter()
+        try:
+            time.sleep(LATENCY_S)
+            return _Response(_answer(contents))
+        finally:
+            _leave()
+
+    async def generate_content_async(self, contents: Any, generation_config: Any = None, request_options: Any = None, **kwargs: Any):
+        _enter()
+        try:
+            await asyncio.sleep(LATENCY_S)
+            return _Response(_answer(contents))
+        finally:
+            _leave()
+
+
+def install(latency_s: float = 0.0, statement_rows: int = 20, file_latency_s: float = 0.0) -> types.ModuleType:
+    """Register this module as `google.generativeai` and set the simulated latencies."""
+    global LATENCY_S, FILE_LATENCY_S, STATEMENT_ROWS, in_flight, max_in_flight
+    LATENCY_S = latency_s
+    FILE_LATENCY_S = file_latency_s
+    STATEMENT_ROWS = statement_rows
+    calls.clear()
+    in_flight = max_in_flight = 0
+
+    module = sys.modules[__name__]
+    try:
+        import google
+    except ImportError:
+        google = types.ModuleType("google")
+        google.__path__ = []
+        sys.modules["google"] = google
+    google.generativeai = module
+    sys.modules["google.generativeai"] = module
+    return module
@@ -0,0 +1,179 @@
+# bench/synthetic_pdf.py
+
+"""
+Dependency-free generator for synthetic statement PDFs used by the benchmarks.
+
+Pages carry a real text layer (Helvetica) with a statement-like header and
+holdings/transaction tables; `ruled=True` draws grid lines around table cells so
+camelot's lattice flavor and pdfplumber's line-based table finder both apply.
+`filler_pages` appends text-only disclaimer/summary pages with no target sections,
+as real statements have, for measuring page routing.
+"""
+
+import random
+from typing import List, Optional
+
+PAGE_W, PAGE_H = 595, 842  # A4 in points
+_MARGIN = 40
+_ROW_H = 14
+
+_HOLDING_HEADER = ["ISIN", "Security", "Current Bal", "Market Price", "Value"]
+_TXN_HEADER = ["Folio No", "Date", "Transaction Description", "Amount", "NAV", "Units"]
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _text(x: float, y: float, text: str, size: int = 8) -> str:
+    return f"BT /F1 {size} Tf {x:.1f} {y:.1f} Td ({_escape(text)}) Tj ET"
+
+
+def _table_ops(top: float, header: List[str], rows: List[List[str]], ruled: bool) -> List[str]:
+    ops: List[str] = []
+    col_w = (PAGE_W - 2 * _MARGIN) / len(header)
+    all_rows = [header] + rows
+    for r, row in enumerate(all_rows):
+        y = top - (r + 1) * _ROW_H
+        for c, cell in enumerate(row):
+            ops.append(_text(_MARGIN + c * col_w + 2, y + 4, cell))
+    if ruled:
+        bottom = top - len(all_rows) * _ROW_H
+        for r in range(len(all_rows) + 1):
+            y = top - r * _ROW_H
+            ops.append(f"{_MARGIN} {y:.1f} m {PAGE_W - _MARGIN} {y:.1f} l S")
+        for c in range(len(header) + 1):
+            x = _MARGIN + c * col_w
+            ops.append(f"{x:.1f} {top:.1f} m {x:.1f} {bottom:.1f} l S")
+    return ops
+
+
+def _page_content(page_no: int, tables_per_page: int, rows_per_table: int, ruled: bool, rng: random.Random) -> str:
+    ops = [
+        "0.5 w",
+        _text(_MARGIN, PAGE_H - 40, "NSDL Consolidated Account Statement for the period 01-Jun-2025 to 30-Jun-2025", 10),
+        _text(_MARGIN, PAGE_H - 54, f"DP ID: IN300123 Client ID: {12345600 + page_no % 7:08d}   Page {page_no}", 9),
+    ]
+    top = PAGE_H - 80
+    for t in range(tables_per_page):
+        if t % 2 == 0:
+            ops.append(_text(_MARGIN, top, "Equities (E)", 9))
+            header = _HOLDING_HEADER
+            rows = [
+                [
+                    f"INE{rng.randint(0, 999):03d}A01{rng.randint(0, 99):02d}4",
+                    f"COMPANY {rng.randint(1, 500)} LIMITED",
+                    str(rng.randint(1, 5000)),
+                    f"{rng.uniform(10, 5000):,.2f}",
+                    f"{rng.uniform(1e3, 1e6):,.2f}",
+                ]
+                for _ in range(rows_per_table)
+            ]
+        else:
+            ops.append(_text(_MARGIN, top, "Mutual Funds Transaction Statement", 9))
+            header = _TXN_HEADER
+            rows = [
+                [
+                    f"{rng.randint(100, 999)}/{rng.randint(10, 99)}",
+                    f"{rng.randint(1, 28):02d}-Jun-2025",
+                    rng.choice(["Purchase", "Redemption", "SIP Purchase"]),
+                    f"{rng.uniform(500, 50000):,.2f}",
+                    f"{rng.uniform(10, 300):.4f}",
+                    f"{rng.uniform(1, 500):.3f}",
+                ]
+                for _ in range(rows_per_table)
+            ]
+        ops.extend(_table_ops(top - 6, header, rows, ruled))
+        top -= (rows_per_table + 1) * _ROW_H + 30
+        if top < 80:
+            break
+    ops.append(_text(_MARGIN, 30, "This is a computer generated statement. Disclaimer text for benchmarking.", 7))
+    return "\n".join(ops)
+
+
+def _filler_content(page_no: int, rng: random.Random) -> str:
+    ops = [
+        _text(_MARGIN, PAGE_H - 40, "NSDL Consolidated Account Statement for the period 01-Jun-2025 to 30-Jun-2025", 10),
+        _text(_MARGIN, PAGE_H - 60, "Important Information and Disclaimers", 9),
+    ]
+    y = PAGE_H - 80
+    while y > 60:
+        words = " ".join(rng.choice(_FILLER_WORDS) for _ in range(16))
+        ops.append(_text(_MARGIN, y, words.capitalize() + ".", 8))
+        y -= 12
+    ops.append(_text(_MARGIN, 30, f"Page {page_no}", 7))
+    return "\n".join(ops)
+
+
+_FILLER_WORDS = [
+    "investor", "depository", "participant", "statement", "please", "contact", "grievance", "nomination",
+    "securities", "charges", "applicable", "regulations", "holdings", "value", "indicative", "records",
+]
+
+
+def make_pdf(
+    pages: int,
+    tables_per_page: int = 1,
+    rows_per_table: int = 20,
+    ruled: bool = True,
+    seed: Optional[int] = 0,
+    filler_pages: int = 0,
+) -> bytes:
+    """Build a PDF with `pages` table pages, each holding up to `tables_per_page` tables, then `filler_pages` text pages."""
+    rng = random.Random(seed)
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # placeholders, filled once the page ids are known
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for p in range(1, pages + filler_pages + 1):
+        if p <= pages:
+            content = _page_content(p, tables_per_page, rows_per_table, ruled, rng).encode("latin-1")
+        else:
+            content = _filler_content(p, rng).encode("latin-1")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        page_ids.append(add(
+            (
+                f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {PAGE_W} {PAGE_H}] "
+                f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+            ).encode("latin-1")
+        ))
+
+    kids = " ".join(f"{i} 0 R" for i in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode("latin-1")
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode("latin-1")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_at)
+    return bytes(out)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Write a synthetic statement PDF.")
+    ap.add_argument("out", help="Output PDF path")
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--tables-per-page", type=int, default=1)
+    ap.add_argument("--rows", type=int, default=20)
+    ap.add_argument("--borderless", action="store_true", help="Omit ruling lines (stream-style tables)")
+    ap.add_argument("--filler-pages", type=int, default=0, help="Text-only pages without tables appended at the end")
+    args = ap.parse_args()
+
+    with open(args.out, "wb") as f:
+        f.write(make_pdf(args.pages, args.tables_per_page, args.rows, ruled=not args.borderless, filler_pages=args.filler_pages))
+    print(f"Wrote {args.out}")
@@ -1,9 +1,25 @@
 import os
 import sys
+import json
+import time
 import argparse
 import shutil
+from concurrent.futures import ProcessPoolExecutor
 import camelot
-import pdfplumber
+
+from metrics import observe_page
+from page_router import route_pages
+from pdf_pages import page_count, page_rulings
+from spool import pdf_path as spooled_pdf_path
+from table_sinks import FORMATS, open_sink
+
+# auto: one flavor per page from its ruling lines (lattice falls back to stream if it saves nothing)
+# lattice-first: lattice on every page, stream where it saved nothing (the old behaviour)
+FLAVOR_MODES = ("auto", "lattice-first", "lattice", "stream")
+# A page needs this many horizontal AND vertical ruling segments to count as ruled
+MIN_RULINGS = 3
+# Per-page flavor decisions and camelot call counts, written next to the CSVs
+DECISIONS_FILE = "flavor_decisions.json"
 
 def has_ghostscript() -> bool:
     # On Windows Ghostscript cmd is usually gswin64c.exe; on *nix it's 'gs'
@@ -11,8 +27,13 @@ def has_ghostscript() -> bool:
 
 def parse_pages_arg(pdf_path: str, pages_arg: str) -> list[int]:
     if pages_arg.lower() == "all":
-        with pdfplumber.open(pdf_path) as pdf:
-            return list(range(1, len(pdf.pages) + 1))
+        # Only the page tree is read; no page content is parsed just to count pages
+        return list(range(1, page_count(pdf_path) + 1))
+    if pages_arg.lower() == "relevant":
+        # Skip pages without a target section or table rows; see page_router.py
+        route = route_pages(pdf_path)
+        print(f"Page routing: {len(route.pages)} of {route.total} pages, sections {route.sections}")
+        return [p + 1 for p in route.pages]
     # Support things like "5-7,9,10-11"
     pages = set()
     for part in pages_arg.split(","):
@@ -24,62 +45,256 @@ def parse_pages_arg(pdf_path: str, pages_arg: str) -> list[int]:
             pages.add(int(part))
     return sorted(pages)
 
-def save_tables(tables, outdir: str, page: int, flavor: str) -> int:
+def save_tables(tables, sink, page: int, flavor: str) -> int:
     count = 0
     for idx, t in enumerate(tables):
         # Basic sanity: at least 2 rows & 2 columns after extraction
         if t.df.shape[0] >= 2 and t.df.shape[1] >= 2:
-            fname = f"page-{page:02d}_table-{idx+1:02d}_{flavor}.csv"
-            fpath = os.path.join(outdir, fname)
-            t.to_csv(fpath)
+            sink.add(t, page, idx + 1, flavor)
             count += 1
     return count
 
-def extract_all(pdf_path: str, outdir: str, pages: str = "all") -> None:
+def _group_by_page(tables) -> dict[int, list]:
+    # camelot returns tables in page order, and in on-page order within a page
+    by_page: dict[int, list] = {}
+    for t in tables:
+        by_page.setdefault(int(t.page), []).append(t)
+    return by_page
+
+def _read_pages(pdf_path: str, pages: list[int], flavor: str, log: dict[int, list[str]], seconds: dict[int, float]) -> dict[int, list]:
+    """
+    One camelot call for the whole page range; on failure retry page by page to isolate bad pages.
+    Time is added to `seconds` per page (a range call is split evenly over its pages).
+    """
+    t0 = time.perf_counter()
+    try:
+        tables = camelot.read_pdf(pdf_path, pages=",".join(map(str, pages)), flavor=flavor, strip_text=" \n")
+        return _group_by_page(tables)
+    except Exception as e:
+        if len(pages) == 1:
+            log[pages[0]].append(f"[page {pages[0]}] {flavor} failed: {e}")
+            return {}
+    finally:
+        share = (time.perf_counter() - t0) / len(pages)
+        for p in pages:
+            seconds[p] += share
+
+    by_page: dict[int, list] = {}
+    for p in pages:
+        t0 = time.perf_counter()
+        try:
+            tables = camelot.read_pdf(pdf_path, pages=str(p), flavor=flavor, strip_text=" \n")
+            by_page.update(_group_by_page(tables))
+        except Exception as e:
+            log[p].append(f"[page {p}] {flavor} failed: {e}")
+        seconds[p] += time.perf_counter() - t0
+    return by_page
+
+def choose_flavors(pdf_path: str, pages: list[int], mode: str, use_lattice: bool) -> dict[int, dict]:
+    """
+    Pre-pass deciding which camelot flavors to run on each page, in order; later
+    flavors only run where the earlier ones saved nothing. Ruled pages are detected
+    from vector ruling lines (pdf_pages.page_rulings, a few ms per page).
+    """
+    decisions: dict[int, dict] = {}
+    for p, (horizontal, vertical) in zip(pages, page_rulings(pdf_path, [p - 1 for p in pages])):
+        predicted = "lattice" if horizontal >= MIN_RULINGS and vertical >= MIN_RULINGS else "stream"
+        if mode == "auto":
+            plan = ["lattice", "stream"] if predicted == "lattice" else ["stream"]
+        elif mode == "lattice-first":
+            plan = ["lattice", "stream"]
+        else:
+            plan = [mode]
+        if not use_lattice:
+            plan = ["stream"]
+        decisions[p] = {"h_rulings": horizontal, "v_rulings": vertical, "predicted": predicted, "plan": plan}
+    return decisions
+
+def _extract_page_range(pdf_path: str, outdir: str, pages: list[int], plans: dict[int, list[str]], output: dict) -> tuple[list[tuple[int, int, list[str], float, list[str]]], str | None]:
+    """
+    Extract one contiguous page range following each page's flavor plan: one camelot
+    call per flavor and step, and a page moves on to its next flavor only while nothing
+    has been saved for it. Tables go to a sink opened from `output` (see extract_all);
+    a columnar format gets one part file per range. Returns ((page, tables_saved,
+    log_lines, camelot_seconds, flavors_run) in page order, part file or None).
+    """
+    sink = open_sink(
+        output["format"], outdir, part_name=f"{output['part_prefix']}pages-{pages[0]:04d}",
+        source_file=output["source_file"], dataset_dir=output["dataset_dir"],
+    )
+    totals = {p: 0 for p in pages}
+    log: dict[int, list[str]] = {p: [] for p in pages}
+    seconds = {p: 0.0 for p in pages}
+    ran: dict[int, list[str]] = {p: [] for p in pages}
+
+    for step in range(max(len(plans[p]) for p in pages)):
+        by_flavor: dict[str, list[int]] = {}
+        for p in pages:
+            if totals[p] == 0 and step < len(plans[p]):
+                by_flavor.setdefault(plans[p][step], []).append(p)
+        for flavor in sorted(by_flavor):  # "lattice" before "stream"
+            flavor_pages = by_flavor[flavor]
+            for p, tables in _read_pages(pdf_path, flavor_pages, flavor, log, seconds).items():
+                if p in totals:
+                    totals[p] += save_tables(tables, sink, p, flavor)
+            for p in flavor_pages:
+                ran[p].append(flavor)
+
+    part = sink.close()
+    return [(p, totals[p], log[p], seconds[p], ran[p]) for p in pages], part
+
+def _split_ranges(page_list: list[int], parts: int) -> list[list[int]]:
+    size = max(1, -(-len(page_list) // parts))  # ceil division
+    return [page_list[i:i + size] for i in range(0, len(page_list), size)]
+
+def extract_all(
+    pdf_path,
+    outdir: str,
+    pages: str = "all",
+    workers: int = 1,
+    flavor: str = "auto",
+    fmt: str = "csv",
+    source_file: str | None = None,
+    dataset_dir: str | None = None,
+    part_prefix: str = "",
+) -> int:
+    """
+    Extract every table on the requested pages into `outdir`. `pages` is "all",
+    "relevant" (only the pages page_router.py keeps: target sections and table rows) or a list like
+    "1,3,5-7". `flavor` is one of FLAVOR_MODES; the per-page decisions and camelot call
+    counts are written to DECISIONS_FILE in `outdir`.
+
+    `fmt` is one of table_sinks.FORMATS: "csv" writes one CSV per table; "parquet" and
+    "arrow" append every table's rows (tagged with `source_file`, default the PDF's
+    file name) to part files in `dataset_dir` (default tables.parquet / tables.arrow in
+    `outdir`), named `part_prefix` + the first page of each worker's range.
+
+    `pdf_path` may also be in-memory PDF bytes; camelot needs a real path, so those are
+    spilled once to the tmpfs-backed spool directory and shared by all workers.
+
+    With workers > 1 the pages are split into contiguous ranges and farmed out to a
+    process pool; each worker handles its range with one camelot call per flavor.
+    Output filenames and totals are identical to the serial run. Returns the total
+    number of tables saved.
+    """
+    if flavor not in FLAVOR_MODES:
+        raise ValueError(f"flavor must be one of {FLAVOR_MODES}, got {flavor!r}")
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {FORMATS}, got {fmt!r}")
+    if source_file is None:
+        source_file = os.path.basename(pdf_path) if isinstance(pdf_path, (str, os.PathLike)) else ""
+    output = {"format": fmt, "source_file": source_file, "dataset_dir": dataset_dir, "part_prefix": part_prefix}
+    with spooled_pdf_path(pdf_path) as path:
+        return _extract_all(path, outdir, pages, workers, flavor, output)
+
+def _extract_all(pdf_path: str, outdir: str, pages: str, workers: int, flavor: str, output: dict) -> int:
     os.makedirs(outdir, exist_ok=True)
     # DO NOT override pdf_path here
     page_list = parse_pages_arg(pdf_path, pages)
     use_lattice = has_ghostscript()
+    workers = max(1, min(workers, len(page_list) or 1))
 
     print(f"Input: {pdf_path}")
     print(f"Output dir: {outdir}")
     print(f"Pages: {page_list}")
     print(f"Ghostscript detected: {use_lattice}")
+    print(f"Workers: {workers}")
+    print(f"Flavor: {flavor}")
+    print(f"Format: {output['format']}")
 
+    decisions = choose_flavors(pdf_path, page_list, flavor, use_lattice)
+    plans = {p: d["plan"] for p, d in decisions.items()}
+    ranges = _split_ranges(page_list, workers)
     grand_total = 0
-    for p in page_list:
-        page_total = 0
-        if use_lattice:
-            try:
-                lat = camelot.read_pdf(pdf_path, pages=str(p), flavor="lattice", strip_text=" \n")
-                page_total += save_tables(lat, outdir, p, "lattice")
-            except Exception as e:
-                print(f"[page {p}] lattice failed: {e}")
-
-        if page_total == 0:
-            try:
-                stm = camelot.read_pdf(pdf_path, pages=str(p), flavor="stream", strip_text=" \n")
-                page_total += save_tables(stm, outdir, p, "stream")
-            except Exception as e:
-                print(f"[page {p}] stream failed: {e}")
-
-        print(f"[page {p}] tables saved: {page_total}")
-        grand_total += page_total
+    camelot_calls = 0
+    parts: list[str] = []
 
+    def report(range_result: tuple[list[tuple[int, int, list[str], float, list[str]]], str | None]) -> None:
+        nonlocal grand_total, camelot_calls
+        results, part = range_result
+        if part:
+            parts.append(part)
+        # One camelot call per (step, flavor) that ran anywhere in the range (retries not counted)
+        camelot_calls += len({(step, f) for *_rest, ran in results for step, f in enumerate(ran)})
+        for p, page_total, log, seconds, ran in results:
+            for line in log:
+                print(line)
+            # Recorded here so pool workers' timings land in this process's metrics
+            observe_page("camelot", seconds)
+            print(f"[page {p}] tables saved: {page_total} ({'+'.join(ran)}, {seconds:.2f}s)")
+            grand_total += page_total
+            decisions[p].update(ran=ran, tables=page_total, saved_by=ran[-1] if page_total else None, seconds=round(seconds, 3))
+
+    if workers == 1:
+        for page_range in ranges:
+            report(_extract_page_range(pdf_path, outdir, page_range, plans, output))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_extract_page_range, pdf_path, outdir, page_range, plans, output)
+                for page_range in ranges
+            ]
+            # Report in page order regardless of which worker finishes first
+            for fut in futures:
+                report(fut.result())
+
+    summary = _decision_summary(decisions, flavor, use_lattice, camelot_calls)
+    summary.update(format=output["format"], parts=parts)
+    with open(os.path.join(outdir, DECISIONS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "pages": {str(p): d for p, d in decisions.items()}}, f, indent=2)
+    print(
+        f"Page passes: {summary['page_passes']} (lattice-first would need ~{summary['lattice_first_passes_est']}), "
+        f"camelot calls: {camelot_calls}, stream fallbacks after lattice: {summary['lattice_fallbacks']}"
+    )
+
+    if parts:
+        print(f"Part files: {parts}")
     print(f"Done. Total tables saved: {grand_total}")
+    return grand_total
+
+def _decision_summary(decisions: dict[int, dict], flavor: str, use_lattice: bool, camelot_calls: int) -> dict:
+    """
+    Totals for DECISIONS_FILE. `agreement` is the share of pages with tables whose
+    predicted flavor is the one that saved them; it is a real accuracy figure only
+    with --flavor lattice-first, where both flavors get their chance on every page
+    (and None without lattice, since every page then goes to stream).
+    """
+    with_tables = [d for d in decisions.values() if d.get("tables")]
+    if use_lattice:
+        # lattice-first runs lattice everywhere plus stream wherever lattice saved nothing
+        est = sum(1 if d.get("saved_by") == "lattice" else 2 for d in decisions.values())
+    else:
+        est = len(decisions)
+    return {
+        "flavor": flavor,
+        "lattice_available": use_lattice,
+        "pages": len(decisions),
+        "predicted_lattice": sum(d["predicted"] == "lattice" for d in decisions.values()),
+        "page_passes": sum(len(d.get("ran", [])) for d in decisions.values()),
+        "lattice_first_passes_est": est,
+        "camelot_calls": camelot_calls,
+        "lattice_fallbacks": sum(d.get("ran", [])[:2] == ["lattice", "stream"] for d in decisions.values()),
+        "agreement": (
+            round(sum(d["saved_by"] == d["predicted"] for d in with_tables) / len(with_tables), 3)
+            if with_tables and use_lattice else None
+        ),
+    }
 
 def main():
     ap = argparse.ArgumentParser(description="Extract all tables from a PDF to CSV using Camelot.")
     ap.add_argument("pdf", help="Path to input PDF")
-    ap.add_argument("--outdir", default="tables_csv", help="Directory to save CSV files (default: tables_csv)")
-    ap.add_argument("--pages", default="all", help='Pages to parse, e.g. "all" or "1,3,5-7" (default: all)')
+    ap.add_argument("--outdir", default="tables_csv", help="Directory to save the tables in (default: tables_csv)")
+    ap.add_argument("--pages", default="all", help='Pages to parse, e.g. "all", "relevant" (skip pages without target sections or table rows) or "1,3,5-7" (default: all)')
+    ap.add_argument("--workers", type=int, default=1, help="Parallel worker processes, one page range each (default: 1)")
+    ap.add_argument("--flavor", choices=FLAVOR_MODES, default="auto", help="Camelot flavor selection per page (default: auto, from ruling lines)")
+    ap.add_argument("--format", choices=FORMATS, default="csv", help="csv (one file per table), or parquet / arrow (one dataset of table rows; default: csv)")
     args = ap.parse_args()
 
     if not os.path.isfile(args.pdf):
         print(f"ERROR: File not found: {args.pdf}")
         sys.exit(1)
 
-    extract_all(args.pdf, args.outdir, args.pages)
+    extract_all(args.pdf, args.outdir, args.pages, workers=args.workers, flavor=args.flavor, fmt=args.format)
 
 if __name__ == "__main__":
     main()
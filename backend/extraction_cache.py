@@ -0,0 +1,179 @@
+# extraction_cache.py
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, each process evicts on its own
+    fcntl = None
+
+
+def sha256_hex(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(pdf_sha256: str, model_name: str, prompt: str, variant: str = "") -> str:
+    """
+    Content-addressed key for one extraction.
+
+    Any change to the PDF bytes, the model or the prompt text yields a new key, so
+    stale entries are never served after a prompt/model update. `variant` lets
+    callers separate results produced by different extraction modes.
+    """
+    prompt_hash = sha256_hex(prompt.encode("utf-8"))
+    material = f"{pdf_sha256}|{model_name}|{prompt_hash}|{variant}"
+    return sha256_hex(material.encode("utf-8"))
+
+
+class ExtractionCache:
+    """
+    On-disk cache of raw extraction JSON, one file per key.
+
+    - Entries older than `max_age_seconds` are treated as misses and removed.
+    - When the total size exceeds `max_bytes`, least-recently-used entries are evicted.
+    - Hit/miss/eviction counters are kept in memory and exposed via `stats()`.
+
+    The directory may be shared by several processes (uvicorn workers). A key missing
+    from this process's index is looked up on disk, so entries written elsewhere are
+    served, and eviction works from a scan of the directory under a file lock, so the
+    byte cap holds for all processes together.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_age_seconds: float):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        # key -> (size_bytes, created_at); ordered from least to most recently used
+        self._index: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    # ---------- internals ----------
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self) -> None:
+        """Rebuild the index and total size from the files on disk."""
+        self._index.clear()
+        self._total_bytes = 0
+        entries = []
+        for root, _dirs, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_atime, name[:-5], st.st_size, st.st_mtime))
+        # Rebuild LRU order from last access time
+        for _atime, key, size, mtime in sorted(entries):
+            self._index[key] = (size, mtime)
+            self._total_bytes += size
+
+    def _drop(self, key: str) -> None:
+        size, _created = self._index.pop(key, (0, 0))
+        self._total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    @contextmanager
+    def _dir_lock(self) -> Iterator[None]:
+        """Exclusive lock on the cache directory across processes."""
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _evict_to_fit(self) -> None:
+        """Evict least recently accessed entries, counted over the whole directory."""
+        with self._dir_lock():
+            self._load_index()
+            while self._total_bytes > self.max_bytes and self._index:
+                oldest = next(iter(self._index))
+                self._drop(oldest)
+                self.evictions += 1
+
+    # ---------- public API ----------
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                # Possibly written by another process since this index was loaded
+                try:
+                    st = os.stat(self._path(key))
+                except OSError:
+                    self.misses += 1
+                    return None
+                entry = (st.st_size, st.st_mtime)
+                self._index[key] = entry
+                self._total_bytes += st.st_size
+
+            _size, created = entry
+            if time.time() - created > self.max_age_seconds:
+                self._drop(key)
+                self.evictions += 1
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = f.read()
+                os.utime(path, (time.time(), created))
+            except OSError:
+                self._drop(key)
+                self.misses += 1
+                return None
+
+            self._index.move_to_end(key)
+            self.hits += 1
+            return raw
+
+    def put(self, key: str, raw: str) -> None:
+        data = raw.encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # atomic: readers never see a partial entry
+
+        with self._lock:
+            self._evict_to_fit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "max_age_seconds": self.max_age_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
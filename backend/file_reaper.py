@@ -0,0 +1,153 @@
+# file_reaper.py
+
+"""
+Background deletion of files uploaded to the Gemini File API.
+
+Extraction hands the uploaded file's name to `FileReaper.schedule()` and returns as
+soon as the model output is available; the reaper deletes queued files in batches
+off the request path, retrying failures with backoff. On startup `sweep()` lists the
+files this service uploaded (recognised by their display-name prefix) and queues the
+ones old enough to have been left behind by a crashed or killed worker.
+"""
+
+import asyncio
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Tuple
+
+from metrics import log, stage_timer
+
+# Every upload from this service uses a display name starting with this prefix
+DISPLAY_NAME_PREFIX = "pdf-extractor-"
+
+
+class FileReaper:
+    """
+    Queue of remote file names deleted by one background task.
+
+    `delete` is an async callable taking a file name. `list_files` (optional, async)
+    returns objects with `name`, `display_name` and `create_time`; only `sweep()`
+    uses it.
+    """
+
+    def __init__(
+        self,
+        delete: Callable[[str], Awaitable[Any]],
+        list_files: Optional[Callable[[], Awaitable[List[Any]]]] = None,
+        batch_size: int = 20,
+        interval_s: float = 2.0,
+        max_attempts: int = 5,
+    ):
+        self.delete = delete
+        self.list_files = list_files
+        self.batch_size = batch_size
+        self.interval_s = interval_s
+        self.max_attempts = max_attempts
+        # (name, attempts so far, not before monotonic time)
+        self._pending: Deque[Tuple[str, int, float]] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.deleted = 0
+        self.failed = 0
+
+    def schedule(self, name: str) -> None:
+        """Queue a file for deletion; never blocks or raises."""
+        self._pending.append((name, 0, 0.0))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Stop the loop, then make one last attempt at everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.wait_for(self._drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            log(f"File reaper: {len(self._pending)} file(s) left undeleted at shutdown.")
+
+    async def sweep(self, older_than_s: float) -> int:
+        """Queue this service's files created more than `older_than_s` ago. Returns how many."""
+        if self.list_files is None:
+            return 0
+        try:
+            files = await self.list_files()
+        except Exception as e:
+            log(f"File reaper: startup sweep could not list files. Error: {e}")
+            return 0
+        cutoff = datetime.now(timezone.utc).timestamp() - older_than_s
+        queued = 0
+        for f in files:
+            if not (getattr(f, "display_name", "") or "").startswith(DISPLAY_NAME_PREFIX):
+                continue
+            created = getattr(f, "create_time", None)
+            if created is not None and created.timestamp() > cutoff:
+                continue  # may still be in use by another worker
+            self.schedule(f.name)
+            queued += 1
+        if queued:
+            log(f"File reaper: startup sweep queued {queued} stale file(s).")
+            self._wakeup.set()
+        return queued
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while await self._delete_batch():
+                pass
+
+    async def _drain(self) -> None:
+        while self._pending:
+            # Ignore backoff: this is the last chance before the process exits
+            self._pending = deque((name, attempts, 0.0) for name, attempts, _t in self._pending)
+            if not await self._delete_batch():
+                break
+
+    async def _delete_batch(self) -> bool:
+        """Delete up to batch_size due files concurrently. Returns True if a full batch ran."""
+        now = time.monotonic()
+        batch, later = [], []
+        while self._pending and len(batch) < self.batch_size:
+            item = self._pending.popleft()
+            (batch if item[2] <= now else later).append(item)
+        self._pending.extend(later)
+        if not batch:
+            return False
+
+        try:
+            with stage_timer("reaper", "delete_batch"):
+                results = await asyncio.gather(*(self.delete(name) for name, _a, _t in batch), return_exceptions=True)
+        except asyncio.CancelledError:
+            # Stopping mid-batch: keep the files queued for the final drain
+            self._pending.extendleft(reversed(batch))
+            raise
+
+        for (name, attempts, _t), result in zip(batch, results):
+            if not isinstance(result, Exception):
+                self.deleted += 1
+            elif _is_not_found(result):
+                self.deleted += 1  # already gone (expired or deleted elsewhere)
+            elif attempts + 1 >= self.max_attempts:
+                self.failed += 1
+                log(f"File reaper: giving up on {name} after {attempts + 1} attempts. Error: {result}")
+            else:
+                backoff = self.interval_s * (2 ** attempts)
+                self._pending.append((name, attempts + 1, time.monotonic() + backoff))
+        return len(batch) == self.batch_size
+
+
+def _is_not_found(exc: Exception) -> bool:
+    return type(exc).__name__ == "NotFound" or getattr(exc, "code", None) == 404
@@ -0,0 +1,328 @@
+# jobs.py
+
+"""
+Durable background job queue for long-running extractions.
+
+Jobs live in a local SQLite database next to their spooled input PDFs, so queued and
+interrupted jobs survive a restart. A fixed number of asyncio workers claim jobs one
+at a time, which bounds how many extractions run concurrently no matter how many are
+submitted.
+
+Several processes (uvicorn workers) may share the database. A claimed job carries its
+owner and a lease that the owner renews while it runs (heartbeat); only a "running"
+job whose lease has expired, because its process died, is put back in the queue, so
+a restart never re-runs another live process's jobs. A process that loses a lease
+abandons its run and leaves the input file to the new owner. A failed run is retried
+too, unless the error is a client error (4xx); max_attempts caps both kinds of
+restart. Finished jobs and their results are purged once they are older than the
+retention period.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import socket
+import traceback
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Job lifecycle: queued -> running -> done | failed
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    stage       TEXT,
+    progress    REAL NOT NULL DEFAULT 0,
+    filename    TEXT,
+    input_path  TEXT,
+    sha256      TEXT,
+    meta        TEXT,
+    result      TEXT,
+    error       TEXT,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    owner       TEXT,
+    lease_until REAL,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+"""
+
+# Columns added after the first release; ALTERed into older databases on open
+_ADDED_COLUMNS = {"owner": "TEXT", "lease_until": "REAL"}
+
+
+class JobStore:
+    """SQLite-backed job table. All methods are blocking; call them via asyncio.to_thread."""
+
+    def __init__(self, db_path: str, lease_s: float = 60.0):
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, sql_type in _ADDED_COLUMNS.items():
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {sql_type}")
+        self._lock = threading.Lock()
+        # Identifies this process's claims; a lease not renewed for lease_s seconds is expired
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_s = lease_s
+
+    def create(self, kind: str, input_path: str, filename: str, sha256: str) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, stage, filename, input_path, sha256, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, QUEUED, filename, input_path, sha256, now, now),
+            )
+        return job_id
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job, or a running job whose lease has expired
+        (its process died), lease it to this process and return it.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? OR (status = ? AND (lease_until IS NULL OR lease_until < ?))"
+                    " ORDER BY created_at LIMIT 1",
+                    (QUEUED, RUNNING, now),
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, attempts = attempts + 1, owner = ?, lease_until = ?,"
+                    " updated_at = ? WHERE id = ?",
+                    (RUNNING, "starting", self.owner, now + self.lease_s, now, row["id"]),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(row)
+
+    def update_progress(self, job_id: str, stage: str, progress: float) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, lease_until = ?, updated_at = ? WHERE id = ? AND owner = ?",
+                (stage, progress, now + self.lease_s, now, job_id, self.owner),
+            )
+
+    def heartbeat(self, job_id: str) -> bool:
+        """Renew this process's lease on a running job; False if the job is no longer ours."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+                (time.time() + self.lease_s, job_id, self.owner, RUNNING),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: str, result: str, meta: Dict[str, Any]) -> bool:
+        """Store the result; False (nothing written) if another process has taken the job over."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, progress = 1, result = ?, meta = ?, lease_until = NULL,"
+                " updated_at = ? WHERE id = ? AND owner = ?",
+                (DONE, DONE, result, json.dumps(meta), time.time(), job_id, self.owner),
+            )
+            return cur.rowcount == 1
+
+    def fail(self, job_id: str, error: str) -> bool:
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND owner = ?",
+                (FAILED, FAILED, error, time.time(), job_id, self.owner),
+            )
+            return cur.rowcount == 1
+
+    def retry(self, job_id: str, error: str) -> bool:
+        """Put a failed attempt back in the queue; False if another process has taken the job over."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE id = ? AND owner = ?",
+                (QUEUED, "retrying", error, time.time(), job_id, self.owner),
+            )
+            return cur.rowcount == 1
+
+    def requeue_interrupted(self) -> int:
+        """Put running jobs whose lease has expired (their process died) back in the queue."""
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = ?, owner = NULL, lease_until = NULL, updated_at = ?"
+                " WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, "requeued", time.time(), RUNNING, time.time()),
+            )
+            return cur.rowcount
+
+    def purge_finished(self, max_age_s: float) -> int:
+        """Delete done/failed jobs (and their stored results) last updated more than max_age_s ago."""
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, time.time() - max_age_s),
+            )
+            return cur.rowcount
+
+    def count(self, status: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        columns = "*" if with_result else (
+            "id, kind, status, stage, progress, filename, sha256, meta, error, attempts, created_at, updated_at"
+        )
+        with self._lock:
+            row = self._conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+
+# runner(job_row, report_progress) -> (result_json, meta)
+JobRunner = Callable[[Dict[str, Any], Callable[[str, float], Awaitable[None]]], Awaitable[tuple]]
+
+
+class JobQueue:
+    """Fixed pool of asyncio workers draining a JobStore."""
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: JobRunner,
+        workers: int = 2,
+        max_attempts: int = 3,
+        retention_s: float = 7 * 24 * 3600,
+    ):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retention_s = retention_s
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    async def start(self) -> None:
+        requeued = await asyncio.to_thread(self.store.requeue_interrupted)
+        if requeued:
+            print(f"Job queue: requeued {requeued} interrupted job(s).")
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self.retention_s > 0:
+            self._tasks.append(asyncio.create_task(self._purge_loop()))
+        self._wakeup.set()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    async def _worker(self, worker_no: int) -> None:
+        while True:
+            job = await asyncio.to_thread(self.store.claim_next)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    # Poll occasionally as well, in case another process enqueued work
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job, worker_no)
+
+    async def _purge_loop(self) -> None:
+        while True:
+            try:
+                purged = await asyncio.to_thread(self.store.purge_finished, self.retention_s)
+                if purged:
+                    print(f"Job queue: purged {purged} finished job(s) older than {self.retention_s:.0f}s.")
+            except Exception as e:
+                print(f"Job queue: purge failed: {e}")
+            await asyncio.sleep(min(3600.0, self.retention_s))
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Renew the job's lease while it runs, well before it can expire; returns once it is lost."""
+        while True:
+            await asyncio.sleep(self.store.lease_s / 3)
+            if not await asyncio.to_thread(self.store.heartbeat, job_id):
+                return
+
+    async def _run(self, job: Dict[str, Any], worker_no: int) -> None:
+        """Run a job while holding its lease; if the lease is lost, abandon the run to the new owner."""
+        run = asyncio.create_task(self._run_leased(job, worker_no))
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            await asyncio.wait({run, heartbeat}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            run.cancel()
+            heartbeat.cancel()
+            raise
+        if run.done():
+            heartbeat.cancel()
+            await run
+            return
+        print(f"Job {job['id']}: lease lost to another process; abandoning this run.")
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+
+    async def _run_leased(self, job: Dict[str, Any], worker_no: int) -> None:
+        job_id = job["id"]
+
+        async def report(stage: str, progress: float) -> None:
+            await asyncio.to_thread(self.store.update_progress, job_id, stage, progress)
+
+        # Attempts count every claim: failed runs and runs whose process died mid-job
+        attempt = job["attempts"] + 1
+        print(f"Job {job_id}: started on worker {worker_no} (attempt {attempt}).")
+        if attempt > self.max_attempts:
+            if await asyncio.to_thread(self.store.fail, job_id, "Too many attempts; giving up."):
+                self._remove_input(job)
+            return
+        try:
+            result, meta = await self.runner(job, report)
+        except asyncio.CancelledError:
+            raise  # shutting down: the job stays "running" and is requeued once its lease expires
+        except Exception as e:
+            traceback.print_exc()
+            detail = getattr(e, "detail", None) or str(e)
+            # A 4xx (bad or unreadable PDF) fails the same way every time; anything else may not
+            permanent = 400 <= (getattr(e, "status_code", None) or 500) < 500
+            if not permanent and attempt < self.max_attempts:
+                if await asyncio.to_thread(self.store.retry, job_id, detail):
+                    print(f"Job {job_id}: attempt {attempt} failed, requeued: {detail}")
+                    self.notify()
+                return
+            if await asyncio.to_thread(self.store.fail, job_id, detail):
+                print(f"Job {job_id}: failed: {detail}")
+                self._remove_input(job)
+            return
+        # The input is removed only by the process whose result was stored; after a
+        # takeover the new owner is still reading it
+        if await asyncio.to_thread(self.store.complete, job_id, result, meta):
+            print(f"Job {job_id}: done.")
+            self._remove_input(job)
+        else:
+            print(f"Job {job_id}: finished after its lease was taken over; result discarded.")
+
+    @staticmethod
+    def _remove_input(job: Dict[str, Any]) -> None:
+        path = job.get("input_path")
+        if path and os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,457 @@
+# local_extractors.py
+
+"""
+Deterministic, rule-based extraction for statement layouts we already know.
+
+Each registered rule set decides from the text of the first DETECT_PAGES pages
+(pypdfium2, a few milliseconds) whether it recognises the issuer; only then is the
+document parsed with pdfplumber, so statements from other issuers go to Gemini without
+paying for a table pass. A matching rule set maps the pdfplumber tables (see `main.extract_structured_content`) straight
+into the `state.FinancialSecurityStatement` shape. A local result is only trusted when
+it covers the statement: every target section heading found on the pages (see
+pdf_pages.SECTION_PATTERNS) must have parsed rows of its kind (holdings or
+transactions) in its pages, and the statement must contain that kind. Otherwise, or
+when no rule set matches, the caller falls back to Gemini.
+"""
+
+import re
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from main import extract_structured_content
+from metrics import log
+from pdf_pages import SECTION_PATTERNS, page_texts
+from state import FinancialSecurityStatement, SecurityTypeEnum
+
+# -------------------------
+# Column aliases (normalized header text -> canonical field)
+# -------------------------
+
+HOLDING_COLUMNS: Dict[str, List[str]] = {
+    "security_id": ["isin", "isin code", "security id", "cusip"],
+    "security_name": [
+        "security", "security name", "name of security", "company name", "isin description",
+        "scheme name", "scheme", "description", "instrument",
+    ],
+    "quantity": [
+        "quantity", "units", "no of units", "no of shares", "current bal", "current balance",
+        "closing balance", "closing bal", "free bal", "nominal", "holding",
+    ],
+    "price": ["market price", "price", "nav", "closing price", "market price face value"],
+    "market_value": ["value", "market value", "current value", "valuation"],
+    "average_cost_per_unit": ["average cost", "avg cost", "average cost per unit", "cost price"],
+    "total_cost_value": ["cost value", "total cost", "invested value", "book cost"],
+    "unrealized_gain_loss": ["unrealised gain loss", "unrealized gain loss", "unrealised pl", "unrealized pl"],
+    "currency": ["currency", "ccy"],
+    "_account_id": ["folio", "folio no", "folio number"],
+}
+
+TRANSACTION_COLUMNS: Dict[str, List[str]] = {
+    "transaction_date": ["date", "transaction date", "trade date", "posting date", "txn date"],
+    "settlement_date": ["value date", "settlement date"],
+    "transaction_type": ["transaction type", "type", "txn type"],
+    "transaction_description": ["description", "transaction description", "particulars", "narration", "details"],
+    "security_id": ["isin"],
+    "security_name": ["security", "security name", "scheme name", "scheme"],
+    "quantity": ["units", "quantity", "no of units"],
+    "price": ["nav", "price", "price per unit", "nav per unit"],
+    "net_amount": ["amount", "net amount", "transaction amount"],
+    "currency": ["currency", "ccy"],
+    "_debit": ["debit", "withdrawal", "withdrawals"],
+    "_credit": ["credit", "deposit", "deposits"],
+    "_account_id": ["folio", "folio no", "folio number"],
+}
+
+# Sections whose rows are holdings; every other section in SECTION_PATTERNS holds transactions
+HOLDING_SECTIONS = {"equities", "mutual_fund_folios", "short_term_investments", "bonds"}
+_SECTION_RES = {name: re.compile(p, re.IGNORECASE) for name, p in SECTION_PATTERNS.items()}
+
+# Words that mark summary/total rows we must not turn into holdings
+_TOTAL_ROW = re.compile(r"^\s*(grand\s+)?(sub\s*)?total\b", re.IGNORECASE)
+
+_DATE_FORMATS = (
+    "%Y-%m-%d", "%d-%b-%Y", "%d-%b-%y", "%d %b %Y", "%d %B %Y", "%d/%m/%Y", "%d-%m-%Y",
+    "%d.%m.%Y", "%b %d, %Y", "%B %d, %Y", "%d-%B-%Y",
+)
+
+# -------------------------
+# Cell parsing helpers
+# -------------------------
+
+def _clean_cell(value: Any) -> str:
+    if value is None:
+        return ""
+    return " ".join(str(value).split())
+
+
+def _normalize_header(value: Any) -> str:
+    text = _clean_cell(value).lower()
+    text = re.sub(r"\(.*?\)", " ", text)          # drop "(₹)", "(USD)" style suffixes
+    text = re.sub(r"[^a-z0-9 ]+", " ", text)
+    return " ".join(text.split())
+
+
+def parse_number(value: Any) -> Optional[float]:
+    text = _clean_cell(value)
+    if not text or text in ("-", "--", "NA", "N.A.", "nil"):
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    upper = text.upper()
+    if upper.endswith("DR"):
+        negative, text = True, text[:-2]
+    elif upper.endswith("CR"):
+        text = text[:-2]
+    text = re.sub(r"[^0-9.\-]", "", text)
+    if text in ("", "-", ".", "-."):
+        return None
+    try:
+        number = float(text)
+    except ValueError:
+        return None
+    return -abs(number) if negative else number
+
+
+def parse_date(value: Any) -> Optional[str]:
+    text = _clean_cell(value)
+    if not text:
+        return None
+    for fmt in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+    return None
+
+
+_NUMERIC_FIELDS = {
+    "quantity", "price", "market_value", "average_cost_per_unit", "total_cost_value",
+    "unrealized_gain_loss", "net_amount", "_debit", "_credit",
+}
+_DATE_FIELDS = {"transaction_date", "settlement_date", "holding_date"}
+
+# -------------------------
+# Table mapping
+# -------------------------
+
+def _match_columns(header: List[Any], columns: Dict[str, List[str]]) -> Dict[int, str]:
+    """Map header cell positions to canonical fields; exact alias match wins over prefix match."""
+    mapping: Dict[int, str] = {}
+    used = set()
+    normalized = [_normalize_header(h) for h in header]
+    for exact in (True, False):
+        for idx, head in enumerate(normalized):
+            if idx in mapping or not head:
+                continue
+            for field, aliases in columns.items():
+                if field in used:
+                    continue
+                if any(head == a if exact else head.startswith(a + " ") for a in aliases):
+                    mapping[idx] = field
+                    used.add(field)
+                    break
+    return mapping
+
+
+def _find_header(table: List[List[Any]], columns: Dict[str, List[str]]) -> Tuple[int, Dict[int, str]]:
+    """Return (header_row_index, column_mapping) for the best header among the first rows."""
+    best = (-1, {})
+    for row_idx, row in enumerate(table[:4]):
+        mapping = _match_columns(row, columns)
+        if len(mapping) > len(best[1]):
+            best = (row_idx, mapping)
+    return best
+
+
+def _rows(table: List[List[Any]], header_idx: int, mapping: Dict[int, str]) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for row in table[header_idx + 1:]:
+        cells = [_clean_cell(c) for c in row]
+        if not any(cells) or (cells and _TOTAL_ROW.match(cells[0] or " ".join(cells))):
+            continue
+        record: Dict[str, Any] = {}
+        for idx, field in mapping.items():
+            if idx >= len(cells) or not cells[idx]:
+                continue
+            if field in _NUMERIC_FIELDS:
+                record[field] = parse_number(cells[idx])
+            elif field in _DATE_FIELDS:
+                record[field] = parse_date(cells[idx])
+            else:
+                record[field] = cells[idx]
+        out.append(record)
+    return out
+
+
+def table_to_holdings(table: List[List[Any]]) -> List[Dict[str, Any]]:
+    header_idx, mapping = _find_header(table, HOLDING_COLUMNS)
+    fields = set(mapping.values())
+    if not ({"security_id", "security_name"} & fields) or not ({"quantity", "market_value"} & fields):
+        return []
+    return [
+        r for r in _rows(table, header_idx, mapping)
+        if (r.get("security_id") or r.get("security_name"))
+        and (r.get("quantity") is not None or r.get("market_value") is not None)
+    ]
+
+
+def table_to_transactions(table: List[List[Any]]) -> List[Dict[str, Any]]:
+    header_idx, mapping = _find_header(table, TRANSACTION_COLUMNS)
+    fields = set(mapping.values())
+    if "transaction_date" not in fields or not ({"net_amount", "quantity", "_debit", "_credit"} & fields):
+        return []
+    out = []
+    for r in _rows(table, header_idx, mapping):
+        if not r.get("transaction_date"):
+            continue
+        debit, credit = r.pop("_debit", None), r.pop("_credit", None)
+        if r.get("net_amount") is None and (debit is not None or credit is not None):
+            r["net_amount"] = (credit or 0.0) - abs(debit or 0.0)
+        out.append(r)
+    return out
+
+# -------------------------
+# Registry
+# -------------------------
+
+# Leading pages whose text the detect() functions see; issuer names sit in the header
+DETECT_PAGES = 2
+
+# (name, detect(first_pages_text) -> bool, build(structured_data, full_text) -> canonical dict | None)
+_EXTRACTORS: List[Tuple[str, Callable[[str], bool], Callable[[Dict[str, Any], str], Optional[Dict[str, Any]]]]] = []
+
+
+def register_extractor(name: str, detect: Callable[[str], bool]):
+    """Decorator registering a rule set; rules are tried in registration order."""
+    def deco(fn):
+        _EXTRACTORS.append((name, detect, fn))
+        return fn
+    return deco
+
+
+def registered_extractors() -> List[str]:
+    return [name for name, _detect, _fn in _EXTRACTORS]
+
+
+def _period(text: str) -> Tuple[Optional[str], Optional[str]]:
+    m = re.search(
+        r"(?:for the period|statement period|period)\s*(?:from)?\s*:?\s*"
+        r"(\d{1,2}[\s\-/.][A-Za-z0-9]{2,9}[\s\-/.,]+\d{2,4})\s*(?:to|-)\s*"
+        r"(\d{1,2}[\s\-/.][A-Za-z0-9]{2,9}[\s\-/.,]+\d{2,4})",
+        text,
+        re.IGNORECASE,
+    )
+    if not m:
+        return None, None
+    return parse_date(m.group(1)), parse_date(m.group(2))
+
+
+def _assemble(
+    issuer: str,
+    text: str,
+    accounts: Dict[str, Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    if not any(a["holdings"] or a["transactions"] for a in accounts.values()):
+        return None
+    start, end = _period(text)
+    return {
+        "statement_metadata": {
+            "statement_date": end,
+            "start_date": start,
+            "end_date": end,
+            "issuer_name": issuer,
+        },
+        "accounts": [a for a in accounts.values() if a["holdings"] or a["transactions"]],
+    }
+
+
+def _account(accounts: Dict[str, Dict[str, Any]], account_id: Optional[str], account_type: Optional[str], custodian: str):
+    key = account_id or ""
+    if key not in accounts:
+        accounts[key] = {
+            "account_information": {
+                "account_id": account_id,
+                "account_type": account_type,
+                "custodian_name": custodian,
+            },
+            "holdings": [],
+            "transactions": [],
+        }
+    return accounts[key]
+
+
+def _pages_text(structured: Dict[str, Any]) -> Dict[int, str]:
+    return {entry["page"]: entry["text"] for entry in structured.get("metadata_text", [])}
+
+# -------------------------
+# NSDL Consolidated Account Statement
+# -------------------------
+
+_NSDL_DEMAT = re.compile(r"DP\s*ID\s*:?\s*(IN\d{6})\W+Client\s*ID\s*:?\s*(\d{8})", re.IGNORECASE)
+
+
+def _is_nsdl(text: str) -> bool:
+    return bool(re.search(r"\bNSDL\b|National Securities Depository", text, re.IGNORECASE))
+
+
+@register_extractor("nsdl", _is_nsdl)
+def _extract_nsdl(structured: Dict[str, Any], text: str) -> Optional[Dict[str, Any]]:
+    pages = _pages_text(structured)
+    accounts: Dict[str, Dict[str, Any]] = {}
+    current_demat: Optional[str] = None
+
+    for table in structured.get("extracted_tables", []):
+        page_text = pages.get(table["page"], "")
+        ids = _NSDL_DEMAT.findall(page_text)
+        if ids:
+            # Tables are attributed to the last demat account opened on (or before) their page
+            current_demat = ids[-1][0] + ids[-1][1]
+
+        data = table["data"]
+        holdings = table_to_holdings(data)
+        if holdings:
+            is_mf = ("Mutual Fund" in page_text and any(h.get("_account_id") for h in holdings)) or any(
+                _normalize_header(c) == "nav" for c in data[0]
+            )
+            for h in holdings:
+                folio = h.pop("_account_id", None)
+                h["security_type"] = SecurityTypeEnum.MUTUAL_FUND.value if (is_mf or folio) else SecurityTypeEnum.STOCK.value
+                h.setdefault("currency", "INR")
+                if folio:
+                    _account(accounts, folio, "Mutual Fund Folio", "NSDL")["holdings"].append(h)
+                else:
+                    _account(accounts, current_demat, "Demat", "NSDL")["holdings"].append(h)
+            continue
+
+        if "Transaction" not in page_text:
+            continue
+        for t in table_to_transactions(data):
+            folio = t.pop("_account_id", None)
+            t.setdefault("currency", "INR")
+            if folio:
+                t["security_type"] = SecurityTypeEnum.MUTUAL_FUND.value
+                _account(accounts, folio, "Mutual Fund Folio", "NSDL")["transactions"].append(t)
+            else:
+                _account(accounts, current_demat, "Demat", "NSDL")["transactions"].append(t)
+
+    return _assemble("NSDL", text, accounts)
+
+# -------------------------
+# Standard Chartered portfolio statement
+# -------------------------
+
+_SC_PORTFOLIO = re.compile(r"Portfolio\s*(?:Number|No\.?)\s*:?\s*([A-Z0-9][A-Z0-9\-/]+)", re.IGNORECASE)
+
+
+def _is_standard_chartered(text: str) -> bool:
+    return "standard chartered" in text.lower()
+
+
+@register_extractor("standard_chartered", _is_standard_chartered)
+def _extract_standard_chartered(structured: Dict[str, Any], text: str) -> Optional[Dict[str, Any]]:
+    pages = _pages_text(structured)
+    m = _SC_PORTFOLIO.search(text)
+    accounts: Dict[str, Dict[str, Any]] = {}
+    account = _account(accounts, m.group(1) if m else None, "Portfolio", "Standard Chartered Bank")
+
+    for table in structured.get("extracted_tables", []):
+        page_text = pages.get(table["page"], "")
+        data = table["data"]
+        is_activity = "Activity" in page_text
+
+        if not is_activity:
+            holdings = table_to_holdings(data)
+            security_type = SecurityTypeEnum.BOND.value if "Bonds" in page_text else SecurityTypeEnum.OTHERS.value
+            for h in holdings:
+                h.pop("_account_id", None)
+                h["security_type"] = security_type
+            account["holdings"].extend(holdings)
+            if holdings:
+                continue
+
+        for t in table_to_transactions(data):
+            t.pop("_account_id", None)
+            account["transactions"].append(t)
+
+    return _assemble("Standard Chartered Bank", text, accounts)
+
+# -------------------------
+# Coverage
+# -------------------------
+
+def section_coverage(structured: Dict[str, Any], statement: FinancialSecurityStatement) -> Dict[str, bool]:
+    """
+    {section: covered} for every target section heading found in `structured`.
+
+    A section runs from its heading page up to the next page with a target heading
+    (the last one to the end). It is covered when a table on one of those pages parses
+    into rows of its kind and `statement` has rows of that kind.
+    """
+    pages = _pages_text(structured)
+    order = sorted(set(pages) | {t["page"] for t in structured.get("extracted_tables", [])})
+    parsed: Dict[str, set] = {"holdings": set(), "transactions": set()}
+    for table in structured.get("extracted_tables", []):
+        if table_to_holdings(table["data"]):
+            parsed["holdings"].add(table["page"])
+        if table_to_transactions(table["data"]):
+            parsed["transactions"].add(table["page"])
+    has_rows = {
+        "holdings": any(acc.holdings for acc in statement.accounts),
+        "transactions": any(acc.transactions for acc in statement.accounts),
+    }
+
+    headings = {p: [name for name, rx in _SECTION_RES.items() if rx.search(pages.get(p, ""))] for p in order}
+    heading_pages = [p for p in order if headings[p]]
+    covered: Dict[str, bool] = {}
+    for i, start in enumerate(heading_pages):
+        end = heading_pages[i + 1] if i + 1 < len(heading_pages) else order[-1] + 1
+        span = {p for p in order if start <= p < end}
+        for name in headings[start]:
+            kind = "holdings" if name in HOLDING_SECTIONS else "transactions"
+            ok = has_rows[kind] and bool(span & parsed[kind])
+            covered[name] = covered.get(name, False) or ok
+    return covered
+
+# -------------------------
+# Entry point
+# -------------------------
+
+def extract_locally(
+    pdf_source: Any, pages: Optional[Iterable[int]] = None, min_coverage: float = 1.0
+) -> Optional[Tuple[str, FinancialSecurityStatement]]:
+    """
+    Try every registered rule set against the PDF (a path or a binary file object),
+    reading only `pages` (0-based) when given. The issuer is detected from the first
+    DETECT_PAGES of those pages; tables are parsed only when a rule set matches.
+
+    Returns (rule_name, statement) for the first rule set that recognises the issuer
+    and whose result covers at least `min_coverage` of the target sections found (see
+    section_coverage; a statement with no recognised section has coverage 0),
+    otherwise None (use Gemini).
+    """
+    page_list = list(pages) if pages is not None else None
+    head = "\n".join(page_texts(pdf_source, page_list[:DETECT_PAGES] if page_list is not None else range(DETECT_PAGES)))
+    candidates = [(name, build) for name, detect, build in _EXTRACTORS if detect(head)]
+    if not candidates:
+        return None  # unknown issuer, or a scanned document with no text layer
+    if hasattr(pdf_source, "seek"):
+        pdf_source.seek(0)
+
+    structured = extract_structured_content(pdf_source, page_list)
+    full_text = "\n".join(entry["text"] for entry in structured["metadata_text"])
+    if not full_text:
+        return None
+
+    for name, build in candidates:
+        data = build(structured, full_text)
+        if data is None:
+            continue
+        statement = FinancialSecurityStatement.model_validate(data)
+        if not any(acc.holdings or acc.transactions for acc in statement.accounts):
+            continue
+        covered = section_coverage(structured, statement)
+        coverage = sum(covered.values()) / len(covered) if covered else 0.0
+        if coverage >= min_coverage:
+            return name, statement
+        missing = sorted(section for section, ok in covered.items() if not ok)
+        log(f"Local rule set '{name}' covers {coverage:.0%} of sections (missing: {missing or 'no section found'}); not used.")
+    return None
@@ -1,17 +1,22 @@
-import os
+import time
 import traceback
-import tempfile
 import pdfplumber
 import json
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
 
-from fastapi import FastAPI, File, UploadFile, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 
+from metrics import observe_page, render_metrics
+from spool import as_buffer
+from uploads import receive_pdf_upload
+
 # --- Configuration ---
 # Updated path to reflect the new structured JSON output
 OUTPUT_FILE_PATH = "extracted_structured_data.json"
+# Streaming mode writes one JSON record per line instead of a single document
+STREAM_OUTPUT_FILE_PATH = "extracted_structured_data.ndjson"
 
 # --- Response Model (Keeps a simple structure for client communication) ---
 class ExtractionResponse(BaseModel):
@@ -28,55 +33,179 @@ app = FastAPI(
 
 # --- Core Structured Extraction Logic using pdfplumber ---
 
-def extract_structured_data_and_save(pdf_bytes: bytes, output_path: str) -> Dict[str, Any]:
+def iter_page_records(pdf_source: Any, pages: Optional[Iterable[int]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
     """
-    Extracts structured table data and raw text metadata from a PDF using pdfplumber.
-    The result is saved as a JSON file at the specified output path.
+    Walks the PDF one page at a time with pdfplumber, yielding ("table", entry) and
+    ("text", entry) records as soon as each page is processed.
+    `pdf_source` is anything pdfplumber.open accepts: a path or a binary file object.
+    `pages` (0-based indices) restricts the walk to those pages.
 
-    Returns the extracted structured dictionary.
+    Each page's parsed objects are released (page.close()) before moving on, so memory
+    does not grow with the page count.
     """
-    
-    temp_pdf_path = None
-    structured_data = {
-        "metadata_text": [],
-        "extracted_tables": []
-    }
-    
-    try:
-        # 1. Save uploaded bytes to a temporary file (pdfplumber requires a file path)
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(pdf_bytes)
-            temp_pdf_path = temp_pdf.name
-        
-        # 2. Extract content using pdfplumber
-        with pdfplumber.open(temp_pdf_path) as pdf:
-            for i, page in enumerate(pdf.pages):
-                page_number = i + 1
-                
+    with pdfplumber.open(pdf_source) as pdf:
+        indices = range(len(pdf.pages)) if pages is None else pages
+        for i in indices:
+            page = pdf.pages[i]
+            page_number = i + 1
+            try:
+                t0 = time.perf_counter()
                 # --- A. EXTRACT TABLES (Crucial for Holdings/Transactions) ---
                 # This returns clean lists of lists, fixing the LLM's linearization problem.
                 tables: List[List[List[str]]] = page.extract_tables()
-                
+                # --- B. EXTRACT RAW TEXT (For general account info/metadata) ---
+                raw_text = page.extract_text()
+                # Parse time only; time spent by the consumer between yields is excluded
+                observe_page("pdfplumber", time.perf_counter() - t0)
+
                 if tables:
                     for table_idx, table_data in enumerate(tables):
                         # Only include tables that actually contain data (e.g., more than just headers)
                         if table_data and len(table_data) > 1:
-                            structured_data["extracted_tables"].append({
+                            yield "table", {
                                 "page": page_number,
                                 "table_index": table_idx,
                                 "hint": "LLM must classify this table as Holdings, Transactions, or other.",
                                 "data": table_data
-                            })
-                
-                # --- B. EXTRACT RAW TEXT (For general account info/metadata) ---
-                raw_text = page.extract_text()
+                            }
+
                 if raw_text and raw_text.strip():
-                    structured_data["metadata_text"].append({
+                    yield "text", {
                         "page": page_number,
                         "text": raw_text.strip()
-                    })
+                    }
+            finally:
+                # Drop the page's cached layout objects (chars, lines, rects, textmap)
+                page.close()
 
-        # 3. Save the extracted structured content to the final output file as JSON
+
+def extract_structured_content(pdf_source: Any, pages: Optional[Iterable[int]] = None) -> Dict[str, Any]:
+    """
+    Extracts structured table data and raw text metadata from a PDF using pdfplumber
+    (only from `pages`, 0-based, when given).
+
+    Returns the extracted structured dictionary:
+      { "metadata_text": [{page, text}], "extracted_tables": [{page, table_index, hint, data}] }
+    """
+    structured_data = {
+        "metadata_text": [],
+        "extracted_tables": []
+    }
+
+    for kind, entry in iter_page_records(pdf_source, pages):
+        if kind == "table":
+            structured_data["extracted_tables"].append(entry)
+        else:
+            structured_data["metadata_text"].append(entry)
+
+    return structured_data
+
+
+def _tsv_cell(cell: Any) -> str:
+    return "" if cell is None else " ".join(str(cell).split())
+
+
+def compact_pages(pdf_source: Any, pages: Optional[Iterable[int]] = None) -> List[str]:
+    """
+    Serializes each page as compact, page-tagged text for sending to an LLM inline:
+
+        === PAGE 3 ===
+        <page text outside the detected tables>
+        --- TABLE 3.1 ---
+        <one tab-separated line per table row>
+
+    Table regions are dropped from the page text so their contents appear only once.
+    Returns one string per page; pages without a text layer come back as just the tag.
+    `pages` (0-based indices) restricts the output to those pages, keeping their tags.
+    """
+    out: List[str] = []
+    with pdfplumber.open(pdf_source) as pdf:
+        indices = range(len(pdf.pages)) if pages is None else pages
+        for i in indices:
+            page = pdf.pages[i]
+            page_number = i + 1
+            try:
+                t0 = time.perf_counter()
+                found = page.find_tables()
+                bboxes = [t.bbox for t in found]
+
+                def outside_tables(obj: Dict[str, Any]) -> bool:
+                    if "x0" not in obj or "top" not in obj:
+                        return True
+                    cx = (obj["x0"] + obj["x1"]) / 2
+                    cy = (obj["top"] + obj["bottom"]) / 2
+                    return not any(x0 <= cx <= x1 and top <= cy <= bottom for x0, top, x1, bottom in bboxes)
+
+                text = (page.filter(outside_tables) if bboxes else page).extract_text() or ""
+                parts = [f"=== PAGE {page_number} ==="]
+                if text.strip():
+                    parts.append(text.strip())
+                for table_idx, table in enumerate(found):
+                    rows = table.extract()
+                    if not rows:
+                        continue
+                    parts.append(f"--- TABLE {page_number}.{table_idx + 1} ---")
+                    parts.extend("\t".join(_tsv_cell(c) for c in row) for row in rows)
+                out.append("\n".join(parts))
+                observe_page("pdfplumber", time.perf_counter() - t0)
+            finally:
+                page.close()
+    return out
+
+
+def has_text_layer(pages: List[str], min_chars_per_page: int = 20) -> bool:
+    """False for scanned/image-only PDFs, where compact_pages() found (almost) no text."""
+    if not pages:
+        return False
+    content = sum(len(p) - len(p.split("\n", 1)[0]) for p in pages)  # minus the page tags
+    return content >= min_chars_per_page * len(pages)
+
+
+def extract_structured_data_streaming(pdf_source: Any, output_path: str) -> Dict[str, int]:
+    """
+    Streaming variant of `extract_structured_data_and_save` for very large statements.
+
+    Every table/text entry is written to `output_path` as one NDJSON line as soon as its
+    page is processed ({"type": "table"|"text", ...entry}), so neither the extracted
+    content nor pdfplumber's page objects accumulate in memory.
+
+    Returns counts: { "pages", "tables", "text_pages" }.
+    """
+    counts = {"pages": 0, "tables": 0, "text_pages": 0}
+
+    try:
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for kind, entry in iter_page_records(as_buffer(pdf_source)):
+                f.write(json.dumps({"type": kind, **entry}, ensure_ascii=False))
+                f.write("\n")
+                counts["pages"] = max(counts["pages"], entry["page"])
+                if kind == "table":
+                    counts["tables"] += 1
+                else:
+                    counts["text_pages"] += 1
+
+        return counts
+
+    except Exception as e:
+        print(f"An error occurred during streaming PDF extraction: {e}")
+        traceback.print_exc()
+        raise Exception(f"Failed to extract structured PDF content: {str(e)}")
+
+
+def extract_structured_data_and_save(pdf_source: Any, output_path: str) -> Dict[str, Any]:
+    """
+    Extracts structured table data and raw text metadata from a PDF using pdfplumber.
+    `pdf_source` is the PDF as bytes or a path to it.
+    The result is saved as a JSON file at the specified output path.
+
+    Returns the extracted structured dictionary.
+    """
+    
+    try:
+        # 1. Extract content using pdfplumber, reading bytes straight from memory
+        structured_data = extract_structured_content(as_buffer(pdf_source))
+
+        # 2. Save the extracted structured content to the final output file as JSON
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(structured_data, f, indent=2, ensure_ascii=False)
         
@@ -87,32 +216,37 @@ def extract_structured_data_and_save(pdf_bytes: bytes, output_path: str) -> Dict
         traceback.print_exc()
         # Re-raise the exception to be caught by the FastAPI handler
         raise Exception(f"Failed to extract structured PDF content: {str(e)}")
-        
-    finally:
-        # 4. Clean up the temporary PDF file
-        if temp_pdf_path and os.path.exists(temp_pdf_path):
-            os.remove(temp_pdf_path)
 
 
 @app.post("/extract", response_model=ExtractionResponse)
-async def extract_structured_data(file: UploadFile = File(...)):
+async def extract_structured_data(request: Request, stream: bool = False):
     """
     Accepts a PDF upload via the client, extracts all structured table data 
     and metadata using pdfplumber, saves the output to 'extracted_structured_data.json', 
     and returns a success status.
+
+    The multipart `file` part is streamed to a spool file (see uploads.py) rather than
+    read into memory. With `?stream=true` the output is written page by page to
+    'extracted_structured_data.ndjson' with bounded memory (for very large PDFs).
     """
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Invalid file type. Please upload a PDF.")
+    upload = await receive_pdf_upload(request)
 
     try:
-        pdf_bytes = await file.read()
-        structured_content = extract_structured_data_and_save(pdf_bytes, OUTPUT_FILE_PATH)
+        if stream:
+            counts = extract_structured_data_streaming(upload.path, STREAM_OUTPUT_FILE_PATH)
+            return JSONResponse(content={
+                "success": True,
+                "message": f"Structured data (including {counts['tables']} tables from {counts['pages']} pages) successfully streamed from '{upload.filename}' to '{STREAM_OUTPUT_FILE_PATH}'.",
+                "output_file": STREAM_OUTPUT_FILE_PATH
+            })
+
+        structured_content = extract_structured_data_and_save(upload.path, OUTPUT_FILE_PATH)
         
         table_count = len(structured_content["extracted_tables"])
         
         return JSONResponse(content={
             "success": True,
-            "message": f"Structured data (including {table_count} tables) successfully extracted from '{file.filename}' and saved to '{OUTPUT_FILE_PATH}'.",
+            "message": f"Structured data (including {table_count} tables) successfully extracted from '{upload.filename}' and saved to '{OUTPUT_FILE_PATH}'.",
             "output_file": OUTPUT_FILE_PATH
         })
         
@@ -122,6 +256,13 @@ async def extract_structured_data(file: UploadFile = File(...)):
         print(error_message)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=error_message)
+    finally:
+        upload.cleanup()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus text format: per-page pdfplumber timings."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,134 @@
+# metrics.py
+
+"""
+In-process metrics and request-scoped logging.
+
+Histograms are kept in memory and rendered in the Prometheus text format for the
+`/metrics` endpoint; there is no client library dependency. `stage_timer` records
+how long one pipeline stage took (upload, generate, parse, cleanup, ...), and
+`observe_page` records per-page pdfplumber/camelot time.
+
+The current request ID lives in a contextvar set by the HTTP middleware (or by the
+job runner), so `log()` lines from worker threads started via asyncio.to_thread
+carry it as well.
+"""
+
+import contextvars
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def log(message: str) -> None:
+    """print() with the current request ID prefixed, when there is one."""
+    rid = request_id_var.get()
+    print(f"[{rid}] {message}" if rid else message)
+
+
+# -------------------------
+# Histograms
+# -------------------------
+
+# Seconds; covers sub-millisecond parsing up to multi-minute Gemini calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed label set, safe to observe from any thread."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> ([count per bucket, +Inf last], sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[idx] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total[0]) for key, (counts, total) in self._series.items()]
+        for key, counts, total in sorted(series):
+            base = [f'{n}="{_escape_label(v)}"' for n, v in zip(self.labelnames, key)]
+            running = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                running += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = ",".join(base + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{labels}}} {running}")
+            label_str = "{" + ",".join(base) + "}" if base else ""
+            lines.append(f"{self.name}_sum{label_str} {total}")
+            lines.append(f"{self.name}_count{label_str} {running}")
+        return lines
+
+
+REGISTRY: List[Histogram] = []
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STAGE_SECONDS = Histogram(
+    "pdf_extractor_stage_seconds",
+    "Time spent in one stage of the extraction or transform pipeline.",
+    ("pipeline", "stage"),
+)
+PAGE_SECONDS = Histogram(
+    "pdf_extractor_page_seconds",
+    "Per-page table extraction time.",
+    ("engine",),
+)
+PROMPT_TOKENS = Histogram(
+    "pdf_extractor_prompt_tokens",
+    "Gemini prompt tokens per extraction call, by input mode (pdf upload or pre-extracted text).",
+    ("input",),
+    buckets=(1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000),
+)
+REQUEST_SECONDS = Histogram(
+    "pdf_extractor_http_request_seconds",
+    "HTTP request latency by route.",
+    ("method", "route", "status"),
+)
+
+
+@contextmanager
+def stage_timer(pipeline: str, stage: str) -> Iterator[None]:
+    """Time the enclosed block into STAGE_SECONDS and log it with the request ID."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_SECONDS.observe(elapsed, pipeline=pipeline, stage=stage)
+        log(f"{pipeline}.{stage}: {elapsed * 1000:.1f} ms")
+
+
+def observe_page(engine: str, seconds: float) -> None:
+    PAGE_SECONDS.observe(seconds, engine=engine)
@@ -0,0 +1,88 @@
+# page_router.py
+
+"""
+Section-aware page routing: pick the pages of a statement that hold the tables the
+extraction prompt asks for, so camelot and Gemini skip disclaimer, summary and
+terms pages.
+
+Routing works on the pypdfium2 text layer (pdf_pages.page_texts), which is a few
+milliseconds per page, and is keyword based. It only drops pages it is sure hold
+nothing to extract:
+
+  * a page with a target section heading is kept
+  * so is any page that looks like table rows (at least MIN_ROW_LINES lines with an
+    ISIN, or a date and an amount), whatever heading it sits under: a section
+    continuing without its heading, or one whose heading is not in SECTION_PATTERNS
+  * the first page (statement metadata) and the first page of every account are kept
+  * if no page has a target heading the layout is unknown and every page is kept
+
+What is dropped is text without table rows: disclaimers, terms, glossaries.
+"""
+
+import re
+from typing import Any, Dict, List, Optional, Set
+
+from pdf_pages import ACCOUNT_PATTERNS, SECTION_PATTERNS, page_texts
+
+_SECTION_RES = {name: re.compile(p, re.IGNORECASE) for name, p in SECTION_PATTERNS.items()}
+_ACCOUNT_RE = re.compile("|".join(ACCOUNT_PATTERNS), re.IGNORECASE)
+
+# A line looks like a table row if it has an ISIN, a date and an amount, or two amounts
+_ISIN_RE = re.compile(r"\b[A-Z]{2}[A-Z0-9]{9}\d\b")
+_DATE_RE = re.compile(r"\b\d{1,2}[-/ ](?:\d{1,2}|[A-Za-z]{3})[-/ ]\d{2,4}\b|\b\d{4}-\d{2}-\d{2}\b")
+_AMOUNT_RE = re.compile(r"\d\.\d{2}\b")
+
+# Row-like lines that make a page without a target heading worth keeping
+MIN_ROW_LINES = 3
+
+
+class PageRoute:
+    """Routing result: the pages to process and where each section was found (0-based)."""
+
+    def __init__(self, total: int, pages: List[int], sections: Optional[Dict[str, List[int]]] = None):
+        self.total = total
+        self.pages = pages
+        self.sections = sections or {}
+
+    @property
+    def skipped(self) -> int:
+        return self.total - len(self.pages)
+
+
+def _row_lines(text: str) -> int:
+    count = 0
+    for line in text.splitlines():
+        amounts = len(_AMOUNT_RE.findall(line))
+        if _ISIN_RE.search(line) or (amounts and _DATE_RE.search(line)) or amounts >= 2:
+            count += 1
+    return count
+
+
+def route_texts(texts: List[str]) -> PageRoute:
+    """Route pages given their text (index 0 = page 1)."""
+    sections: Dict[str, List[int]] = {}
+    keep: Set[int] = {0} if texts else set()
+    seen_accounts: Set[str] = set()
+
+    for i, text in enumerate(texts):
+        text = text or ""
+        found = [name for name, rx in _SECTION_RES.items() if rx.search(text)]
+        for name in found:
+            sections.setdefault(name, []).append(i)
+
+        accounts = {" ".join(m.group(0).split()).lower() for m in _ACCOUNT_RE.finditer(text)}
+        if accounts - seen_accounts:
+            keep.add(i)  # a new account starts here; its identifiers live on this page
+            seen_accounts |= accounts
+
+        if found or _row_lines(text) >= MIN_ROW_LINES:
+            keep.add(i)
+
+    if not sections:
+        return PageRoute(total=len(texts), pages=list(range(len(texts))))
+    return PageRoute(total=len(texts), pages=sorted(keep), sections=sections)
+
+
+def route_pages(pdf_source: Any, texts: Optional[List[str]] = None) -> PageRoute:
+    """Route a PDF (path or bytes). Pass `texts` if page_texts() was already called."""
+    return route_texts(page_texts(pdf_source) if texts is None else texts)
@@ -0,0 +1,147 @@
+# pdf_pages.py
+
+"""
+Fast page-level PDF helpers built on pypdfium2 (already installed with pdfplumber):
+page text for routing/splitting decisions, page windows aligned with account or
+section boundaries, slicing a PDF into a smaller PDF, and counting ruling lines.
+"""
+
+import io
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+# Every section heading BASE_EXTRACTION_PROMPT (app.py) reads holdings or transactions
+# from; keep the two in step. Page routing (page_router.py), local rule coverage
+# (local_extractors.py) and chunk boundaries below all use this one table.
+SECTION_PATTERNS: Dict[str, str] = {
+    # NSDL
+    "equities": r"Equities\s*\(E\)",
+    "mutual_fund_folios": r"Mutual\s+Fund\s+Folios\s*\(F\)",
+    "mutual_fund_transactions": r"Mutual\s+Funds?\s+Transaction\s+Statement",
+    # Standard Chartered
+    "short_term_investments": r"Short[\s\-]*Term\s+Investments?(?!\s+Activity)",
+    "bonds": r"\bBonds\b",
+    "cash_activity": r"Cash\s+Accounts?\s+Activity",
+    "short_term_investments_activity": r"Short[\s\-]*Term\s+Investments?\s+Activity",
+}
+
+# Account identifiers; the matched text is the account key
+ACCOUNT_PATTERNS = [
+    r"DP\s*ID\s*:?\s*IN\d{6}\s*Client\s*ID\s*:?\s*\d{8}",
+    r"Folio\s*(?:No\.?|Number)\s*:?\s*[\w/]+",
+    r"Portfolio\s*(?:Number|No\.?)\s*:?\s*[\w\-]+",
+]
+
+# A page matching any of these starts a new account or a new target section, so it is
+# a good place to cut a large statement into independent windows.
+BOUNDARY_PATTERNS = ACCOUNT_PATTERNS + list(SECTION_PATTERNS.values())
+_BOUNDARY_RE = re.compile("|".join(BOUNDARY_PATTERNS), re.IGNORECASE)
+
+
+def page_count(pdf_source: Any) -> int:
+    """Number of pages; reads only the page tree, not page content."""
+    pdf = pdfium.PdfDocument(pdf_source)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def page_texts(pdf_source: Any, page_indices: Optional[Iterable[int]] = None) -> List[str]:
+    """Plain text of every page (index 0 = page 1), or of the given 0-based pages, in order."""
+    pdf = pdfium.PdfDocument(pdf_source)
+    texts: List[str] = []
+    try:
+        indices = range(len(pdf)) if page_indices is None else [i for i in page_indices if i < len(pdf)]
+        for i in indices:
+            page = pdf[i]
+            textpage = page.get_textpage()
+            try:
+                texts.append(textpage.get_text_bounded())
+            finally:
+                textpage.close()
+                page.close()
+    finally:
+        pdf.close()
+    return texts
+
+
+def plan_page_windows(texts: List[str], max_pages: int) -> List[Tuple[int, int]]:
+    """
+    Split pages into [start, end) windows of at most `max_pages` pages.
+
+    Where possible a window ends right before a page that opens a new account or
+    section, so each window can be extracted on its own; windows are never cut
+    shorter than half of `max_pages` just to reach a boundary.
+    """
+    n = len(texts)
+    max_pages = max(1, max_pages)
+    boundaries = [i for i, text in enumerate(texts) if _BOUNDARY_RE.search(text or "")]
+
+    windows: List[Tuple[int, int]] = []
+    start = 0
+    while start < n:
+        end = min(start + max_pages, n)
+        if end < n:
+            candidates = [b for b in boundaries if start + max_pages // 2 < b <= end]
+            if candidates:
+                end = candidates[-1]
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def slice_pdf(pdf_source: Any, page_indices: Iterable[int]) -> bytes:
+    """Build a new PDF containing only the given 0-based pages, in order."""
+    src = pdfium.PdfDocument(pdf_source)
+    dst = pdfium.PdfDocument.new()
+    try:
+        dst.import_pages(src, list(page_indices))
+        buf = io.BytesIO()
+        dst.save(buf)
+        return buf.getvalue()
+    finally:
+        dst.close()
+        src.close()
+
+
+# Path objects thinner than this (in points) are ruling lines; shorter ones are ignored
+_RULE_THICKNESS = 2.0
+_MIN_RULE_LENGTH = 10.0
+
+
+def page_rulings(pdf_source: Any, page_indices: Optional[Iterable[int]] = None) -> List[Tuple[int, int]]:
+    """
+    Count (horizontal, vertical) ruling segments per page from the vector path objects.
+
+    Reads object bounds only (no text or rendering), so it costs a few milliseconds per
+    page. A rectangle counts as two horizontal and two vertical segments. Returns one
+    tuple per requested 0-based page, in order (all pages by default).
+    """
+    pdf = pdfium.PdfDocument(pdf_source)
+    counts: List[Tuple[int, int]] = []
+    try:
+        indices = range(len(pdf)) if page_indices is None else page_indices
+        for i in indices:
+            page = pdf[i]
+            horizontal = vertical = 0
+            try:
+                for obj in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_PATH], max_depth=3):
+                    left, bottom, right, top = obj.get_bounds()
+                    width, height = right - left, top - bottom
+                    if height <= _RULE_THICKNESS and width >= _MIN_RULE_LENGTH:
+                        horizontal += 1
+                    elif width <= _RULE_THICKNESS and height >= _MIN_RULE_LENGTH:
+                        vertical += 1
+                    elif width >= _MIN_RULE_LENGTH and height >= _MIN_RULE_LENGTH:
+                        horizontal += 2
+                        vertical += 2
+            finally:
+                page.close()
+            counts.append((horizontal, vertical))
+    finally:
+        pdf.close()
+    return counts
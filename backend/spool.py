@@ -0,0 +1,55 @@
+# spool.py
+
+"""
+Where PDF bytes go when a library insists on a filesystem path (e.g. camelot).
+
+Everything else (pdfplumber, pypdfium2, the Gemini File API upload) reads straight
+from an in-memory buffer, so this is the only place that should touch disk.
+"""
+
+import io
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# tmpfs keeps spill files in RAM; override with SPOOL_DIR if /dev/shm is small or missing
+_DEFAULT_SPOOL_DIR = "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+SPOOL_DIR = os.getenv("SPOOL_DIR") or _DEFAULT_SPOOL_DIR or tempfile.gettempdir()
+
+
+def as_buffer(pdf_source: Any) -> Any:
+    """Return something pdfplumber/pypdfium2 can open without copying to disk."""
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        return io.BytesIO(pdf_source)  # BytesIO shares the bytes buffer until written to
+    return pdf_source
+
+
+@contextmanager
+def pdf_path(pdf_source: Any, suffix: str = ".pdf") -> Iterator[str]:
+    """
+    Yield a filesystem path for `pdf_source`.
+
+    Paths are passed through untouched; bytes/memoryview/binary file objects are
+    written once to SPOOL_DIR and removed on exit.
+    """
+    if isinstance(pdf_source, (str, os.PathLike)):
+        yield os.fspath(pdf_source)
+        return
+
+    if isinstance(pdf_source, io.BytesIO):
+        data = pdf_source.getbuffer()
+    elif isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        data = pdf_source
+    else:
+        data = pdf_source.read()
+
+    with tempfile.NamedTemporaryFile(dir=SPOOL_DIR, suffix=suffix, delete=False) as f:
+        f.write(data)
+        path = f.name
+    del data  # release any exported BytesIO buffer before the caller uses it again
+    try:
+        yield path
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
@@ -2,8 +2,10 @@
 
 from enum import Enum
 from typing import List, Optional, Any, Dict, Union
-from pydantic import BaseModel, Field, ConfigDict, model_validator
-import json
+from pydantic import BaseModel, Field, ConfigDict, ValidationError, ValidationInfo, model_validator
+from pydantic_core import from_json
+
+from metrics import log
 
 # -------------------------
 # Enumerations
@@ -162,163 +164,223 @@ class FinancialSecurityStatement(BaseModel):
     statement_metadata: StatementMetadata = Field(default_factory=StatementMetadata)
     accounts: List[Account] = Field(default_factory=list)
 
-    # ---------- utilities ----------
-    @staticmethod
-    def _dump(obj: Any) -> Any:
-        """Return a plain dict for BaseModel, passthrough otherwise."""
-        if isinstance(obj, BaseModel):
-            return obj.model_dump()
-        return obj
-
-    @classmethod
-    def _dump_list(cls, seq: Any) -> List[Any]:
-        if not isinstance(seq, list):
-            return []
-        out: List[Any] = []
-        for item in seq:
-            if isinstance(item, BaseModel):
-                out.append(item.model_dump())
-            elif isinstance(item, dict):
-                out.append(item)
-            # ignore other types silently
-        return out
-
     # ---------- validator ----------
     @model_validator(mode="before")
     @classmethod
-    def _coerce_llm_shapes(cls, data: Any) -> Any:
-        # If input is a JSON string, parse it first
-        if isinstance(data, str):
+    def _coerce_llm_shapes(cls, data: Any, info: ValidationInfo) -> Any:
+        """
+        Normalize every supported input shape to the canonical dict in one walk.
+
+        Row lists are handed to pydantic as they are (no per-row dumps or copies), so
+        each holding/transaction is validated exactly once; Holding/Transaction/Order
+        instances pass through without re-validation.
+        """
+        # Schema-constrained output is already canonical: validate it as-is, no copies
+        if info.context and info.context.get("structured_output") and isinstance(data, dict) and "accounts" in data:
+            return data
+
+        # If input is JSON text, parse it first
+        if isinstance(data, (str, bytes)):
             try:
-                data = json.loads(data)
-            except Exception:
+                data = from_json(data)
+            except ValueError:
                 return {"statement_metadata": {}, "accounts": []}
 
+        if isinstance(data, BaseModel):
+            data = data.model_dump()
+
         # Already canonical dict (possibly with BaseModel values)?
         if isinstance(data, dict) and ("accounts" in data and "statement_metadata" in data):
-            return cls._normalize_canonical_dict(data)
+            accounts = data["accounts"]
+            return {
+                "statement_metadata": _metadata(data["statement_metadata"]),
+                "accounts": [
+                    _account(acc) for acc in (accounts if isinstance(accounts, list) else [])
+                    if isinstance(acc, (dict, BaseModel))
+                ],
+            }
 
         # Gemini often returns a list of flat account dicts
         if isinstance(data, list):
-            flat_items = [x for x in data if isinstance(x, (dict, BaseModel))]
-            return cls._from_flat_list(flat_items)
+            statement_date = None
+            accounts = []
+            for item in data:
+                if isinstance(item, BaseModel):
+                    item = item.model_dump()
+                elif not isinstance(item, dict):
+                    continue
+                if not statement_date:
+                    statement_date = item.get("statement_date")
+                accounts.append(_flat_account(item))
+            return {"statement_metadata": {"statement_date": statement_date}, "accounts": accounts}
 
         # Single flat dict case (one account)
-        if isinstance(data, (dict, BaseModel)):
-            d = cls._dump(data)
-            if any(k in d for k in ("account_id", "holdings", "transactions")):
-                return cls._from_single_flat_dict(d)
+        if isinstance(data, dict) and any(k in data for k in ("account_id", "holdings", "transactions")):
+            return {
+                "statement_metadata": {"statement_date": data.get("statement_date")},
+                "accounts": [_flat_account(data)],
+            }
 
         # Fallback: empty canonical skeleton
         return {"statement_metadata": {}, "accounts": []}
 
-    # ---------- helpers to build canonical dict ----------
     @classmethod
-    def _normalize_canonical_dict(cls, obj: Any) -> Dict[str, Any]:
-        obj = cls._dump(obj)
-
-        sm_raw = obj.get("statement_metadata")
-        sm = cls._dump(sm_raw) 
-        
-        # CRITICAL FIX 1: Ensure 'sm' is a dictionary before calling .get() for metadata
-        if not isinstance(sm, dict):
-             sm = {}
-
-        accounts_in = obj.get("accounts") or []
-        accounts_in = cls._dump_list(accounts_in)
-
-        normalized_accounts: List[Dict[str, Any]] = []
-        for acc in accounts_in:
-            if not isinstance(acc, (dict, BaseModel)):
-                continue
-            acc = cls._dump(acc)
-            ai_raw = acc.get("account_information") or {}
-            ai = cls._dump(ai_raw) 
-            
-            # CRITICAL FIX 2: Ensure 'ai' is a dictionary before calling .get() for account info
-            if not isinstance(ai, dict):
-                ai = {}
-
-            holdings = cls._dump_list(acc.get("holdings") or [])
-            transactions = cls._dump_list(acc.get("transactions") or [])
-            orders = cls._dump_list(acc.get("orders") or [])
-
-            normalized_accounts.append({
-                "account_information": {
-                    "account_id": ai.get("account_id"),
-                    "account_type": ai.get("account_type"),
-                    "primary_holder_name": ai.get("primary_holder_name"),
-                    "custodian_name": ai.get("custodian_name"),
-                },
-                "holdings": holdings,
-                "transactions": transactions,
-                "orders": orders,
-            })
-
-        return {
-            "statement_metadata": {
-                "statement_date": sm.get("statement_date"),
-                "start_date": sm.get("start_date"),
-                "end_date": sm.get("end_date"),
-                "issuer_name": sm.get("issuer_name"),
-                "statement_frequency": sm.get("statement_frequency"),
-            },
-            "accounts": normalized_accounts,
-        }
-
+    def from_structured_json(cls, raw: Union[str, bytes]) -> "FinancialSecurityStatement":
+        """
+        Validate model output produced under `llm_response_schema()` in a single pass
+        straight from the JSON text. Output that still doesn't fit the schema goes
+        through the usual shape coercion instead of failing.
+        """
+        try:
+            return cls.model_validate_json(raw, context={"structured_output": True})
+        except ValidationError as e:
+            log(f"Structured output did not match the schema ({e.error_count()} errors); coercing.")
+            return cls.model_validate(raw if isinstance(raw, str) else raw.decode("utf-8", "replace"))
+
+    # ---------- merging partial results ----------
     @classmethod
-    def _from_single_flat_dict(cls, d: Dict[str, Any]) -> Dict[str, Any]:
-        return {
-            "statement_metadata": {
-                "statement_date": d.get("statement_date"),
-                "start_date": None,
-                "end_date": None,
-                "issuer_name": None,
-                "statement_frequency": None,
-            },
-            "accounts": [
-                {
-                    "account_information": {
-                        "account_id": d.get("account_id"),
-                        "account_type": None,
-                        "primary_holder_name": None,
-                        "custodian_name": None,
-                    },
-                    "holdings": cls._dump_list(d.get("holdings") or []),
-                    "transactions": cls._dump_list(d.get("transactions") or []),
-                    "orders": cls._dump_list(d.get("orders") or []),
-                }
-            ],
-        }
+    def merge(cls, parts: List[Any]) -> "FinancialSecurityStatement":
+        """
+        Merge partial extractions (e.g. one per page window of a large PDF).
+
+        Each part may be any shape `_coerce_llm_shapes` accepts (raw JSON string, flat
+        list, canonical dict, model). Accounts are deduplicated by `account_id` with their
+        holdings/transactions/orders concatenated in part order; metadata and account
+        information fields take the first non-null value seen.
+        """
+        statements = [p if isinstance(p, cls) else cls.model_validate(p) for p in parts]
+
+        metadata: Dict[str, Any] = {}
+        accounts: Dict[Optional[str], Dict[str, Any]] = {}
+        for st in statements:
+            for k, v in st.statement_metadata.model_dump().items():
+                if metadata.get(k) is None:
+                    metadata[k] = v
+            for acc in st.accounts:
+                acc_id = acc.account_information.account_id
+                merged = accounts.setdefault(acc_id, {
+                    "account_information": {},
+                    "holdings": [],
+                    "transactions": [],
+                    "orders": [],
+                })
+                for k, v in acc.account_information.model_dump().items():
+                    if merged["account_information"].get(k) is None:
+                        merged["account_information"][k] = v
+                merged["holdings"].extend(acc.holdings)
+                merged["transactions"].extend(acc.transactions)
+                merged["orders"].extend(acc.orders)
+
+        return cls.model_validate({
+            "statement_metadata": metadata,
+            "accounts": list(accounts.values()),
+        })
 
-    @classmethod
-    def _from_flat_list(cls, items: List[Any]) -> Dict[str, Any]:
-        accounts: List[Dict[str, Any]] = []
-        statement_date = None
-
-        for it in items:
-            it = cls._dump(it)
-            if not statement_date:
-                statement_date = it.get("statement_date")
-            accounts.append({
-                "account_information": {
-                    "account_id": it.get("account_id"),
-                    "account_type": None,
-                    "primary_holder_name": None,
-                    "custodian_name": None,
-                },
-                "holdings": cls._dump_list(it.get("holdings") or []),
-                "transactions": cls._dump_list(it.get("transactions") or []),
-                "orders": cls._dump_list(it.get("orders") or []),
-            })
-
-        return {
-            "statement_metadata": {
-                "statement_date": statement_date,
-                "start_date": None,
-                "end_date": None,
-                "issuer_name": None,
-                "statement_frequency": None,
-            },
-            "accounts": accounts,
-        }
\ No newline at end of file
+
+# -------------------------
+# Normalizer helpers (module level so pydantic doesn't treat them as fields)
+# -------------------------
+
+def _rows(seq: Any, model: type) -> List[Any]:
+    """
+    Row list for one account section. Dicts and `model` instances pass through; the
+    list itself is reused when nothing needs fixing (the common case).
+    """
+    if not isinstance(seq, list):
+        return []
+    for item in seq:
+        if not isinstance(item, (dict, model)):
+            break
+    else:
+        return seq
+    # Rare: foreign models are dumped, non-dict junk is dropped
+    return [
+        item if isinstance(item, (dict, model)) else item.model_dump()
+        for item in seq
+        if isinstance(item, (dict, BaseModel))
+    ]
+
+
+def _metadata(sm: Any) -> Any:
+    if isinstance(sm, StatementMetadata):
+        return sm
+    if isinstance(sm, BaseModel):
+        sm = sm.model_dump()
+    if not isinstance(sm, dict):
+        return {}
+    return {
+        "statement_date": sm.get("statement_date"),
+        # Gemini's extraction prompt uses the reporting_period_* / statement_issuer names
+        "start_date": sm.get("start_date") or sm.get("reporting_period_start"),
+        "end_date": sm.get("end_date") or sm.get("reporting_period_end"),
+        "issuer_name": sm.get("issuer_name") or sm.get("statement_issuer"),
+        "statement_frequency": sm.get("statement_frequency"),
+    }
+
+
+def _account(acc: Any) -> Any:
+    if isinstance(acc, Account):
+        return acc
+    if isinstance(acc, BaseModel):
+        acc = acc.model_dump()
+    ai = acc.get("account_information") or {}
+    if isinstance(ai, BaseModel) and not isinstance(ai, AccountInformation):
+        ai = ai.model_dump()
+    elif not isinstance(ai, (dict, AccountInformation)):
+        ai = {}
+    return {
+        "account_information": ai,
+        "holdings": _rows(acc.get("holdings"), Holding),
+        "transactions": _rows(acc.get("transactions"), Transaction),
+        "orders": _rows(acc.get("orders"), Order),
+    }
+
+
+def _flat_account(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "account_information": {"account_id": d.get("account_id")},
+        "holdings": _rows(d.get("holdings"), Holding),
+        "transactions": _rows(d.get("transactions"), Transaction),
+        "orders": _rows(d.get("orders"), Order),
+    }
+
+
+# -------------------------
+# Response schema for Gemini structured output
+# -------------------------
+
+# Keys the Gemini Schema proto understands; everything else pydantic emits is dropped
+_SCHEMA_KEYS = ("type", "format", "nullable", "enum", "properties", "required", "items")
+
+
+def _to_gemini_schema(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in node:
+        node = defs[node["$ref"].split("/")[-1]]
+
+    nullable = False
+    if "anyOf" in node:
+        # Optional[X] is the only union in these models
+        options = [o for o in node["anyOf"] if o.get("type") != "null"]
+        nullable = len(options) < len(node["anyOf"])
+        node = defs[options[0]["$ref"].split("/")[-1]] if "$ref" in options[0] else options[0]
+
+    out: Dict[str, Any] = {k: node[k] for k in _SCHEMA_KEYS if k in node and k not in ("properties", "items", "required")}
+    if "enum" in out:
+        out.setdefault("type", "string")
+        out["format"] = "enum"
+    if nullable:
+        out["nullable"] = True
+    if "properties" in node:
+        out["type"] = "object"
+        out["properties"] = {name: _to_gemini_schema(sub, defs) for name, sub in node["properties"].items()}
+        # Containers must be present; scalar fields may be null
+        out["required"] = [name for name, sub in out["properties"].items() if not sub.get("nullable")]
+    if "items" in node:
+        out["items"] = _to_gemini_schema(node["items"], defs)
+    return out
+
+
+def llm_response_schema() -> Dict[str, Any]:
+    """FinancialSecurityStatement as a Gemini `response_schema` (inlined refs, nullable Optionals)."""
+    schema = FinancialSecurityStatement.model_json_schema()
+    return _to_gemini_schema(schema, schema.get("$defs", {}))
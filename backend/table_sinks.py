@@ -0,0 +1,168 @@
+# table_sinks.py
+
+"""
+Where camelot_csv.py puts the tables it extracts.
+
+  csv      one page-XX_table-YY_flavor.csv per table (the original layout)
+  parquet  rows appended to a Parquet dataset directory, one part file per writer
+  arrow    the same as Arrow IPC (Feather v2) part files
+
+The columnar formats use one long schema, one record per table row, so tables with
+different column counts share a file:
+
+  source_file string, page int32, table_index int32, flavor string,
+  row_index int32, cells list<string>
+
+Each writer (a camelot_csv worker, or one PDF in batch_extract.py) owns its own part
+file, so nothing is shared between processes. Rows are buffered and written as one
+record batch / row group per ROWS_PER_BATCH rows, and a part file only appears under
+its final name once it is complete, so a killed worker never leaves a truncated part
+in the dataset. Read a dataset back with
+`pyarrow.dataset.dataset(path, format="parquet" | "ipc")` or `pandas.read_parquet(path)`.
+"""
+
+import os
+from typing import Any, List, Optional
+
+import numpy as np
+
+FORMATS = ("csv", "parquet", "arrow")
+# Dataset directory name inside the output directory, per columnar format
+DATASET_DIRS = {"parquet": "tables.parquet", "arrow": "tables.arrow"}
+# Rows buffered before a record batch / row group is written
+ROWS_PER_BATCH = 65536
+
+
+def table_schema() -> Any:
+    import pyarrow as pa
+
+    return pa.schema([
+        ("source_file", pa.string()),
+        ("page", pa.int32()),
+        ("table_index", pa.int32()),
+        ("flavor", pa.string()),
+        ("row_index", pa.int32()),
+        ("cells", pa.list_(pa.string())),
+    ])
+
+
+class CsvSink:
+    """One CSV file per table, named page-XX_table-YY_flavor.csv."""
+
+    def __init__(self, outdir: str):
+        self.outdir = outdir
+        self.files = 0
+
+    def add(self, table: Any, page: int, table_index: int, flavor: str) -> None:
+        table.to_csv(os.path.join(self.outdir, f"page-{page:02d}_table-{table_index:02d}_{flavor}.csv"))
+        self.files += 1
+
+    def close(self) -> Optional[str]:
+        return None
+
+
+class _ColumnarSink:
+    """Buffers table rows as Arrow arrays and writes them in batches to one part file."""
+
+    extension = ""
+
+    def __init__(self, dataset_dir: str, part_name: str, source_file: str):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.schema = table_schema()
+        self.source_file = source_file
+        os.makedirs(dataset_dir, exist_ok=True)
+        self.path = os.path.join(dataset_dir, part_name + self.extension)
+        # Hidden until complete: dataset readers skip names starting with "." or "_"
+        self._tmp_path = os.path.join(dataset_dir, f".{part_name}{self.extension}.tmp-{os.getpid()}")
+        self._writer: Any = None
+        self._pending: List[Any] = []
+        self._pending_rows = 0
+        self.rows = 0
+        self.tables = 0
+
+    def add(self, table: Any, page: int, table_index: int, flavor: str) -> None:
+        pa = self._pa
+        # One object-array view of the DataFrame; cells go to Arrow without a per-cell Python loop
+        values = np.asarray(table.df.to_numpy(dtype=object)).reshape(-1)
+        n_rows, n_cols = table.df.shape
+        offsets = pa.array(np.arange(0, n_rows * n_cols + 1, n_cols, dtype=np.int32))
+        cells = pa.ListArray.from_arrays(offsets, pa.array(values, type=pa.string(), from_pandas=True))
+        self._pending.append(pa.RecordBatch.from_arrays(
+            [
+                pa.array(np.full(n_rows, self.source_file, dtype=object), type=pa.string()),
+                pa.array(np.full(n_rows, page, dtype=np.int32)),
+                pa.array(np.full(n_rows, table_index, dtype=np.int32)),
+                pa.array(np.full(n_rows, flavor, dtype=object), type=pa.string()),
+                pa.array(np.arange(n_rows, dtype=np.int32)),
+                cells,
+            ],
+            schema=self.schema,
+        ))
+        self._pending_rows += n_rows
+        self.tables += 1
+        if self._pending_rows >= ROWS_PER_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        if self._writer is None:
+            self._writer = self._open(self._tmp_path)
+        self._write(self._pa.Table.from_batches(self._pending, schema=self.schema).combine_chunks())
+        self.rows += self._pending_rows
+        self._pending, self._pending_rows = [], 0
+
+    def close(self) -> Optional[str]:
+        """Write what is buffered and publish the part file; returns its path (None if no tables)."""
+        self._flush()
+        if self._writer is None:
+            return None
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+        return self.path
+
+    def _open(self, path: str) -> Any:
+        raise NotImplementedError
+
+    def _write(self, table: Any) -> None:
+        raise NotImplementedError
+
+
+class ParquetSink(_ColumnarSink):
+    extension = ".parquet"
+
+    def _open(self, path: str) -> Any:
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(path, self.schema, compression="zstd")
+
+    def _write(self, table: Any) -> None:
+        self._writer.write_table(table, row_group_size=ROWS_PER_BATCH)
+
+
+class ArrowSink(_ColumnarSink):
+    extension = ".arrow"
+
+    def _open(self, path: str) -> Any:
+        import pyarrow.ipc as ipc
+
+        return ipc.new_file(path, self.schema)
+
+    def _write(self, table: Any) -> None:
+        self._writer.write_table(table, max_chunksize=ROWS_PER_BATCH)
+
+
+def open_sink(fmt: str, outdir: str, part_name: str = "part", source_file: str = "", dataset_dir: Optional[str] = None) -> Any:
+    """
+    A sink for `fmt`. CSV files go to `outdir`; columnar part files go to `dataset_dir`
+    (default: DATASET_DIRS[fmt] inside `outdir`) as `part_name` + extension.
+    """
+    if fmt == "csv":
+        return CsvSink(outdir)
+    if fmt == "parquet":
+        return ParquetSink(dataset_dir or os.path.join(outdir, DATASET_DIRS[fmt]), part_name, source_file)
+    if fmt == "arrow":
+        return ArrowSink(dataset_dir or os.path.join(outdir, DATASET_DIRS[fmt]), part_name, source_file)
+    raise ValueError(f"format must be one of {FORMATS}, got {fmt!r}")
@@ -0,0 +1,7 @@
+# tests/conftest.py
+
+import os
+import sys
+
+# The backend modules are flat top-level imports (run from backend/, like the app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
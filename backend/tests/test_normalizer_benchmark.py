@@ -0,0 +1,44 @@
+# tests/test_normalizer_benchmark.py
+
+"""
+pytest-benchmark suite for FinancialSecurityStatement normalization: the canonical,
+flat-list and single-flat-dict shapes at 1k/10k/100k rows, from parsed objects and
+from JSON text. Payloads come from bench/bench_normalizer.py.
+
+    pip install pytest-benchmark
+    python -m pytest tests/test_normalizer_benchmark.py --benchmark-only
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bench.bench_normalizer import make_input  # noqa: E402
+from state import FinancialSecurityStatement  # noqa: E402
+
+SHAPES = ("canonical", "flat_list", "flat_dict")
+ROWS = (1_000, 10_000, 100_000)
+
+
+def _rows(statement: FinancialSecurityStatement) -> int:
+    return sum(len(a.holdings) + len(a.transactions) for a in statement.accounts)
+
+
+@pytest.mark.parametrize("rows", ROWS)
+@pytest.mark.parametrize("shape", SHAPES)
+def test_validate_objects(benchmark, shape, rows):
+    data = make_input(shape, rows)
+    benchmark.group = f"{shape}-{rows}"
+    statement = benchmark(FinancialSecurityStatement.model_validate, data)
+    assert _rows(statement) == rows
+
+
+@pytest.mark.parametrize("rows", ROWS)
+@pytest.mark.parametrize("shape", SHAPES)
+def test_validate_json_text(benchmark, shape, rows):
+    text = json.dumps(make_input(shape, rows))
+    benchmark.group = f"{shape}-{rows}"
+    statement = benchmark(FinancialSecurityStatement.model_validate, text)
+    assert _rows(statement) == rows
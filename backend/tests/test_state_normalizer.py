@@ -0,0 +1,202 @@
+# tests/test_state_normalizer.py
+
+"""
+Pins FinancialSecurityStatement's shape normalization.
+
+EXPECTED is what the original normalizer (before the single-pass rewrite) produced for
+each payload; the rewrite must keep producing it. The one intended difference, the
+statement_issuer / reporting_period_* metadata names, has its own tests.
+"""
+
+import json
+
+import pytest
+
+from state import FinancialSecurityStatement, Holding, Transaction
+
+HOLDING = {
+    "security_id": "INE238A01034",
+    "security_name": "AXIS BANK LIMITED",
+    "security_type": "Stock",
+    "quantity": 10,
+    "price": 1000.5,
+    "market_value": 10005.0,
+    "currency": "INR",
+}
+TRANSACTION = {
+    "transaction_date": "2024-03-01",
+    "transaction_type": "BUY",
+    "security_name": "AXIS BANK LIMITED",
+    "quantity": 10,
+    "net_amount": -10005.0,
+    "currency": "INR",
+}
+ORDER = {"order_date": "2024-03-01", "order_ref": "O-1", "transaction_type": "BUY", "quantity": 10}
+
+FLAT_ACCOUNTS = [
+    {"account_id": "IN300000-10000001", "statement_date": "2024-03-31", "holdings": [HOLDING], "transactions": [TRANSACTION]},
+    {"account_id": "FOLIO-1", "statement_date": "2024-04-01", "holdings": [], "transactions": [TRANSACTION], "orders": [ORDER]},
+]
+
+EMPTY = {"statement_metadata": {}, "accounts": []}
+
+
+def _account(account_information, holdings=(), transactions=(), orders=()):
+    return {
+        "account_information": account_information,
+        "holdings": list(holdings),
+        "transactions": list(transactions),
+        "orders": list(orders),
+    }
+
+
+FLAT_EXPECTED = {
+    "statement_metadata": {"statement_date": "2024-03-31"},
+    "accounts": [
+        _account({"account_id": "IN300000-10000001"}, [HOLDING], [TRANSACTION]),
+        _account({"account_id": "FOLIO-1"}, [], [TRANSACTION], [ORDER]),
+    ],
+}
+
+# name -> (payload, expected model_dump(mode="json", exclude_none=True))
+CASES = {
+    "canonical_dict": (
+        {
+            "statement_metadata": {
+                "statement_date": "2024-03-31",
+                "start_date": "2024-03-01",
+                "end_date": "2024-03-31",
+                "issuer_name": "NSDL",
+                "statement_frequency": "Monthly",
+            },
+            "accounts": [
+                {
+                    "account_information": {"account_id": "A1", "account_type": "Demat", "custodian_name": "NSDL"},
+                    "holdings": [HOLDING],
+                    "transactions": [TRANSACTION],
+                    "orders": [ORDER],
+                }
+            ],
+        },
+        {
+            "statement_metadata": {
+                "statement_date": "2024-03-31",
+                "start_date": "2024-03-01",
+                "end_date": "2024-03-31",
+                "issuer_name": "NSDL",
+                "statement_frequency": "Monthly",
+            },
+            "accounts": [
+                _account({"account_id": "A1", "account_type": "Demat", "custodian_name": "NSDL"}, [HOLDING], [TRANSACTION], [ORDER])
+            ],
+        },
+    ),
+    "canonical_with_models": (
+        {
+            "statement_metadata": {"statement_date": "2024-03-31"},
+            "accounts": [
+                {
+                    "account_information": {"account_id": "A1"},
+                    "holdings": [Holding(**HOLDING)],
+                    "transactions": [Transaction(**TRANSACTION)],
+                }
+            ],
+        },
+        {
+            "statement_metadata": {"statement_date": "2024-03-31"},
+            "accounts": [_account({"account_id": "A1"}, [HOLDING], [TRANSACTION])],
+        },
+    ),
+    "canonical_json": (
+        json.dumps({
+            "statement_metadata": {"statement_date": "2024-03-31"},
+            "accounts": [{"account_information": {"account_id": "A1"}, "holdings": [HOLDING]}],
+        }),
+        {
+            "statement_metadata": {"statement_date": "2024-03-31"},
+            "accounts": [_account({"account_id": "A1"}, [HOLDING])],
+        },
+    ),
+    "canonical_with_junk": (
+        {
+            "statement_metadata": "not a dict",
+            "accounts": [{"account_information": "nope", "holdings": [HOLDING, 5, None], "transactions": "x"}, 7, None],
+        },
+        {"statement_metadata": {}, "accounts": [_account({}, [HOLDING])]},
+    ),
+    "flat_list": (FLAT_ACCOUNTS + [3, None, "junk"], FLAT_EXPECTED),
+    "flat_list_json": (json.dumps(FLAT_ACCOUNTS), FLAT_EXPECTED),
+    "single_flat_dict": (
+        {"account_id": "A1", "statement_date": "2024-03-31", "holdings": [HOLDING]},
+        {"statement_metadata": {"statement_date": "2024-03-31"}, "accounts": [_account({"account_id": "A1"}, [HOLDING])]},
+    ),
+    "malformed_json": ('{"accounts": [ {"account_id": ', EMPTY),
+    "unrelated_dict": ({"foo": 1}, EMPTY),
+    "scalar": (42, EMPTY),
+}
+
+
+@pytest.mark.parametrize("name", list(CASES))
+def test_normalizer_output_is_unchanged(name):
+    payload, expected = CASES[name]
+    statement = FinancialSecurityStatement.model_validate(payload)
+    assert statement.model_dump(mode="json", exclude_none=True) == expected
+
+
+def test_prompt_metadata_names_are_mapped():
+    statement = FinancialSecurityStatement.model_validate({
+        "statement_metadata": {
+            "statement_date": "2024-03-31",
+            "statement_issuer": "Standard Chartered Bank",
+            "reporting_period_start": "2024-03-01",
+            "reporting_period_end": "2024-03-31",
+        },
+        "accounts": [],
+    })
+    assert statement.statement_metadata.model_dump(exclude_none=True) == {
+        "statement_date": "2024-03-31",
+        "start_date": "2024-03-01",
+        "end_date": "2024-03-31",
+        "issuer_name": "Standard Chartered Bank",
+    }
+
+
+def test_canonical_metadata_names_win_over_prompt_names():
+    statement = FinancialSecurityStatement.model_validate({
+        "statement_metadata": {"issuer_name": "NSDL", "statement_issuer": "Other", "start_date": "2024-01-01",
+                               "reporting_period_start": "2023-01-01"},
+        "accounts": [],
+    })
+    assert statement.statement_metadata.issuer_name == "NSDL"
+    assert statement.statement_metadata.start_date == "2024-01-01"
+
+
+def test_structured_json_matches_coerced_result():
+    raw = json.dumps(CASES["canonical_dict"][0])
+    structured = FinancialSecurityStatement.from_structured_json(raw)
+    assert structured == FinancialSecurityStatement.model_validate(raw)
+
+
+def test_structured_json_falls_back_to_coercion(capsys):
+    # Off-schema output (metadata that is not an object) goes through the shape coercion
+    payload, expected = CASES["canonical_with_junk"]
+    statement = FinancialSecurityStatement.from_structured_json(json.dumps(payload))
+    assert statement.model_dump(mode="json", exclude_none=True) == expected
+    assert "coercing" in capsys.readouterr().out
+
+
+def test_merge_deduplicates_accounts_in_part_order():
+    parts = [
+        json.dumps([{"account_id": "A1", "statement_date": "2024-03-31", "holdings": [HOLDING]}]),
+        {"statement_metadata": {"issuer_name": "NSDL"},
+         "accounts": [{"account_information": {"account_id": "A1", "account_type": "Demat"}, "transactions": [TRANSACTION]},
+                      {"account_information": {"account_id": "A2"}, "holdings": [HOLDING]}]},
+    ]
+    merged = FinancialSecurityStatement.merge(parts)
+    assert merged.model_dump(mode="json", exclude_none=True) == {
+        "statement_metadata": {"statement_date": "2024-03-31", "issuer_name": "NSDL"},
+        "accounts": [
+            _account({"account_id": "A1", "account_type": "Demat"}, [HOLDING], [TRANSACTION]),
+            _account({"account_id": "A2"}, [HOLDING]),
+        ],
+    }
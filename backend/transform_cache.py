@@ -0,0 +1,146 @@
+# transform_cache.py
+
+"""
+Row-level memoization for /transform.
+
+A transformed row is keyed by the normalized mapping rules, the entity type and the
+row's content (without `_ui_id`), so re-applying the same rules after small edits
+only sends the changed rows to the model. Entries live in an in-memory LRU and,
+optionally, in a SQLite file that survives restarts. Both hold at most `max_entries`
+rows; the SQLite file drops the rows least recently looked up.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from transform_programs import normalize_rules
+
+
+def row_cache_key(mapping_rules: str, entity_type: str, row: dict) -> str:
+    content = {k: v for k, v in row.items() if k != "_ui_id"}
+    material = json.dumps(
+        [normalize_rules(mapping_rules), entity_type, content],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class TransformRowCache:
+    """LRU of transformed rows (stored without `_ui_id`) with an optional SQLite backend."""
+
+    def __init__(self, max_entries: int = 50_000, persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._db_rows = 0  # upper bound on rows in SQLite; exact count taken only when it passes the cap
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+        if persist_path:
+            os.makedirs(os.path.dirname(os.path.abspath(persist_path)), exist_ok=True)
+            self._conn = sqlite3.connect(persist_path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, value TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(rows)")}
+            if "accessed_at" not in columns:  # files written before eviction existed
+                self._conn.execute("ALTER TABLE rows ADD COLUMN accessed_at REAL")
+                self._conn.execute("UPDATE rows SET accessed_at = updated_at")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS rows_accessed ON rows (accessed_at)")
+            self._db_rows = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+            self._evict_persisted()
+
+    def _remember(self, key: str, value: dict) -> None:
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _evict_persisted(self) -> None:
+        """Delete the least recently accessed SQLite rows beyond max_entries."""
+        if self._db_rows <= self.max_entries:
+            return
+        count = self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM rows WHERE key IN (SELECT key FROM rows ORDER BY accessed_at LIMIT ?)", (excess,)
+            )
+            self.evicted += excess
+        self._db_rows = min(count, self.max_entries)
+
+    def get_many(self, keys: List[str]) -> Dict[str, dict]:
+        """Return {key: transformed_row} for every key found (memory first, then SQLite)."""
+        found: Dict[str, dict] = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+                else:
+                    missing.append(key)
+
+            if self._conn is not None:
+                unique = list(dict.fromkeys(missing))
+                for i in range(0, len(unique), 500):  # stay under SQLite's parameter limit
+                    chunk = unique[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    for key, value in self._conn.execute(
+                        f"SELECT key, value FROM rows WHERE key IN ({placeholders})", chunk
+                    ):
+                        row = json.loads(value)
+                        found[key] = row
+                        self._remember(key, row)
+                # Memory hits count as use too, so a hot row is not evicted from the file
+                touched = list(dict.fromkeys(key for key in keys if key in found))
+                now = time.time()
+                for i in range(0, len(touched), 500):
+                    chunk = touched[i:i + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    self._conn.execute(f"UPDATE rows SET accessed_at = ? WHERE key IN ({placeholders})", [now, *chunk])
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, items: List[Tuple[str, dict]]) -> None:
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            for key, row in items:
+                self._remember(key, row)
+            if self._conn is not None:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rows (key, value, updated_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    [(key, json.dumps(row, ensure_ascii=False, default=str), now, now) for key, row in items],
+                )
+                self._db_rows += len(items)
+                self._evict_persisted()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "persistent": self._conn is not None,
+                "persisted_entries": self._db_rows if self._conn is not None else 0,
+                "evicted": self.evicted,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            }
@@ -0,0 +1,210 @@
+# transform_programs.py
+
+"""
+Compile a /transform mapping prompt once into a small declarative program
+(renames, constant sets, conditional sets, drops) and run it locally over any
+number of rows.
+
+Most mapping prompts are plain renames and "if X contains Y set Z" rewrites, so the
+model only has to read the prompt, not every row. Prompts that need judgement per
+row come back as `compilable: false` and keep using the per-row LLM path.
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, Field
+
+# -------------------------
+# Program schema
+# -------------------------
+
+class Condition(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    field: str
+    op: Literal[
+        "contains", "not_contains", "equals", "not_equals", "startswith", "endswith",
+        "is_null", "not_null", "gt", "lt",
+    ]
+    value: Optional[Union[str, float, int, bool]] = None
+    case_sensitive: bool = False
+
+
+class Rename(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    # Several sources mean "first non-null wins", e.g. "transaction_date/date -> date"
+    sources: List[str]
+    target: str
+
+
+class SetValue(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    field: str
+    value: Optional[Union[str, float, int, bool]] = None
+    when: List[Condition] = Field(default_factory=list)  # all must hold; empty = always
+
+
+class TransformProgram(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+
+    compilable: bool = True
+    renames: List[Rename] = Field(default_factory=list)
+    sets: List[SetValue] = Field(default_factory=list)
+    drops: List[str] = Field(default_factory=list)
+
+
+COMPILE_SYSTEM_PROMPT = """
+You compile natural-language JSON mapping rules into a declarative transform program.
+
+You will receive MAPPING_RULES for rows of type ENTITY_TYPE. Output ONLY a JSON object:
+{
+  "compilable": true,
+  "renames": [ {"sources": ["transaction_date", "date"], "target": "date"} ],
+  "sets": [
+    {"field": "type", "value": "Interest",
+     "when": [ {"field": "description", "op": "contains", "value": "HKAA", "case_sensitive": false} ]}
+  ],
+  "drops": ["cusip"]
+}
+
+Semantics (applied in this order to every row):
+1) renames: target = first non-null value among sources; the source keys are removed.
+   A rename whose only source equals its target is a no-op and may be omitted.
+2) sets: set field to the literal value when ALL conditions hold (empty "when" = always).
+   Conditions read the row after renames, falling back to the original row.
+   op is one of: contains, not_contains, equals, not_equals, startswith, endswith, is_null, not_null, gt, lt.
+3) drops: remove these keys.
+Keys not mentioned are kept unchanged. Never touch "_ui_id".
+
+If ANY rule needs per-row judgement, arithmetic, lookups, date/number reformatting, or
+anything this program cannot express exactly, return {"compilable": false}.
+"""
+
+# -------------------------
+# Local execution
+# -------------------------
+
+_MISSING = object()
+
+
+def _lookup(row: Dict[str, Any], original: Dict[str, Any], field: str) -> Any:
+    value = row.get(field, _MISSING)
+    if value is _MISSING:
+        value = original.get(field)
+    return value
+
+
+def _holds(cond: Condition, row: Dict[str, Any], original: Dict[str, Any]) -> bool:
+    value = _lookup(row, original, cond.field)
+    if cond.op == "is_null":
+        return value is None or value == ""
+    if cond.op == "not_null":
+        return not (value is None or value == "")
+    if value is None:
+        return cond.op in ("not_contains", "not_equals")
+
+    if cond.op in ("gt", "lt"):
+        try:
+            left, right = float(value), float(cond.value)
+        except (TypeError, ValueError):
+            return False
+        return left > right if cond.op == "gt" else left < right
+
+    left, right = str(value), "" if cond.value is None else str(cond.value)
+    if not cond.case_sensitive:
+        left, right = left.lower(), right.lower()
+    if cond.op == "contains":
+        return right in left
+    if cond.op == "not_contains":
+        return right not in left
+    if cond.op == "equals":
+        return left == right
+    if cond.op == "not_equals":
+        return left != right
+    if cond.op == "startswith":
+        return left.startswith(right)
+    return left.endswith(right)  # endswith
+
+
+def apply_program(program: TransformProgram, rows: List[dict]) -> List[dict]:
+    """Run a compiled program over rows; returns new row dicts, inputs are not mutated."""
+    out: List[dict] = []
+    for original in rows:
+        row = dict(original)
+        for rename in program.renames:
+            value = None
+            for src in rename.sources:
+                if original.get(src) is not None:
+                    value = original[src]
+                    break
+            for src in rename.sources:
+                if src != "_ui_id":
+                    row.pop(src, None)
+            row[rename.target] = value
+        for rule in program.sets:
+            if rule.field != "_ui_id" and all(_holds(c, row, original) for c in rule.when):
+                row[rule.field] = rule.value
+        for key in program.drops:
+            if key != "_ui_id":
+                row.pop(key, None)
+        out.append(row)
+    return out
+
+# -------------------------
+# Program cache
+# -------------------------
+
+def normalize_rules(mapping_rules: str) -> str:
+    """Whitespace-insensitive form of the rules used for cache keys (case matters: literals)."""
+    return re.sub(r"\s+", " ", mapping_rules).strip()
+
+
+def program_key(mapping_rules: str, entity_type: str) -> str:
+    material = f"{entity_type}|{normalize_rules(mapping_rules)}"
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ProgramCache:
+    """
+    LRU of compiled programs by (prompt hash, entity type). Prompts that could not be
+    compiled are cached as None so they go straight to the LLM path next time.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Optional[TransformProgram]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str):
+        """Return (found, program_or_None)."""
+        with self._lock:
+            if key not in self._entries:
+                return False, None
+            self._entries.move_to_end(key)
+            return True, self._entries[key]
+
+    def store(self, key: str, program: Optional[TransformProgram]) -> None:
+        with self._lock:
+            self._entries[key] = program
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def parse_program(raw: str) -> Optional[TransformProgram]:
+    """Validate the model's compile output; anything malformed counts as not compilable."""
+    try:
+        program = TransformProgram.model_validate_json(raw)
+    except Exception:
+        return None
+    if not program.compilable:
+        return None
+    if not (program.renames or program.sets or program.drops):
+        return None
+    return program
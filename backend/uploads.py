@@ -0,0 +1,152 @@
+# uploads.py
+
+"""
+Streaming PDF upload handling.
+
+`receive_pdf_upload` parses the multipart body as it arrives and writes the file part
+in fixed-size chunks straight to a spool file while computing its SHA-256, so the
+whole PDF is never held in memory. The size limit is enforced from Content-Length
+before any body is read, and again on the running byte count for chunked requests.
+"""
+
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Spool on disk by default: tmpfs pages count against the container's memory limit
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or tempfile.gettempdir()
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "250"))
+# Spool writes hit the disk in blocks of this size, whatever the network chunking
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Room for multipart boundaries and part headers on top of the file bytes
+_MULTIPART_OVERHEAD = 16 * 1024
+
+
+class SpooledUpload:
+    """A fully received upload: where it was spooled, its content hash and size."""
+
+    def __init__(self, path: str, filename: str, sha256: str, size: int):
+        self.path = path
+        self.filename = filename
+        self.sha256 = sha256
+        self.size = size
+
+    def cleanup(self) -> None:
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+
+
+async def receive_pdf_upload(
+    request: Request,
+    field_name: str = "file",
+    max_bytes: int = MAX_UPLOAD_MB * 1024 * 1024,
+    spool_dir: str = UPLOAD_SPOOL_DIR,
+) -> SpooledUpload:
+    """
+    Stream the `field_name` part of a multipart/form-data request to `spool_dir`.
+
+    Raises 400 for a missing/non-PDF file part and 413 as soon as the limit is exceeded.
+    The caller owns the returned spool file and must call `cleanup()`.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data upload.")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + _MULTIPART_OVERHEAD:
+        raise _too_large(max_bytes)  # reject before reading a single body byte
+
+    state = {"headers": {}, "field": b"", "value": b"", "in_target": False, "filename": None, "error": None}
+    hasher = hashlib.sha256()
+    size = 0
+    spool = None
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        nonlocal spool
+        _disp, opts = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        name = opts.get(b"name", b"").decode("latin-1")
+        state["in_target"] = name == field_name and spool is None and b"filename" in opts
+        if state["in_target"]:
+            state["filename"] = opts[b"filename"].decode("utf-8", "replace")
+            if not state["filename"].lower().endswith(".pdf"):
+                state["error"] = HTTPException(status_code=400, detail="Invalid file type. Only PDF is supported.")
+                state["in_target"] = False
+                return
+            spool = tempfile.NamedTemporaryFile(
+                dir=spool_dir, suffix=".pdf", delete=False, buffering=UPLOAD_CHUNK_SIZE
+            )
+
+    def on_part_data(data, start, end):
+        nonlocal size
+        if not state["in_target"] or state["error"]:
+            return
+        chunk = data[start:end]
+        size += len(chunk)
+        if size > max_bytes:
+            state["error"] = _too_large(max_bytes)
+            return
+        hasher.update(chunk)
+        spool.write(chunk)
+
+    def on_part_end():
+        state["in_target"] = False
+
+    parser = MultipartParser(
+        params[b"boundary"],
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+
+    try:
+        async for body_chunk in request.stream():
+            parser.write(body_chunk)
+            if state["error"]:
+                raise state["error"]
+        parser.finalize()
+    except BaseException as exc:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        if isinstance(exc, Exception) and not isinstance(exc, HTTPException):
+            raise HTTPException(status_code=400, detail="Invalid multipart data.") from exc
+        raise
+
+    if spool is None:
+        if state["error"]:
+            raise state["error"]
+        raise HTTPException(status_code=400, detail=f"Missing '{field_name}' file part.")
+
+    spool.close()
+    return SpooledUpload(spool.name, state["filename"], hasher.hexdigest(), size)
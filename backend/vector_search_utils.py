@@ -1,36 +1,637 @@
 # vector_search_utils.py
 
-import traceback
-from typing import List, Dict, Any, Optional
+"""
+Local security-name -> ISIN resolution; no external vector database.
+
+The security master is a CSV or Parquet file with ISIN, name and instrument type
+columns (SECURITY_MASTER_PATH). It is embedded once into an on-disk index
+(SECURITY_INDEX_DIR) of L2-normalized hashed character-trigram vectors, rebuilt
+automatically when the master file changes. Index files are plain .npy arrays opened
+memory-mapped, so startup reads only the metadata and the OS pages vectors in on
+demand.
+
+Before any vector math, lookups go through exact tiers: an ISIN (the row's
+security_id, or a query that is itself an ISIN) or a normalized name found in a hash
+index, then a normalized name that is the unique prefix of a master name (statements
+truncate long scheme names) found by bisecting a sorted name array. Only the rest is
+scored by similarity; every result carries the `match_tier` that produced it.
+
+Rows are stored sorted by instrument type, so a type filter is a contiguous slice of
+the vector matrix rather than a mask. Queries are embedded with the same vectorized
+code and scored with one matrix product per type group: resolving every holding of a
+statement is a single `search_vector_store_many` call. `search_vector_store_batch`
+adds deduplication of normalized names and an LRU/TTL result cache on top, so
+issuers repeated across accounts and statements cost one index probe.
+
+    python vector_search_utils.py build              # (re)build the index
+    python vector_search_utils.py query "AXIS BANK LTD" --type Stock
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import log
+
+SECURITY_MASTER_PATH = os.getenv("SECURITY_MASTER_PATH", "security_master.csv")
+SECURITY_INDEX_DIR = os.getenv("SECURITY_INDEX_DIR", ".security_index")
+# Embedding width (a power of two); 256 float32 columns is 1 KB per security
+SECURITY_INDEX_DIM = int(os.getenv("SECURITY_INDEX_DIM", "256"))
+# Result cache for search_vector_store_batch (0 entries disables it)
+SECURITY_CACHE_MAX_ENTRIES = int(os.getenv("SECURITY_CACHE_MAX_ENTRIES", "100000"))
+SECURITY_CACHE_TTL_S = float(os.getenv("SECURITY_CACHE_TTL_S", str(24 * 3600)))
+# How often a loaded index re-checks the master file (one stat) for changes
+SECURITY_INDEX_CHECK_S = float(os.getenv("SECURITY_INDEX_CHECK_S", "30"))
+
+INDEX_VERSION = 2
+# Names are embedded from at most this many bytes of their normalized form
+_MAX_NAME_BYTES = 64
+# Rows embedded / scored per block and queries per score matrix, bounding temporary
+# memory (a 512 x 65536 float32 score block is 128 MB)
+_BLOCK_ROWS = 65536
+_QUERY_BLOCK = 512
+# A truncated name must keep this many normalized characters to be matched as a
+# prefix, and may span at most this many master names (then it must be unique in type)
+MIN_PREFIX_CHARS = 12
+_PREFIX_MAX_CANDIDATES = 64
+
+# match_tier values, cheapest first
+MATCH_TIERS = ("isin", "exact", "prefix", "vector")
+_ISIN_FORMAT = re.compile(r"[A-Z]{2}[A-Z0-9]{9}[0-9]")
+
+# Column aliases accepted in the security master (header lower-cased, spaces as "_")
+MASTER_COLUMNS: Dict[str, List[str]] = {
+    "isin": ["isin", "isin_number", "isin_code", "isin_no"],
+    "name": ["name", "security_name", "issuer_name", "company_name", "scheme_name"],
+    "type": ["instrument_type", "type", "security_type", "asset_class"],
+}
+
+# Instrument type spellings found in masters -> SecurityTypeEnum value (lower-cased)
+_TYPE_ALIASES = {
+    "stock": "stock", "stocks": "stock", "equity": "stock", "equities": "stock", "eq": "stock",
+    "equity shares": "stock", "share": "stock", "shares": "stock",
+    "bond": "bond", "bonds": "bond", "debenture": "bond", "debentures": "bond", "debt": "bond", "gsec": "bond",
+    "mutual fund": "mutual fund", "mutual funds": "mutual fund", "mf": "mutual fund", "fund": "mutual fund",
+}
+
+# Token spellings unified before embedding so "LTD" and "LIMITED" embed alike
+_TOKEN_ALIASES = {"LTD": "LIMITED", "PVT": "PRIVATE", "CORP": "CORPORATION", "CO": "COMPANY", "INTL": "INTERNATIONAL"}
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+
+
+def normalize_name(name: Any) -> str:
+    """Upper-case, '&' -> AND, punctuation -> space, common abbreviations expanded."""
+    text = _NON_ALNUM.sub(" ", str(name or "").upper().replace("&", " AND "))
+    return " ".join(_TOKEN_ALIASES.get(tok, tok) for tok in text.split())
+
+
+def normalize_type(instrument_type: Any) -> str:
+    text = " ".join(str(instrument_type or "").lower().replace("_", " ").split())
+    return _TYPE_ALIASES.get(text, text)
+
+
+def normalize_isin(value: Any) -> Optional[str]:
+    """Upper-cased ISIN if `value` is shaped like one, else None."""
+    text = str(value or "").strip().upper()
+    return text if _ISIN_FORMAT.fullmatch(text) else None
+
+
+def embed_names(names: Sequence[str], dim: int = SECURITY_INDEX_DIM) -> np.ndarray:
+    """
+    Hashed character-trigram embeddings, L2-normalized, shape (len(names), dim).
+
+    Trigram codes for all names are computed at once on a padded uint8 matrix and
+    hashed with a multiplicative hash, so no Python work happens per trigram.
+    """
+    out = np.zeros((len(names), dim), dtype=np.float32)
+    if not len(names):
+        return out
+    for start in range(0, len(names), _BLOCK_ROWS):
+        block = names[start:start + _BLOCK_ROWS]
+        padded = np.array(
+            [(" " + normalize_name(n) + " ").encode("ascii", "ignore")[:_MAX_NAME_BYTES] for n in block],
+            dtype=f"S{_MAX_NAME_BYTES}",
+        )
+        chars = padded.view(np.uint8).reshape(len(block), _MAX_NAME_BYTES).astype(np.uint64)
+        codes = (chars[:, :-2] << np.uint64(16)) | (chars[:, 1:-1] << np.uint64(8)) | chars[:, 2:]
+        valid = chars[:, 2:] != 0  # trigram lies inside the (zero-padded) name
+        buckets = ((codes * np.uint64(0x9E3779B1)) >> np.uint64(16)) % np.uint64(dim)
+        rows = np.broadcast_to(np.arange(len(block), dtype=np.uint64)[:, None], buckets.shape)
+        flat = (rows[valid] * np.uint64(dim) + buckets[valid]).astype(np.int64)
+        counts = np.bincount(flat, minlength=len(block) * dim).reshape(len(block), dim)
+        out[start:start + len(block)] = counts
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    np.divide(out, norms, out=out, where=norms > 0)
+    return out
+
+
+def _pick_column(columns: Sequence[str], field: str) -> Optional[str]:
+    lowered = {"_".join(str(c).lower().replace("_", " ").split()): c for c in columns}
+    for alias in MASTER_COLUMNS[field]:
+        if alias in lowered:
+            return lowered[alias]
+    return None
+
+
+def load_master(path: str) -> Tuple[List[str], List[str], List[str]]:
+    """Read (isins, names, normalized types) from a CSV or Parquet security master."""
+    import pandas as pd
+
+    if path.lower().endswith((".parquet", ".pq")):
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    isin_col, name_col, type_col = (_pick_column(df.columns, f) for f in ("isin", "name", "type"))
+    if isin_col is None or name_col is None:
+        raise ValueError(f"{path}: needs ISIN and name columns, found {list(df.columns)}")
+
+    isins = df[isin_col].fillna("").astype(str).str.strip().str.upper().tolist()
+    names = df[name_col].fillna("").astype(str).str.strip().tolist()
+    types = [normalize_type(t) for t in df[type_col].fillna("").astype(str)] if type_col else [""] * len(df)
+    keep = [i for i, (isin, name) in enumerate(zip(isins, names)) if isin and name]
+    return [isins[i] for i in keep], [names[i] for i in keep], [types[i] for i in keep]
+
+
+class SecurityIndex:
+    """Memory-mapped embedding index over a security master, rows grouped by instrument type."""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.dim = self.meta["dim"]
+        self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+        self.isins = np.load(os.path.join(index_dir, "isins.npy"), mmap_mode="r")
+        self.name_offsets = np.load(os.path.join(index_dir, "name_offsets.npy"), mmap_mode="r")
+        self._names = np.memmap(os.path.join(index_dir, "names.bin"), dtype=np.uint8, mode="r") if self.meta["name_bytes"] else b""
+        # normalized type -> (start, end) row slice
+        self.type_ranges: Dict[str, Tuple[int, int]] = {t: (a, b) for t, a, b in self.meta["types"]}
+        # Normalized names sorted bytewise, and the row each one belongs to
+        self.sorted_names = np.load(os.path.join(index_dir, "sorted_names.npy"), mmap_mode="r")
+        self.sorted_rows = np.load(os.path.join(index_dir, "sorted_rows.npy"), mmap_mode="r")
+        # Hash indexes, built from the arrays above on first exact lookup
+        self._isin_rows: Optional[Dict[bytes, int]] = None
+        self._name_spans: Optional[Dict[bytes, Tuple[int, int]]] = None
+        self._hash_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return int(self.meta["count"])
+
+    @staticmethod
+    def build(master_path: str, index_dir: str, dim: int = SECURITY_INDEX_DIM) -> "SecurityIndex":
+        """Embed the master and write the index files (to a temp dir, then swapped in)."""
+        isins, names, types = load_master(master_path)
+        order = sorted(range(len(isins)), key=lambda i: types[i])
+        isins, names, types = [isins[i] for i in order], [names[i] for i in order], [types[i] for i in order]
+
+        ranges: List[List[Any]] = []
+        for i, t in enumerate(types):
+            if ranges and ranges[-1][0] == t:
+                ranges[-1][2] = i + 1
+            else:
+                ranges.append([t, i, i + 1])
+
+        encoded = [n.encode("utf-8") for n in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+        normalized = [normalize_name(n).encode("ascii", "ignore") for n in names]
+        name_order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        width = max((len(b) for b in normalized), default=1) or 1
+
+        tmp_dir = f"{index_dir}.tmp-{os.getpid()}"
+        os.makedirs(tmp_dir, exist_ok=True)
+        np.save(os.path.join(tmp_dir, "vectors.npy"), embed_names(names, dim))
+        np.save(os.path.join(tmp_dir, "isins.npy"), np.array(isins, dtype="S12"))
+        np.save(os.path.join(tmp_dir, "name_offsets.npy"), offsets)
+        with open(os.path.join(tmp_dir, "names.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(tmp_dir, "sorted_names.npy"), np.array([normalized[i] for i in name_order], dtype=f"S{width}"))
+        np.save(os.path.join(tmp_dir, "sorted_rows.npy"), np.array(name_order, dtype=np.int64))
+        stat = os.stat(master_path)
+        meta = {
+            "version": INDEX_VERSION,
+            "dim": dim,
+            "count": len(isins),
+            "name_bytes": int(offsets[-1]),
+            "types": ranges,
+            "master": {"path": os.path.abspath(master_path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        if os.path.isdir(index_dir):
+            for name in os.listdir(index_dir):
+                os.remove(os.path.join(index_dir, name))
+            os.rmdir(index_dir)
+        os.replace(tmp_dir, index_dir)
+        return SecurityIndex(index_dir)
+
+    def is_current(self, master_path: str, dim: int = SECURITY_INDEX_DIM) -> bool:
+        """True when the index was built from this exact master file with these settings."""
+        try:
+            stat = os.stat(master_path)
+        except OSError:
+            return True  # master gone: keep serving the last index
+        master = self.meta.get("master", {})
+        return (
+            self.meta.get("version") == INDEX_VERSION
+            and self.dim == dim
+            and master.get("size") == stat.st_size
+            and master.get("mtime_ns") == stat.st_mtime_ns
+        )
+
+    def name(self, row: int) -> str:
+        return bytes(self._names[self.name_offsets[row]:self.name_offsets[row + 1]]).decode("utf-8")
+
+    def _row_range(self, instrument_type: Optional[str]) -> Optional[Tuple[int, int]]:
+        if not instrument_type:
+            return 0, len(self)
+        return self.type_ranges.get(normalize_type(instrument_type))
+
+    def _hashes(self) -> Tuple[Dict[bytes, int], Dict[bytes, Tuple[int, int]]]:
+        """ISIN -> row and normalized name -> span of sorted_names positions."""
+        with self._hash_lock:
+            if self._isin_rows is None:
+                self._isin_rows = {isin: row for row, isin in enumerate(np.asarray(self.isins).tolist())}
+                names, first, counts = np.unique(np.asarray(self.sorted_names), return_index=True, return_counts=True)
+                self._name_spans = {n: (int(a), int(a + c)) for n, a, c in zip(names.tolist(), first, counts)}
+            return self._isin_rows, self._name_spans
+
+    def _unique_row(self, lo: int, hi: int, row_range: Tuple[int, int]) -> Optional[int]:
+        """The one row among sorted positions [lo, hi) inside `row_range`, else None."""
+        rows = np.asarray(self.sorted_rows[lo:hi])
+        rows = rows[(rows >= row_range[0]) & (rows < row_range[1])]
+        return int(rows[0]) if len(rows) == 1 else None
+
+    def lookup_many(
+        self,
+        queries: Sequence[str],
+        instrument_types: Sequence[Optional[str]],
+        security_ids: Sequence[Optional[str]],
+    ) -> List[Optional[Tuple[int, str]]]:
+        """
+        Exact tiers for every query: (row, match_tier) or None for similarity search.
+
+        ISINs and whole normalized names are dict lookups; names that are a unique
+        prefix of a master name (in the query's type) are bisected in sorted_names.
+        An ambiguous name (several rows of that type) is left to similarity search.
+        """
+        isin_rows, name_spans = self._hashes()
+        out: List[Optional[Tuple[int, str]]] = [None] * len(queries)
+        prefix_queries: List[Tuple[int, bytes, Tuple[int, int]]] = []
+        width = self.sorted_names.dtype.itemsize
+        for qi, (query, t, sid) in enumerate(zip(queries, instrument_types, security_ids)):
+            norm = normalize_name(query)
+            isin = normalize_isin(sid) or normalize_isin(norm)
+            if isin is not None and isin.encode("ascii") in isin_rows:
+                out[qi] = (isin_rows[isin.encode("ascii")], "isin")
+                continue
+            row_range = self._row_range(t)
+            key = norm.encode("ascii", "ignore")
+            if row_range is None or not key:
+                continue
+            span = name_spans.get(key)
+            if span is not None:
+                row = self._unique_row(span[0], span[1], row_range)
+                if row is not None:
+                    out[qi] = (row, "exact")
+            elif MIN_PREFIX_CHARS <= len(key) < width:
+                prefix_queries.append((qi, key, row_range))
+
+        if prefix_queries:
+            keys = np.array([k for _qi, k, _r in prefix_queries], dtype=self.sorted_names.dtype)
+            # Normalized names are [A-Z0-9 ], so key + 0x7f bounds everything starting with key
+            upper = np.array([k + b"\x7f" for _qi, k, _r in prefix_queries], dtype=f"S{width + 1}")
+            los = np.searchsorted(self.sorted_names, keys, side="left")
+            his = np.searchsorted(self.sorted_names, upper, side="left")
+            for (qi, _key, row_range), lo, hi in zip(prefix_queries, los, his):
+                if 0 < hi - lo <= _PREFIX_MAX_CANDIDATES:
+                    row = self._unique_row(int(lo), int(hi), row_range)
+                    if row is not None:
+                        out[qi] = (row, "prefix")
+        return out
+
+    def _result(self, row: int, score: float, tier: str) -> Dict[str, Any]:
+        return {
+            "isin_number": self.isins[row].decode("ascii"),
+            "security_name": self.name(row),
+            "instrument_type": self._type_of(row),
+            "distance": float(1.0 - score),
+            "match_tier": tier,
+        }
+
+    def search_many(
+        self,
+        queries: Sequence[str],
+        instrument_types: Optional[Sequence[Optional[str]]] = None,
+        top_k: int = 1,
+        security_ids: Optional[Sequence[Optional[str]]] = None,
+        fast_path: bool = True,
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k matches for every query; one result list per query.
+
+        Queries resolved by lookup_many are answered from it (with top_k > 1 the
+        similarity neighbours follow the exact hit) and, unless they still need a
+        cosine (prefix hits, neighbours), are never embedded. The rest are scored in
+        one embedding pass and one matrix product per instrument-type group.
+        """
+        types = list(instrument_types) if instrument_types is not None else [None] * len(queries)
+        ids = list(security_ids) if security_ids is not None else [None] * len(queries)
+        results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+        if not len(queries) or not len(self):
+            return results
+        exact = self.lookup_many(queries, types, ids) if fast_path else [None] * len(queries)
+        need = [qi for qi, hit in enumerate(exact) if hit is None or hit[1] == "prefix" or top_k > 1]
+        embedded: Dict[int, np.ndarray] = {}
+        if need:
+            embedded = dict(zip(need, embed_names([queries[qi] for qi in need], self.dim)))
+
+        groups: Dict[Tuple[int, int], List[int]] = {}
+        for qi, t in enumerate(types):
+            if exact[qi] is not None:
+                row, tier = exact[qi]
+                # An identifier or whole-name hit is certain; a prefix hit keeps its cosine
+                score = float(embedded[qi] @ np.asarray(self.vectors[row])) if tier == "prefix" else 1.0
+                results[qi].append(self._result(row, score, tier))
+                if top_k == 1:
+                    continue
+            if not embedded[qi].any():
+                continue  # nothing to match on (empty or non-ASCII-only name)
+            row_range = self._row_range(t)
+            if row_range is not None:
+                groups.setdefault(row_range, []).append(qi)
+
+        for (start, end), members in groups.items():
+            for q0 in range(0, len(members), _QUERY_BLOCK):
+                block_members = members[q0:q0 + _QUERY_BLOCK]
+                q = np.stack([embedded[qi] for qi in block_members])
+                scores, rows = self._top_k(q, start, end, min(top_k, end - start))
+                for i, qi in enumerate(block_members):
+                    for score, row in zip(scores[i], rows[i]):
+                        if len(results[qi]) < top_k and not (exact[qi] and exact[qi][0] == row):
+                            results[qi].append(self._result(int(row), float(score), "vector"))
+        return results
+
+    def _top_k(self, q: np.ndarray, start: int, end: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Best k (scores, rows) per query row of `q` within rows [start, end), best first."""
+        best_scores = np.empty((len(q), 0), dtype=np.float32)
+        best_rows = np.empty((len(q), 0), dtype=np.int64)
+        for block in range(start, end, _BLOCK_ROWS):
+            block_end = min(block + _BLOCK_ROWS, end)
+            scores = q @ np.asarray(self.vectors[block:block_end]).T
+            if k == 1:
+                top = np.argmax(scores, axis=1)[:, None]
+            else:
+                kk = min(k, block_end - block)
+                top = np.argpartition(scores, -kk, axis=1)[:, -kk:]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + block], axis=1)
+        order = np.argsort(-best_scores, axis=1)[:, :k]
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_rows, order, axis=1)
+
+    def _type_of(self, row: int) -> str:
+        for t, (a, b) in self.type_ranges.items():
+            if a <= row < b:
+                return t
+        return ""
+
+
+class SecurityResultCache:
+    """LRU of search results keyed by (normalized name, normalized type, top_k, ISIN), with a TTL."""
+
+    def __init__(self, max_entries: int = 100_000, ttl_s: float = 24 * 3600):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        # key -> (expires at, monotonic; results)
+        self._entries: "OrderedDict[Tuple[str, str, int, str], Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.index_calls = 0
+        self.index_probes = 0
+
+    def get_many(self, keys: List[Tuple[str, str, int, str]]) -> Dict[Tuple[str, str, int, str], List[Dict[str, Any]]]:
+        """Return {key: results} for every live key; each key counts once as a hit or miss."""
+        found: Dict[Tuple[str, str, int, str], List[Dict[str, Any]]] = {}
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+                self.hits += 1
+        return found
+
+    def put_many(self, items: List[Tuple[Tuple[str, str, int, str], List[Dict[str, Any]]]]) -> None:
+        expires = time.monotonic() + self.ttl_s
+        with self._lock:
+            for key, results in items:
+                self._entries[key] = (expires, results)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_probe(self, queries: int) -> None:
+        with self._lock:
+            self.index_calls += 1
+            self.index_probes += queries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "index_calls": self.index_calls,
+                "index_probes": self.index_probes,
+            }
+
+
+result_cache: Optional[SecurityResultCache] = (
+    SecurityResultCache(SECURITY_CACHE_MAX_ENTRIES, SECURITY_CACHE_TTL_S) if SECURITY_CACHE_MAX_ENTRIES > 0 else None
+)
+
+# Index probes resolved per match_tier, plus "none" (no result)
+tier_counts: Dict[str, int] = {tier: 0 for tier in MATCH_TIERS + ("none",)}
+_tier_lock = threading.Lock()
+
+_index: Optional[SecurityIndex] = None
+_index_checked = 0.0  # time.monotonic() of the last is_current() check
+_index_lock = threading.Lock()
+_missing_master_logged = False
+
+
+def get_index() -> Optional[SecurityIndex]:
+    """
+    The process-wide index: opened on first use and rebuilt when the master changes,
+    which a loaded index re-checks at most every SECURITY_INDEX_CHECK_S seconds.
+    None without a master.
+    """
+    global _index, _index_checked, _missing_master_logged
+    with _index_lock:
+        now = time.monotonic()
+        if _index is not None:
+            if now - _index_checked < SECURITY_INDEX_CHECK_S:
+                return _index
+            _index_checked = now
+            if _index.is_current(SECURITY_MASTER_PATH):
+                return _index
+            log(f"Security master {SECURITY_MASTER_PATH} changed; reloading the index.")
+        try:
+            index = None
+            # Another process sharing SECURITY_INDEX_DIR may already have rebuilt it
+            if os.path.exists(os.path.join(SECURITY_INDEX_DIR, "meta.json")):
+                index = SecurityIndex(SECURITY_INDEX_DIR)
+                if not index.is_current(SECURITY_MASTER_PATH):
+                    index = None
+            if index is None:
+                if not os.path.exists(SECURITY_MASTER_PATH):
+                    if not _missing_master_logged:
+                        log(f"Security master not found at {SECURITY_MASTER_PATH}; vector search returns no results.")
+                        _missing_master_logged = True
+                    return None
+                log(f"Building security index from {SECURITY_MASTER_PATH} into {SECURITY_INDEX_DIR}...")
+                index = SecurityIndex.build(SECURITY_MASTER_PATH, SECURITY_INDEX_DIR)
+                log(f"Security index ready: {len(index)} securities.")
+            _index, _index_checked = index, now
+            if result_cache is not None:
+                result_cache.clear()  # results from the previous master are stale
+        except Exception as e:
+            log(f"Warning: security index unavailable. Error: {e}")
+            return _index  # keep serving the last good index, if any
+        return _index
+
 
 def search_vector_store(
     query_text: str,
     instrument_type: Optional[str] = None,
-    top_k: int = 1
+    top_k: int = 1,
+    security_id: Optional[str] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Placeholder for vector database search.
-
-    This function is a stub. In a real application, this would:
-    1. Connect to a vector database (e.g., PostgreSQL with pgvector, Pinecone, etc.).
-    2. Generate an embedding for the query_text.
-    3. Perform a similarity search in the database.
-    4. Return the top_k results.
-
-    For now, it returns an empty list to allow the main application to run.
-    """
-    print(f"--- [STUB] Vector search called for: '{query_text}' with type '{instrument_type}'. ---")
-    print("--- [STUB] This is a placeholder and returns no results. ---")
-    
-    # In a real implementation, you would have your database connection
-    # and query logic here.
-    
-    # Example of what real results might look like:
-    # if "AXIS BANK" in query_text.upper():
-    #     return [{
-    #         'isin_number': 'INE238A01034',
-    #         'security_name': 'AXIS BANK LIMITED',
-    #         'distance': 0.1
-    #     }]
-        
-    return []
\ No newline at end of file
+    Top-k securities matching `query_text`, optionally restricted to one instrument
+    type. Each result is
+    {"isin_number", "security_name", "instrument_type", "distance", "match_tier"} with
+    the cosine distance in [0, 2] (0 = identical trigram profile, or an ISIN hit) and the tier that
+    resolved it: "isin" (security_id or the query is a known ISIN), "exact", "prefix"
+    or "vector". Returns [] when no security master is configured. Served through the
+    result cache, like the batch call.
+    """
+    return search_vector_store_batch([query_text], [instrument_type], top_k, [security_id])[0]
+
+
+def search_vector_store_batch(
+    query_texts: Sequence[str],
+    instrument_types: Optional[Sequence[Optional[str]]] = None,
+    top_k: int = 1,
+    security_ids: Optional[Sequence[Optional[str]]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Cached, deduplicated `search_vector_store` for many names; one result list per input.
+
+    Names are normalized (case, punctuation, LTD/LIMITED, ...) and paired with their
+    normalized type and ISIN-shaped security_id; each distinct key is answered from
+    the result cache or, for the remaining ones, by a single `search_vector_store_many`
+    call. Duplicates share the answer, so a statement repeating an issuer across
+    accounts costs one probe.
+    """
+    types = list(instrument_types) if instrument_types is not None else [None] * len(query_texts)
+    ids = list(security_ids) if security_ids is not None else [None] * len(query_texts)
+    keys = [
+        (normalize_name(q), normalize_type(t), top_k, normalize_isin(sid) or "")
+        for q, t, sid in zip(query_texts, types, ids)
+    ]
+    unique = list(dict.fromkeys(keys))
+
+    if result_cache is not None:
+        get_index()  # a changed master clears the cache before it answers
+    found = result_cache.get_many(unique) if result_cache is not None else {}
+    missing = [key for key in unique if key not in found and (key[0] or key[3])]
+    if missing:
+        answers = search_vector_store_many(
+            [k[0] for k in missing], [k[1] or None for k in missing], top_k, [k[3] or None for k in missing]
+        )
+        fresh = list(zip(missing, answers))
+        found.update(fresh)
+        if result_cache is not None and get_index() is not None:
+            result_cache.record_probe(len(missing))
+            result_cache.put_many(fresh)
+
+    return [[dict(r) for r in found.get(key, [])] for key in keys]
+
+
+def cache_stats() -> Dict[str, Any]:
+    stats = result_cache.stats() if result_cache is not None else {"enabled": False}
+    with _tier_lock:
+        stats["tiers"] = dict(tier_counts)
+    return stats
+
+
+def search_vector_store_many(
+    query_texts: Sequence[str],
+    instrument_types: Optional[Sequence[Optional[str]]] = None,
+    top_k: int = 1,
+    security_ids: Optional[Sequence[Optional[str]]] = None,
+) -> List[List[Dict[str, Any]]]:
+    """Uncached `search_vector_store` for many names (e.g. every holding of a statement)."""
+    index = get_index()
+    if index is None:
+        return [[] for _ in query_texts]
+    results = index.search_many(query_texts, instrument_types, top_k, security_ids)
+    with _tier_lock:
+        for r in results:
+            tier_counts[r[0]["match_tier"] if r else "none"] += 1
+    return results
+
+
+def main():
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Build or query the local security index.")
+    sub = ap.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="(Re)build the index from the security master")
+    build.add_argument("--master", default=SECURITY_MASTER_PATH)
+    build.add_argument("--index-dir", default=SECURITY_INDEX_DIR)
+    query = sub.add_parser("query", help="Look up security names")
+    query.add_argument("names", nargs="+")
+    query.add_argument("--type", default=None, help="Instrument type filter, e.g. Stock")
+    query.add_argument("--top-k", type=int, default=3)
+    query.add_argument("--security-id", default=None, help="ISIN printed on the statement row, if any")
+    args = ap.parse_args()
+
+    if args.command == "build":
+        index = SecurityIndex.build(args.master, args.index_dir)
+        print(f"Indexed {len(index)} securities into {args.index_dir} ({index.meta['types']})")
+        return
+    for name, results in zip(args.names, search_vector_store_batch(
+        args.names, [args.type] * len(args.names), args.top_k, [args.security_id] * len(args.names)
+    )):
+        print(name)
+        for r in results:
+            print(f"  {r['isin_number']}  {r['distance']:.3f}  {r['match_tier']:<6}  {r['security_name']}  [{r['instrument_type']}]")
+
+
+if __name__ == "__main__":
+    main()